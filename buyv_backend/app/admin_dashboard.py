@@ -2,9 +2,9 @@
 Admin Dashboard API Endpoints
 Provides statistics and management endpoints for mobile admin panel
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, desc, insert
 from datetime import datetime, timedelta
 from typing import List, Optional
 from pydantic import BaseModel
@@ -13,9 +13,13 @@ import json as _json
 from .database import get_db
 from .models import (
     User, Post, Order, OrderItem, Commission, PromoterWallet,
-    Follow, PostLike, Comment, Notification, WithdrawalRequest
+    Follow, Comment, Notification
 )
 from .auth import require_admin_role
+from . import dashboard_stats
+from .batch_loaders import users_by_id
+from .push_dispatcher import dispatcher as push_dispatcher
+from .notifications import adjust_unread_count
 
 router = APIRouter(prefix="/api/admin", tags=["Admin Dashboard"])
 
@@ -49,6 +53,9 @@ class DashboardStatsResponse(BaseModel):
     # Withdrawal stats
     pending_withdrawals: int
     pending_withdrawals_amount: float
+    
+    # When the snapshot was computed
+    generated_at: Optional[datetime] = None
 
 
 class RecentUserResponse(BaseModel):
@@ -97,82 +104,36 @@ class UserActionRequest(BaseModel):
 
 @router.get("/dashboard/stats", response_model=DashboardStatsResponse)
 def get_dashboard_stats(
+    background_tasks: BackgroundTasks,
+    fresh: bool = False,
     admin: User = Depends(require_admin_role("admin")),
     db: Session = Depends(get_db)
 ):
     """
     Get comprehensive dashboard statistics for admin panel
     All admin roles can access this endpoint
-    """
-    # Calculate date ranges
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=7)
-    
-    # Users stats
-    total_users = db.query(func.count(User.id)).scalar()
-    verified_users = db.query(func.count(User.id)).filter(User.is_verified == True).scalar()
-    new_users_today = db.query(func.count(User.id)).filter(User.created_at >= today_start).scalar()
-    new_users_this_week = db.query(func.count(User.id)).filter(User.created_at >= week_start).scalar()
     
-    # Content stats
-    total_posts = db.query(func.count(Post.id)).scalar()
-    total_reels = db.query(func.count(Post.id)).filter(Post.type == 'reel').scalar()
-    total_products = db.query(func.count(Post.id)).filter(Post.type == 'product').scalar()
-    total_comments = db.query(func.count(Comment.id)).scalar()
-    total_likes = db.query(func.count(PostLike.id)).scalar()
-    
-    # Social stats
-    total_follows = db.query(func.count(Follow.id)).scalar()
+    Served from a snapshot refreshed every DASHBOARD_STATS_TTL_SECONDS;
+    super_admin / finance can pass ?fresh=true to recompute it now (e.g. for
+    finance reconciliation). Other roles always get the snapshot.
+    """
+    sees_finance = admin.role in ["super_admin", "finance"]
+    stats = dict(dashboard_stats.snapshot.get(db, background_tasks, fresh=fresh and sees_finance))
     
     # Commerce stats (only for super_admin and finance)
-    if admin.role in ["super_admin", "finance"]:
-        total_orders = db.query(func.count(Order.id)).scalar()
-        pending_orders = db.query(func.count(Order.id)).filter(Order.status == 'pending').scalar()
-        total_commissions = db.query(func.count(Commission.id)).scalar()
-        pending_commissions = db.query(func.count(Commission.id)).filter(Commission.status == 'pending').scalar()
-        
-        # Calculate revenue (sum of paid commissions)
-        paid_commissions = db.query(Commission).filter(Commission.status == 'paid').all()
-        total_revenue = sum(c.commission_amount for c in paid_commissions if c.commission_amount)
-        
-        # Withdrawal stats
-        pending_withdrawals = db.query(func.count(WithdrawalRequest.id)).filter(
-            WithdrawalRequest.status == 'pending'
-        ).scalar()
-        
-        pending_withdrawals_sum = db.query(func.sum(WithdrawalRequest.amount)).filter(
-            WithdrawalRequest.status == 'pending'
-        ).scalar()
-        pending_withdrawals_amount = float(pending_withdrawals_sum or 0)
-    else:
+    if not sees_finance:
         # Moderators don't see financial data
-        total_orders = 0
-        pending_orders = 0
-        total_commissions = 0
-        pending_commissions = 0
-        total_revenue = 0.0
-        pending_withdrawals = 0
-        pending_withdrawals_amount = 0.0
+        stats.update(
+            total_orders=0,
+            pending_orders=0,
+            total_commissions=0,
+            pending_commissions=0,
+            total_revenue=0.0,
+            pending_withdrawals=0,
+            pending_withdrawals_amount=0.0,
+        )
     
-    return DashboardStatsResponse(
-        total_users=total_users,
-        verified_users=verified_users,
-        new_users_today=new_users_today,
-        new_users_this_week=new_users_this_week,
-        total_posts=total_posts,
-        total_reels=total_reels,
-        total_products=total_products,
-        total_comments=total_comments,
-        total_likes=total_likes,
-        total_follows=total_follows,
-        total_orders=total_orders,
-        pending_orders=pending_orders,
-        total_commissions=total_commissions,
-        pending_commissions=pending_commissions,
-        total_revenue=total_revenue,
-        pending_withdrawals=pending_withdrawals,
-        pending_withdrawals_amount=pending_withdrawals_amount
-    )
+    return DashboardStatsResponse(**stats)
 
 
 # ============ Recent Activity Endpoints ============
@@ -578,24 +539,36 @@ def send_admin_notification(
     db: Session = Depends(get_db)
 ):
     """Send a notification to specific users or broadcast to all"""
+    query = db.query(User.id, User.fcm_token)
     if request.target_user_uids:
-        users = db.query(User).filter(User.uid.in_(request.target_user_uids)).all()
-    else:
-        users = db.query(User).all()
+        query = query.filter(User.uid.in_(request.target_user_uids))
+    recipients = query.all()
 
-    count = 0
-    for user in users:
-        notification = Notification(
-            user_id=user.id,
-            title=request.title,
-            body=request.body,
-            type=request.type,
-            data=None
-        )
-        db.add(notification)
-        count += 1
+    # One multi-row INSERT instead of one ORM object per recipient
+    if recipients:
+        now = datetime.utcnow()
+        db.execute(insert(Notification), [
+            {
+                "user_id": user_id,
+                "title": request.title,
+                "body": request.body,
+                "type": request.type,
+                "data": None,
+                "is_read": False,
+                "created_at": now,
+            }
+            for user_id, _ in recipients
+        ])
+        adjust_unread_count(db, [user_id for user_id, _ in recipients], 1)
+        db.commit()
 
-    db.commit()
+    push_dispatcher.enqueue(
+        tokens=[token for _, token in recipients],
+        title=request.title,
+        body=request.body,
+        notification_type=request.type,
+    )
+    count = len(recipients)
     return {"message": f"Notification sent to {count} users", "count": count}
 
 
@@ -606,9 +579,17 @@ def send_admin_notification(
 orders_admin_router = APIRouter(prefix="/api/orders", tags=["Admin Orders"])
 
 
-def _map_order_admin(order: Order, db: Session) -> dict:
+def _map_orders_admin(orders: List[Order], db: Session) -> List[dict]:
+    """Map a page of orders; buyers come from one IN query (items are selectin-loaded)."""
+    users = users_by_id(db, (o.user_id for o in orders))
+    return [_map_order_admin(o, db, users) for o in orders]
+
+
+def _map_order_admin(order: Order, db: Session, users: Optional[dict] = None) -> dict:
     """Map an Order to the admin-facing JSON format expected by the Kotlin app."""
-    user = db.query(User).filter(User.id == order.user_id).first()
+    if users is None:
+        users = users_by_id(db, [order.user_id])
+    user = users.get(order.user_id)
     try:
         addr = _json.loads(order.shipping_address) if order.shipping_address else None
     except Exception:
@@ -667,12 +648,13 @@ def admin_get_all_orders(
     """List all orders — admin only."""
     orders = (
         db.query(Order)
+        .options(selectinload(Order.items))
         .order_by(desc(Order.created_at))
         .limit(limit)
         .offset(offset)
         .all()
     )
-    return [_map_order_admin(o, db) for o in orders]
+    return _map_orders_admin(orders, db)
 
 
 @orders_admin_router.get("/admin/status")
@@ -686,13 +668,14 @@ def admin_get_orders_by_status(
     """List orders filtered by status — admin only."""
     orders = (
         db.query(Order)
+        .options(selectinload(Order.items))
         .filter(Order.status == status)
         .order_by(desc(Order.created_at))
         .limit(limit)
         .offset(offset)
         .all()
     )
-    return [_map_order_admin(o, db) for o in orders]
+    return _map_orders_admin(orders, db)
 
 
 class OrderStatusUpdateRequest(BaseModel):
@@ -767,12 +750,18 @@ def admin_update_order_status(
 commissions_admin_router = APIRouter(prefix="/api/commissions", tags=["Admin Commissions"])
 
 
-def _map_commission_admin(c: Commission, db: Session) -> dict:
+def _map_commissions_admin(rows: List[Commission], db: Session) -> List[dict]:
+    """Map a page of commissions, resolving all user UIDs in one query."""
+    users = users_by_id(db, (c.user_id for c in rows))
+    return [_map_commission_admin(c, db, users) for c in rows]
+
+
+def _map_commission_admin(c: Commission, db: Session, users: Optional[dict] = None) -> dict:
     """Map a Commission to the Kotlin Commission domain model format."""
-    uid = None
-    if c.user_id:
-        u = db.query(User).filter(User.id == c.user_id).first()
-        uid = u.uid if u else None
+    if users is None:
+        users = users_by_id(db, [c.user_id])
+    u = users.get(c.user_id)
+    uid = u.uid if u else None
     if not uid:
         uid = c.user_uid or ""
 
@@ -814,7 +803,7 @@ def admin_get_all_commissions(
         .offset(offset)
         .all()
     )
-    return [_map_commission_admin(r, db) for r in rows]
+    return _map_commissions_admin(rows, db)
 
 
 @commissions_admin_router.get("/admin/status")
@@ -834,7 +823,7 @@ def admin_get_commissions_by_status(
         .offset(offset)
         .all()
     )
-    return [_map_commission_admin(r, db) for r in rows]
+    return _map_commissions_admin(rows, db)
 
 
 class CommissionStatusUpdateRequest(BaseModel):
@@ -0,0 +1,213 @@
+"""
+Promoter analytics rollups.
+
+promoter_daily_stats holds one row per (promoter, day) with views, clicks,
+conversions and commission totals. A periodic compaction rebuilds closed days
+from the raw tables. The analytics endpoint reads the rollups for compacted days
+and scans only the small raw tail after the last compacted day, so its cost no
+longer grows with the lookback window or with reel_views / affiliate_clicks.
+
+Compaction re-derives the last ROLLUP_RECOMPACT_DAYS days on every run, which
+picks up late conversions and commission status changes. Conversions of older
+clicks are applied incrementally by record_conversion.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, case, update
+from sqlalchemy.orm import Session
+
+from .config import ROLLUP_RECOMPACT_DAYS, ROLLUP_COMPACTION_INTERVAL_SECONDS
+from .database import SessionLocal
+from .models import ReelView, AffiliateClick, Commission, PromoterDailyStat
+
+logger = logging.getLogger(__name__)
+
+# Commissions in these states never pay out and are left out of daily earnings
+_EXCLUDED_COMMISSION_STATUSES = ("rejected", "cancelled")
+
+_FIELDS = ("views", "clicks", "conversions", "commission_amount")
+
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def compacted_through(db: Session) -> Optional[date]:
+    """Last day covered by promoter_daily_stats (None before the first compaction)."""
+    last = db.query(func.max(PromoterDailyStat.day)).scalar()
+    return _as_date(last) if last else None
+
+
+def _aggregate_raw(db: Session, since: datetime, until: Optional[datetime] = None, promoter_uid: Optional[str] = None):
+    """Per (promoter, day) counters from the raw tables for ``[since, until)``."""
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+
+    def bucket(uid, day):
+        return buckets.setdefault((uid, _as_date(day)), dict.fromkeys(_FIELDS, 0))
+
+    def window(query, uid_col, created_col):
+        query = query.filter(created_col >= since)
+        if until is not None:
+            query = query.filter(created_col < until)
+        if promoter_uid is not None:
+            query = query.filter(uid_col == promoter_uid)
+        return query
+
+    view_day = func.date(ReelView.created_at)
+    views = window(
+        db.query(ReelView.promoter_uid, view_day, func.count(ReelView.id)),
+        ReelView.promoter_uid, ReelView.created_at,
+    ).group_by(ReelView.promoter_uid, view_day)
+    for uid, day, n in views:
+        bucket(uid, day)["views"] = n
+
+    click_day = func.date(AffiliateClick.created_at)
+    clicks = window(
+        db.query(
+            AffiliateClick.promoter_uid,
+            click_day,
+            func.count(AffiliateClick.id),
+            func.sum(case((AffiliateClick.converted == True, 1), else_=0)),
+        ),
+        AffiliateClick.promoter_uid, AffiliateClick.created_at,
+    ).group_by(AffiliateClick.promoter_uid, click_day)
+    for uid, day, n, converted in clicks:
+        row = bucket(uid, day)
+        row["clicks"] = n
+        row["conversions"] = int(converted or 0)
+
+    commission_day = func.date(Commission.created_at)
+    commissions = window(
+        db.query(Commission.user_uid, commission_day, func.sum(Commission.commission_amount)),
+        Commission.user_uid, Commission.created_at,
+    ).filter(
+        Commission.user_uid.isnot(None),
+        Commission.status.notin_(_EXCLUDED_COMMISSION_STATUSES),
+    ).group_by(Commission.user_uid, commission_day)
+    for uid, day, amount in commissions:
+        bucket(uid, day)["commission_amount"] = float(amount or 0.0)
+
+    return buckets
+
+
+def compact_promoter_rollups(db: Session, until: Optional[date] = None) -> int:
+    """Rebuild rollup rows for closed days. Returns the number of rows written.
+
+    The first run backfills from the oldest raw row; later runs re-derive the
+    trailing ROLLUP_RECOMPACT_DAYS days through *until* (default: yesterday).
+    """
+    until = until or datetime.utcnow().date() - timedelta(days=1)
+    last = compacted_through(db)
+    if last is not None:
+        start = last - timedelta(days=ROLLUP_RECOMPACT_DAYS - 1)
+    else:
+        oldest = [
+            db.query(func.min(ReelView.created_at)).scalar(),
+            db.query(func.min(AffiliateClick.created_at)).scalar(),
+            db.query(func.min(Commission.created_at)).scalar(),
+        ]
+        oldest = [d for d in oldest if d is not None]
+        if not oldest:
+            return 0
+        start = _as_date(min(oldest))
+    if start > until:
+        return 0
+
+    buckets = _aggregate_raw(db, _start_of(start), _start_of(until + timedelta(days=1)))
+
+    db.query(PromoterDailyStat).filter(
+        PromoterDailyStat.day >= start,
+        PromoterDailyStat.day <= until,
+    ).delete(synchronize_session=False)
+    db.add_all([
+        PromoterDailyStat(promoter_uid=uid, day=day, **counters)
+        for (uid, day), counters in buckets.items()
+    ])
+    db.commit()
+    return len(buckets)
+
+
+def record_conversion(db: Session, click: AffiliateClick) -> None:
+    """Count a conversion against an already-compacted day (no-op for the raw tail)."""
+    db.execute(
+        update(PromoterDailyStat)
+        .where(
+            PromoterDailyStat.promoter_uid == click.promoter_uid,
+            PromoterDailyStat.day == click.created_at.date(),
+        )
+        .values(conversions=PromoterDailyStat.conversions + 1)
+    )
+
+
+def promoter_daily_totals(db: Session, promoter_uid: str, start_day: date) -> Dict[date, Dict[str, Any]]:
+    """Counters per day from *start_day* through today: rollups + raw tail."""
+    through = compacted_through(db)
+    days: Dict[date, Dict[str, Any]] = {}
+
+    if through is not None and through >= start_day:
+        rows = db.query(PromoterDailyStat).filter(
+            PromoterDailyStat.promoter_uid == promoter_uid,
+            PromoterDailyStat.day >= start_day,
+            PromoterDailyStat.day <= through,
+        )
+        for row in rows:
+            days[_as_date(row.day)] = {f: getattr(row, f) or 0 for f in _FIELDS}
+
+    tail_from = max(start_day, through + timedelta(days=1)) if through else start_day
+    for (_, day), counters in _aggregate_raw(db, _start_of(tail_from), promoter_uid=promoter_uid).items():
+        days[day] = counters
+    return days
+
+
+class RollupCompactor:
+    """Runs compact_promoter_rollups every ROLLUP_COMPACTION_INTERVAL_SECONDS."""
+
+    def __init__(self, interval_seconds: int = ROLLUP_COMPACTION_INTERVAL_SECONDS, session_factory=SessionLocal):
+        self.interval = interval_seconds
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            return compact_promoter_rollups(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Promoter rollup compaction failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await run_in_threadpool(self.run_once)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+compactor = RollupCompactor()
@@ -0,0 +1,515 @@
+"""
+Background audio extraction jobs for POST /api/sounds/extract.
+
+The endpoint only registers a job and returns its id; the work runs as an
+asyncio task on the worker's loop:
+
+1. download  -- the video is streamed to a temp file in AUDIO_EXTRACT_CHUNK_BYTES
+                chunks (never held in memory), aborted past AUDIO_EXTRACT_MAX_DOWNLOAD_MB
+                or AUDIO_EXTRACT_DOWNLOAD_TIMEOUT_SECONDS
+2. extract   -- ffmpeg (then ffprobe for the duration) runs as an async subprocess;
+                at most AUDIO_EXTRACT_WORKERS run at once, each killed after
+                AUDIO_EXTRACT_FFMPEG_TIMEOUT_SECONDS
+3. store     -- the audio file is uploaded to Cloudinary when CLOUDINARY_URL is set,
+                otherwise kept under AUDIO_STORAGE_DIR and served by
+                GET /api/sounds/extract/files/{name} (absolute URL built from
+                AUDIO_PUBLIC_BASE_URL, or from the submitting request's host)
+
+Repeat extractions are served from the content-addressed store (app/sound_store.py):
+an unchanged URL (same ETag) skips the download, and a known video (same SHA-256,
+computed while streaming) skips ffmpeg. Jobs for the same URL run one at a time so
+concurrent duplicates reuse the first result.
+
+Clients poll GET /api/sounds/extract/{job_id} or follow its /events SSE stream,
+and may cancel with DELETE, which kills a running ffmpeg. Jobs are kept in
+memory (production runs a single uvicorn worker) for AUDIO_EXTRACT_JOB_RETENTION_SECONDS
+after they finish.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set
+
+import anyio
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from .config import (
+    AUDIO_EXTRACT_WORKERS,
+    AUDIO_EXTRACT_MAX_DOWNLOADS,
+    AUDIO_EXTRACT_MAX_PENDING,
+    AUDIO_EXTRACT_MAX_PENDING_PER_USER,
+    AUDIO_EXTRACT_CHUNK_BYTES,
+    AUDIO_EXTRACT_MAX_DOWNLOAD_MB,
+    AUDIO_EXTRACT_DOWNLOAD_TIMEOUT_SECONDS,
+    AUDIO_EXTRACT_FFMPEG_TIMEOUT_SECONDS,
+    AUDIO_EXTRACT_JOB_RETENTION_SECONDS,
+    AUDIO_STORAGE_DIR,
+    AUDIO_PUBLIC_BASE_URL,
+    AUDIO_DEDUP_ENABLED,
+    IS_PRODUCTION,
+)
+from .database import SessionLocal
+from .models import Sound
+from .sound_store import LOCAL, REMOTE, SoundArtifactStore, source_key
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+EXTRACTING = "extracting"
+STORING = "storing"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TERMINAL = (COMPLETED, FAILED, CANCELLED)
+
+FILES_ROUTE = "/api/sounds/extract/files"
+
+
+class ExtractionError(Exception):
+    """A job failed for a reason worth showing to the client."""
+
+
+class ExtractorBusy(Exception):
+    """Too many jobs are already pending (globally or for this user)."""
+
+
+class ExtractionJob:
+    def __init__(self, user_id: int, video_url: str, title: Optional[str], base_url: str = ""):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.video_url = video_url
+        self.title = title or "Extracted Sound"
+        # Public base URL of the API for local files when AUDIO_PUBLIC_BASE_URL is unset
+        self.base_url = base_url.rstrip("/")
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.task: Optional[asyncio.Task] = None
+        self.version = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.updated_at = time.time()
+        self.version += 1
+        # Wake every SSE listener, then hand out a fresh event for the next change
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, since_version: int, timeout: float) -> bool:
+        """True once the job moved past *since_version*, False after *timeout* seconds."""
+        if self.version != since_version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "source_video_url": self.video_url,
+            "title": self.title,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class AudioExtractor:
+    def __init__(
+        self,
+        workers: int = AUDIO_EXTRACT_WORKERS,
+        max_downloads: int = AUDIO_EXTRACT_MAX_DOWNLOADS,
+        max_pending: int = AUDIO_EXTRACT_MAX_PENDING,
+        max_pending_per_user: int = AUDIO_EXTRACT_MAX_PENDING_PER_USER,
+        chunk_bytes: int = AUDIO_EXTRACT_CHUNK_BYTES,
+        max_download_bytes: int = AUDIO_EXTRACT_MAX_DOWNLOAD_MB * 1024 * 1024,
+        download_timeout: float = AUDIO_EXTRACT_DOWNLOAD_TIMEOUT_SECONDS,
+        ffmpeg_timeout: float = AUDIO_EXTRACT_FFMPEG_TIMEOUT_SECONDS,
+        retention_seconds: int = AUDIO_EXTRACT_JOB_RETENTION_SECONDS,
+        storage_dir: str = AUDIO_STORAGE_DIR,
+        public_base_url: str = AUDIO_PUBLIC_BASE_URL,
+        ffmpeg_bin: str = "ffmpeg",
+        ffprobe_bin: str = "ffprobe",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        dedup: bool = AUDIO_DEDUP_ENABLED,
+        store: Optional[SoundArtifactStore] = None,
+        session_factory=SessionLocal,
+    ):
+        self.workers = workers
+        self.max_downloads = max_downloads
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self.chunk_bytes = chunk_bytes
+        self.max_download_bytes = max_download_bytes
+        self.download_timeout = download_timeout
+        self.ffmpeg_timeout = ffmpeg_timeout
+        self.retention_seconds = retention_seconds
+        self.storage_dir = storage_dir
+        self.public_base_url = public_base_url.rstrip("/")
+        self.ffmpeg_bin = ffmpeg_bin
+        self.ffprobe_bin = ffprobe_bin
+        self.transport = transport
+        self.dedup = dedup
+        self.session_factory = session_factory
+        self._store = store
+        # url -> [lock, holders]: concurrent jobs for one URL run one after the other,
+        # so the later ones are served by the store
+        self._url_locks: Dict[str, list] = {}
+        self._jobs: Dict[str, ExtractionJob] = {}
+        # Semaphores are bound lazily to the loop that runs the jobs
+        self._ffmpeg_slots: Optional[asyncio.Semaphore] = None
+        self._download_slots: Optional[asyncio.Semaphore] = None
+        self._metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "dedup_source_hits": 0,
+            "dedup_content_hits": 0,
+            "bytes_downloaded": 0,
+            "ffmpeg_seconds": 0.0,
+        }
+
+    @property
+    def store(self) -> Optional[SoundArtifactStore]:
+        """Dedup store, opened on first use (None when AUDIO_DEDUP_ENABLED is off)."""
+        if self._store is None and self.dedup:
+            self._store = SoundArtifactStore(storage_dir=self.storage_dir)
+        return self._store
+
+    # ── Jobs ───────────────────────────────────────────
+
+    def submit(self, user_id: int, video_url: str, title: Optional[str] = None,
+               base_url: str = "") -> ExtractionJob:
+        """Register a job and start it on the running loop. Raises ExtractorBusy when full.
+
+        *base_url* (the submitting request's ``base_url``) prefixes locally stored
+        files when AUDIO_PUBLIC_BASE_URL is not set.
+        """
+        self._evict_finished()
+        pending = [j for j in self._jobs.values() if not j.done]
+        if len(pending) >= self.max_pending or \
+                sum(1 for j in pending if j.user_id == user_id) >= self.max_pending_per_user:
+            self._metrics["rejected"] += 1
+            raise ExtractorBusy()
+
+        if self._ffmpeg_slots is None:
+            self._ffmpeg_slots = asyncio.Semaphore(self.workers)
+            self._download_slots = asyncio.Semaphore(self.max_downloads)
+
+        job = ExtractionJob(user_id, video_url, title, base_url)
+        self._jobs[job.id] = job
+        self._metrics["submitted"] += 1
+        job.task = asyncio.create_task(self._run(job))
+        job.task.add_done_callback(lambda t: self._on_task_done(job, t))
+        return job
+
+    def get(self, job_id: str) -> Optional[ExtractionJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending job. False if it does not exist or already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.done or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    async def shutdown(self) -> None:
+        """Cancel every unfinished job (app shutdown); their temp files are removed."""
+        tasks = [j.task for j in self._jobs.values() if j.task is not None and not j.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._ffmpeg_slots = None
+        self._download_slots = None
+
+    def _on_task_done(self, job: ExtractionJob, task: asyncio.Task) -> None:
+        # Also covers jobs cancelled before their task got to run
+        if task.cancelled() and not job.done:
+            job.set_status(CANCELLED)
+            self._metrics["cancelled"] += 1
+
+    def _evict_finished(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.updated_at < cutoff]:
+            del self._jobs[job_id]
+
+    # ── Pipeline ───────────────────────────────────────
+
+    async def _run(self, job: ExtractionJob) -> None:
+        workdir = tempfile.mkdtemp(prefix="buyv_extract_")
+        try:
+            async with self._url_lock(job.video_url):
+                artifact, deduplicated = await self._produce(job, workdir)
+            sound_uid = await run_in_threadpool(self._sound_uid_for, artifact["audio_url"])
+            job.result = {
+                "audio_url": artifact["audio_url"],
+                "duration": artifact["duration"],
+                "source_video_url": job.video_url,
+                "title": job.title,
+                "content_hash": artifact["content_hash"],
+                "deduplicated": deduplicated,
+                "sound_uid": sound_uid,
+                "message": "Audio extracted successfully",
+            }
+            job.set_status(COMPLETED)
+            self._metrics["completed"] += 1
+        except ExtractionError as e:
+            job.set_status(FAILED, str(e))
+            self._metrics["failed"] += 1
+        except Exception as e:
+            logger.error(f"Audio extraction job {job.id} failed: {e}")
+            job.set_status(FAILED, "Audio extraction failed")
+            self._metrics["failed"] += 1
+        finally:
+            await run_in_threadpool(shutil.rmtree, workdir, True)
+
+    async def _produce(self, job: ExtractionJob, workdir: str):
+        """(artifact, deduplicated): reuse a stored artifact when possible, else run ffmpeg."""
+        video_path = os.path.join(workdir, "source")
+        audio_path = os.path.join(workdir, "audio.aac")
+        store = self.store
+
+        async with self._download_slots:
+            job.set_status(DOWNLOADING)
+            fetched = await self._download(job.video_url, video_path)
+
+        if fetched["artifact"] is not None:
+            self._metrics["dedup_source_hits"] += 1
+            return fetched["artifact"], True
+
+        content_hash = fetched["content_hash"]
+        if store is not None:
+            artifact = await run_in_threadpool(store.get_by_content, content_hash)
+            if artifact is not None:
+                self._metrics["dedup_content_hits"] += 1
+                await run_in_threadpool(store.link_source, fetched["source_key"], content_hash)
+                return artifact, True
+
+        async with self._ffmpeg_slots:
+            job.set_status(EXTRACTING)
+            started = time.perf_counter()
+            try:
+                await self._extract(video_path, audio_path)
+                duration = await self._probe_duration(audio_path)
+            finally:
+                self._metrics["ffmpeg_seconds"] += time.perf_counter() - started
+
+        job.set_status(STORING)
+        artifact = await self._store_artifact(content_hash, audio_path, duration, job.base_url)
+        if store is not None:
+            await run_in_threadpool(store.link_source, fetched["source_key"], content_hash)
+            await run_in_threadpool(store.evict, self._pinned_urls)
+        return artifact, False
+
+    async def _download(self, url: str, dest: str) -> Dict[str, Any]:
+        """Stream *url* into *dest* chunk by chunk, hashing the bytes on the way.
+
+        Returns ``source_key`` (URL + ETag / Last-Modified), ``content_hash`` and
+        ``artifact``; when the store already knows the source key, the body is not
+        read at all and ``artifact`` is the stored one.
+        """
+        written = 0
+        digest = hashlib.sha256()
+        try:
+            async with httpx.AsyncClient(
+                timeout=httpx.Timeout(self.download_timeout, connect=10.0),
+                follow_redirects=True,
+                transport=self.transport,
+            ) as client:
+                with anyio.fail_after(self.download_timeout):
+                    async with client.stream("GET", url) as resp:
+                        if resp.status_code != 200:
+                            raise ExtractionError(f"Could not download video (HTTP {resp.status_code})")
+                        key = source_key(url, resp.headers.get("etag") or resp.headers.get("last-modified"))
+                        if self.store is not None and key is not None:
+                            artifact = await run_in_threadpool(self.store.get_by_source, key)
+                            if artifact is not None:
+                                return {"source_key": key, "content_hash": artifact["content_hash"],
+                                        "artifact": artifact}
+                        declared = int(resp.headers.get("content-length") or 0)
+                        if declared > self.max_download_bytes:
+                            raise ExtractionError("Video is too large")
+                        async with await anyio.open_file(dest, "wb") as f:
+                            async for chunk in resp.aiter_bytes(self.chunk_bytes):
+                                written += len(chunk)
+                                if written > self.max_download_bytes:
+                                    raise ExtractionError("Video is too large")
+                                digest.update(chunk)
+                                await f.write(chunk)
+        except TimeoutError:
+            raise ExtractionError("Timed out downloading video")
+        except httpx.RequestError as e:
+            raise ExtractionError(f"Network error downloading video: {e}")
+        finally:
+            self._metrics["bytes_downloaded"] += written
+        return {"source_key": key, "content_hash": digest.hexdigest(), "artifact": None}
+
+    async def _extract(self, video_path: str, audio_path: str) -> None:
+        code, _ = await self._exec(
+            self.ffmpeg_bin, "-y", "-i", video_path, "-vn", "-acodec", "aac", "-b:a", "128k", audio_path,
+        )
+        if code != 0:
+            # Fallback: copy audio stream without re-encoding
+            code, _ = await self._exec(
+                self.ffmpeg_bin, "-y", "-i", video_path, "-vn", "-acodec", "copy", audio_path,
+            )
+            if code != 0:
+                raise ExtractionError("FFmpeg failed to extract audio")
+
+    async def _probe_duration(self, audio_path: str) -> Optional[float]:
+        code, stdout = await self._exec(
+            self.ffprobe_bin, "-v", "quiet", "-print_format", "json", "-show_format", audio_path,
+        )
+        if code != 0:
+            return None
+        try:
+            return float(json.loads(stdout)["format"]["duration"])
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    async def _exec(self, *args: str):
+        """Run a subprocess without blocking the loop; killed on timeout or cancellation."""
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise ExtractionError(f"{os.path.basename(args[0])} is not installed on the server")
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), self.ffmpeg_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            if isinstance(e, asyncio.TimeoutError):
+                raise ExtractionError("Audio extraction timed out")
+            raise
+        return proc.returncode, stdout
+
+    async def _store_artifact(self, content_hash: str, audio_path: str,
+                              duration: Optional[float], base_url: str = "") -> Dict[str, Any]:
+        if os.getenv("CLOUDINARY_URL"):
+            location, size = REMOTE, 0
+            audio_url = await run_in_threadpool(self._upload_cloudinary, audio_path)
+        else:
+            location, size = LOCAL, os.path.getsize(audio_path)
+            name = SoundArtifactStore.file_name(content_hash)
+            await run_in_threadpool(os.makedirs, self.storage_dir, exist_ok=True)
+            await run_in_threadpool(shutil.move, audio_path, os.path.join(self.storage_dir, name))
+            audio_url = self.file_url(name, base_url)
+        if self.store is not None:
+            return await run_in_threadpool(self.store.put, content_hash, location, audio_url, duration, size)
+        return {"content_hash": content_hash, "audio_url": audio_url, "duration": duration}
+
+    @asynccontextmanager
+    async def _url_lock(self, url: str):
+        entry = self._url_locks.setdefault(url, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._url_locks.pop(url, None)
+
+    # ── Sounds ─────────────────────────────────────────
+
+    def _sound_uid_for(self, audio_url: str) -> Optional[str]:
+        """Uid of an existing Sound already using this audio, if any."""
+        db = self.session_factory()
+        try:
+            row = db.query(Sound.uid).filter(Sound.audio_url == audio_url).first()
+            return row[0] if row else None
+        finally:
+            db.close()
+
+    def _pinned_urls(self, urls: List[str]) -> Set[str]:
+        """Audio URLs referenced by a Sound; their files are never evicted."""
+        if not urls:
+            return set()
+        db = self.session_factory()
+        try:
+            rows = db.query(Sound.audio_url).filter(Sound.audio_url.in_(urls)).all()
+            return {r[0] for r in rows}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _upload_cloudinary(audio_path: str) -> str:
+        import cloudinary.uploader
+        upload_result = cloudinary.uploader.upload(
+            audio_path,
+            resource_type="video",  # Cloudinary uses "video" for audio files
+            folder="sounds/extracted",
+            format="aac",
+        )
+        return upload_result.get("secure_url", upload_result["url"])
+
+    # ── Local files ────────────────────────────────────
+
+    def file_url(self, name: str, base_url: str = "") -> str:
+        """Public URL of a stored file: AUDIO_PUBLIC_BASE_URL, else *base_url*, as prefix."""
+        return f"{self.public_base_url or base_url.rstrip('/')}{FILES_ROUTE}/{name}"
+
+    def check_storage(self) -> None:
+        """Log where extracted audio will live; local files do not survive a redeploy."""
+        if os.getenv("CLOUDINARY_URL"):
+            return
+        if IS_PRODUCTION:
+            logger.error(
+                "CLOUDINARY_URL is not set: extracted audio is stored under %s on the "
+                "container's ephemeral disk and will be lost on the next redeploy",
+                self.storage_dir,
+            )
+        if not self.public_base_url:
+            logger.warning("AUDIO_PUBLIC_BASE_URL is not set: extracted audio URLs use the request host")
+
+    def file_path(self, name: str) -> Optional[str]:
+        """Absolute path of a stored audio file, or None for unknown / unsafe names."""
+        if not name or os.path.basename(name) != name or not name.endswith(".aac"):
+            return None
+        path = os.path.join(self.storage_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in list(self._jobs.values()):
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "jobs": statuses,
+            "store": self._store.stats() if self._store is not None else None,
+            "workers": self.workers,
+            "max_downloads": self.max_downloads,
+            "max_pending": self.max_pending,
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self._metrics.items()},
+        }
+
+
+extractor = AudioExtractor()
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from jose import jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from .database import get_db
+from .database import get_db, get_async_db
 from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from . import models
+from . import models, auth_cache
 from .schemas import UserCreate, LoginRequest, AuthResponse, UserOut, RefreshTokenRequest, PasswordResetRequest, PasswordResetConfirm
 import httpx
 import uuid
@@ -144,9 +147,68 @@ from pydantic import BaseModel as _PydanticBase
 class GoogleSignInRequest(_PydanticBase):
     id_token: str
 
+
+async def _find_or_create_social_user(
+    db: AsyncSession,
+    email: str,
+    base_username: str,
+    display_name: str | None = None,
+    picture: str | None = None,
+) -> models.User:
+    """
+    Shared by the Google / Apple / Facebook sign-ins.
+
+    Existing user → fill in the profile picture if missing (admins are refused).
+    New user → auto-register with a unique username, a random password and role "user".
+    """
+    user = await db.scalar(select(models.User).where(models.User.email == email))
+    if user:
+        # Admin accounts must never sign in through a social provider
+        if user.role == "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin accounts must use credential login"
+            )
+        if not user.profile_image_url and picture:
+            user.profile_image_url = picture
+            user.updated_at = datetime.utcnow()
+            await db.commit()
+            await db.refresh(user)
+        return user
+
+    username = base_username
+    counter = 1
+    while await db.scalar(select(models.User.id).where(models.User.username == username)):
+        username = f"{base_username}_{counter}"
+        counter += 1
+
+    # Random password (they'll use the provider to sign in); bcrypt is CPU-bound, keep it off the loop
+    import secrets
+    password_hash = await run_in_threadpool(pwd_context.hash, secrets.token_urlsafe(32))
+
+    try:
+        user = models.User(
+            email=email,
+            username=username,
+            display_name=display_name or username,
+            password_hash=password_hash,
+            profile_image_url=picture or None,
+            role="user",  # Never admin via social sign-in
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    except IntegrityError:
+        await db.rollback()
+        # Race condition — user was just created by another request
+        user = await db.scalar(select(models.User).where(models.User.email == email))
+        if not user:
+            raise HTTPException(status_code=500, detail="Registration failed")
+    return user
+
 @router.post("/google-signin", response_model=AuthResponse)
 @limiter.limit("10/minute")
-async def google_signin(request: Request, payload: GoogleSignInRequest, db: Session = Depends(get_db)):
+async def google_signin(request: Request, payload: GoogleSignInRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate or register a user via Google Sign-In.
     
@@ -194,55 +256,14 @@ async def google_signin(request: Request, payload: GoogleSignInRequest, db: Sess
             detail="Could not verify Google token (network error)"
         )
     
-    # Step 2: Find or create user
-    user = db.query(models.User).filter(models.User.email == google_email).first()
-    
-    if user:
-        # Existing user — block admin accounts from Google Sign-In
-        if user.role == "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Admin accounts must use credential login"
-            )
-        
-        # Update profile picture if not set
-        if not user.profile_image_url and google_picture:
-            user.profile_image_url = google_picture
-            user.updated_at = datetime.utcnow()
-            db.commit()
-            db.refresh(user)
-    else:
-        # New user — auto-register
-        # Generate unique username from Google name or email
-        base_username = google_name.replace(" ", "_").lower()[:40] if google_name else google_email.split("@")[0]
-        username = base_username
-        counter = 1
-        while db.query(models.User).filter(models.User.username == username).first():
-            username = f"{base_username}_{counter}"
-            counter += 1
-        
-        # Create user with a random password hash (they'll use Google to sign in)
-        import secrets
-        random_password = secrets.token_urlsafe(32)
-        
-        try:
-            user = models.User(
-                email=google_email,
-                username=username,
-                display_name=google_name or google_email.split("@")[0],
-                password_hash=pwd_context.hash(random_password),
-                profile_image_url=google_picture or None,
-                role="user",  # Never admin via Google
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        except IntegrityError:
-            db.rollback()
-            # Race condition — user was just created by another request
-            user = db.query(models.User).filter(models.User.email == google_email).first()
-            if not user:
-                raise HTTPException(status_code=500, detail="Registration failed")
+    # Step 2: Find or create user (username from Google name or email)
+    user = await _find_or_create_social_user(
+        db,
+        email=google_email,
+        base_username=google_name.replace(" ", "_").lower()[:40] if google_name else google_email.split("@")[0],
+        display_name=google_name or google_email.split("@")[0],
+        picture=google_picture,
+    )
     
     # Step 3: Issue JWT tokens (same as regular login)
     token_data = {"sub": user.uid, "role": user.role}
@@ -260,48 +281,47 @@ async def google_signin(request: Request, payload: GoogleSignInRequest, db: Sess
 from fastapi import Header
 from jose import JWTError
 
-@router.get("/me", response_model=UserOut)
-def me(authorization: str | None = Header(default=None), db: Session = Depends(get_db)):
+def _resolve_bearer(authorization: str | None, db: Session) -> tuple[str, str | None]:
+    """Return ``(uid, jti)`` for a valid, non-revoked bearer token.
+
+    Verified tokens and the revocation set are served from auth_cache, so the
+    common path does no JWT decode and no revoked_tokens query.
+    """
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
     token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        uid = payload.get("sub")
-        if not uid:
+    cached = auth_cache.get_token(token)
+    if cached:
+        uid, jti = cached
+    else:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            uid = payload.get("sub")
+            if not uid:
+                raise HTTPException(status_code=401, detail="Invalid token")
+        except JWTError:
             raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        jti = payload.get("jti")
+        auth_cache.put_token(token, payload)
 
     # H-3: Check if token has been revoked (blacklisted)
-    jti = payload.get("jti")
-    if jti and db.query(models.RevokedToken).filter(models.RevokedToken.jti == jti).first():
+    if auth_cache.is_revoked(db, jti):
         raise HTTPException(status_code=401, detail="Token has been revoked")
+    return uid, jti
+
 
-    user = db.query(models.User).filter(models.User.uid == uid).first()
+@router.get("/me", response_model=UserOut)
+def me(authorization: str | None = Header(default=None), db: Session = Depends(get_db)):
+    uid, _ = _resolve_bearer(authorization, db)
+    user = auth_cache.get_user(db, uid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user_to_out(user)
 
 # Dependency to get the current authenticated user (for protected routes)
 def get_current_user(authorization: str | None = Header(default=None), db: Session = Depends(get_db)) -> models.User:
-    if not authorization or not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        uid = payload.get("sub")
-        if not uid:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    # H-3: Check if token has been revoked (blacklisted)
-    jti = payload.get("jti")
-    if jti and db.query(models.RevokedToken).filter(models.RevokedToken.jti == jti).first():
-        raise HTTPException(status_code=401, detail="Token has been revoked")
-
-    user = db.query(models.User).filter(models.User.uid == uid).first()
+    uid, _ = _resolve_bearer(authorization, db)
+    user = auth_cache.get_user(db, uid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -348,12 +368,8 @@ def get_current_user_optional(authorization: str | None = Header(default=None),
         token = authorization.split(" ", 1)[1]
         if not token:
             return None
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_uid: str = payload.get("sub")
-        if not user_uid:
-            return None
-        user = db.query(models.User).filter(models.User.uid == user_uid).first()
-        return user
+        user_uid, _ = _resolve_bearer(authorization, db)
+        return auth_cache.get_user(db, user_uid)
     except:
         return None
 
@@ -400,8 +416,7 @@ def get_current_admin_user(
         )
     
     # H-3: Check if token has been revoked (blacklisted)
-    jti = payload.get("jti")
-    if jti and db.query(models.RevokedToken).filter(models.RevokedToken.jti == jti).first():
+    if auth_cache.is_revoked(db, payload.get("jti")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Admin token has been revoked"
@@ -672,6 +687,7 @@ def logout(
     )
     db.add(revoked)
     db.commit()
+    auth_cache.revoke(jti, expires_at)
     
     return {"message": "Successfully logged out"}
 
@@ -699,7 +715,7 @@ class AppleSignInRequest(_PydanticBase):
 
 @router.post("/apple-signin", response_model=AuthResponse)
 @limiter.limit("10/minute")
-async def apple_signin(request: Request, payload: AppleSignInRequest, db: Session = Depends(get_db)):
+async def apple_signin(request: Request, payload: AppleSignInRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate or register a user via Sign in with Apple.
 
@@ -773,35 +789,12 @@ async def apple_signin(request: Request, payload: AppleSignInRequest, db: Sessio
         apple_email = f"apple_{apple_sub}@privaterelay.appleid.com"
 
     # Find or create user
-    user = db.query(models.User).filter(models.User.email == apple_email).first()
-    if user:
-        if user.role == "admin":
-            raise HTTPException(status_code=403, detail="Admin accounts must use credential login")
-    else:
-        base_username = apple_email.split("@")[0][:40]
-        username = base_username
-        counter = 1
-        while db.query(models.User).filter(models.User.username == username).first():
-            username = f"{base_username}_{counter}"
-            counter += 1
-
-        import secrets as _secrets
-        try:
-            user = models.User(
-                email=apple_email,
-                username=username,
-                display_name=claims.get("name", username),
-                password_hash=pwd_context.hash(_secrets.token_urlsafe(32)),
-                role="user",
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        except IntegrityError:
-            db.rollback()
-            user = db.query(models.User).filter(models.User.email == apple_email).first()
-            if not user:
-                raise HTTPException(status_code=500, detail="Registration failed")
+    user = await _find_or_create_social_user(
+        db,
+        email=apple_email,
+        base_username=apple_email.split("@")[0][:40],
+        display_name=claims.get("name"),
+    )
 
     token_data = {"sub": user.uid, "role": user.role}
     token, expires_in = create_access_token(token_data)
@@ -824,7 +817,7 @@ class FacebookSignInRequest(_PydanticBase):
 
 @router.post("/facebook-signin", response_model=AuthResponse)
 @limiter.limit("10/minute")
-async def facebook_signin(request: Request, payload: FacebookSignInRequest, db: Session = Depends(get_db)):
+async def facebook_signin(request: Request, payload: FacebookSignInRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate or register a user via Facebook Login.
 
@@ -852,41 +845,13 @@ async def facebook_signin(request: Request, payload: FacebookSignInRequest, db:
     fb_picture = fb_data.get("picture", {}).get("data", {}).get("url") if isinstance(fb_data.get("picture"), dict) else None
 
     # Find or create user
-    user = db.query(models.User).filter(models.User.email == fb_email).first()
-    if user:
-        if user.role == "admin":
-            raise HTTPException(status_code=403, detail="Admin accounts must use credential login")
-        if not user.profile_image_url and fb_picture:
-            user.profile_image_url = fb_picture
-            user.updated_at = datetime.utcnow()
-            db.commit()
-            db.refresh(user)
-    else:
-        base_username = (fb_name.replace(" ", "_").lower()[:40] if fb_name else fb_email.split("@")[0])
-        username = base_username
-        counter = 1
-        while db.query(models.User).filter(models.User.username == username).first():
-            username = f"{base_username}_{counter}"
-            counter += 1
-
-        import secrets as _secrets
-        try:
-            user = models.User(
-                email=fb_email,
-                username=username,
-                display_name=fb_name or username,
-                password_hash=pwd_context.hash(_secrets.token_urlsafe(32)),
-                profile_image_url=fb_picture or None,
-                role="user",
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        except IntegrityError:
-            db.rollback()
-            user = db.query(models.User).filter(models.User.email == fb_email).first()
-            if not user:
-                raise HTTPException(status_code=500, detail="Registration failed")
+    user = await _find_or_create_social_user(
+        db,
+        email=fb_email,
+        base_username=(fb_name.replace(" ", "_").lower()[:40] if fb_name else fb_email.split("@")[0]),
+        display_name=fb_name or None,
+        picture=fb_picture,
+    )
 
     token_data = {"sub": user.uid, "role": user.role}
     token, expires_in = create_access_token(token_data)
@@ -0,0 +1,189 @@
+"""
+In-process caches for the authentication hot path.
+
+Every protected request used to decode the JWT, look its jti up in
+revoked_tokens and load the User row: two round trips before the handler ran.
+This module keeps three small caches so a hot user costs zero queries:
+
+- decoded tokens:  raw bearer token -> (uid, jti), never outliving the token's exp
+- users:           uid -> column snapshot, re-attached to the request session
+                   with ``Session.merge(load=False)`` (no SELECT)
+- revocations:     set of revoked jtis, synced incrementally from revoked_tokens
+
+Invalidation:
+- ``/auth/logout`` adds the jti to the local set immediately; other workers
+  pick it up on their next sync (at most AUTH_REVOCATION_SYNC_SECONDS later).
+- Any flush that updates or deletes a User evicts that uid when the session
+  commits, so profile edits and ``DELETE /users/me`` are visible on this worker
+  straight away. Core ``update(User)`` statements (unread badge counter, FCM
+  token pruning) bypass the flush and call ``evict_users_on_commit`` with the
+  uids they RETURNING'd. Changes made by other workers become visible within
+  AUTH_USER_CACHE_TTL_SECONDS.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from .config import (
+    AUTH_CACHE_MAX_ENTRIES,
+    AUTH_USER_CACHE_TTL_SECONDS,
+    AUTH_REVOCATION_SYNC_SECONDS,
+)
+from . import models
+from .cache import TTLCache
+
+# Re-read revocations this far behind the last sync so rows committed late
+# (transaction opened before the previous sync) are not missed.
+_REVOCATION_SYNC_OVERLAP = timedelta(seconds=60)
+
+
+_tokens = TTLCache(AUTH_CACHE_MAX_ENTRIES)
+_users = TTLCache(AUTH_CACHE_MAX_ENTRIES)
+
+
+# ── Decoded tokens ──────────────────────────────────────
+
+def get_token(token: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Return the cached ``(uid, jti)`` for a previously verified token."""
+    return _tokens.get(token)
+
+
+def put_token(token: str, payload: Dict[str, Any]) -> None:
+    """Remember a verified token until its own ``exp`` (or the cache TTL, if sooner)."""
+    uid = payload.get("sub")
+    exp = payload.get("exp")
+    if not uid or not exp:
+        return
+    ttl = min(AUTH_USER_CACHE_TTL_SECONDS, exp - time.time())
+    _tokens.set(token, (uid, payload.get("jti")), ttl)
+
+
+# ── Users ───────────────────────────────────────────────
+
+_USER_COLUMNS = [attr.key for attr in inspect(models.User).column_attrs]
+
+
+def get_user(db: Session, uid: str) -> Optional[models.User]:
+    """Load a user by uid, served from the cache when possible.
+
+    A cache hit rebuilds the row from its snapshot and merges it into *db*
+    without emitting a SELECT, so handlers can still modify and commit it.
+    """
+    snapshot = _users.get(uid)
+    if snapshot is not None:
+        user = models.User(**snapshot)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    user = db.query(models.User).filter(models.User.uid == uid).first()
+    if user is not None:
+        _users.set(uid, {key: getattr(user, key) for key in _USER_COLUMNS}, AUTH_USER_CACHE_TTL_SECONDS)
+    return user
+
+
+def evict_user(uid: str) -> None:
+    _users.pop(uid)
+
+
+_EVICT_ON_COMMIT_KEY = "auth_cache_evict_uids"
+
+
+def evict_users_on_commit(db: Session, uids: Iterable[str]) -> None:
+    """Evict *uids* once *db* commits (for Core UPDATEs that skip the flush events).
+
+    Evicting at commit rather than now keeps a concurrent request from caching
+    the pre-update row again before the new values are visible.
+    """
+    db.info.setdefault(_EVICT_ON_COMMIT_KEY, set()).update(uid for uid in uids if uid)
+
+
+@event.listens_for(Session, "after_flush")
+def _evict_flushed_users(session: Session, flush_context) -> None:
+    # Handlers bump counters on the cached user in Python (following_count, ...):
+    # evicting before commit would let a concurrent request re-cache the old row.
+    evict_users_on_commit(session, (
+        obj.uid for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, models.User)
+    ))
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed_users(session: Session) -> None:
+    for uid in session.info.pop(_EVICT_ON_COMMIT_KEY, ()):
+        evict_user(uid)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_uncommitted_evictions(session: Session) -> None:
+    session.info.pop(_EVICT_ON_COMMIT_KEY, None)
+
+
+# ── Revocations ─────────────────────────────────────────
+
+class _RevocationSet:
+    """Versioned in-memory copy of revoked_tokens (jti -> expires_at).
+
+    The version is the ``revoked_at`` watermark of the last sync; each sync only
+    reads rows newer than it, so the steady-state cost is one indexed range
+    query every AUTH_REVOCATION_SYNC_SECONDS per worker instead of one per request.
+    """
+
+    def __init__(self):
+        self._jtis: Dict[str, datetime] = {}
+        self._version: Optional[datetime] = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: datetime) -> None:
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        if time.monotonic() - self._synced_at >= AUTH_REVOCATION_SYNC_SECONDS:
+            self._sync(db)
+        return jti in self._jtis
+
+    def reset(self) -> None:
+        with self._lock:
+            self._jtis.clear()
+            self._version = None
+            self._synced_at = 0.0
+
+    def _sync(self, db: Session) -> None:
+        now = datetime.utcnow()
+        query = db.query(models.RevokedToken.jti, models.RevokedToken.expires_at).filter(
+            models.RevokedToken.expires_at > now
+        )
+        if self._version is not None:
+            query = query.filter(models.RevokedToken.revoked_at >= self._version - _REVOCATION_SYNC_OVERLAP)
+        rows = query.all()
+        with self._lock:
+            for jti, expires_at in rows:
+                self._jtis[jti] = expires_at
+            # Drop entries whose tokens could no longer be presented anyway
+            self._jtis = {j: exp for j, exp in self._jtis.items() if exp > now}
+            self._version = now
+            self._synced_at = time.monotonic()
+
+
+revocations = _RevocationSet()
+
+
+def revoke(jti: str, expires_at: datetime) -> None:
+    """Record a logout on this worker without waiting for the next sync."""
+    revocations.add(jti, expires_at)
+
+
+def is_revoked(db: Session, jti: Optional[str]) -> bool:
+    return bool(jti) and revocations.is_revoked(db, jti)
+
+
+def clear() -> None:
+    """Drop every cached entry (tests, admin tooling)."""
+    _tokens.clear()
+    _users.clear()
+    revocations.reset()
@@ -0,0 +1,20 @@
+"""
+Batch loaders for list serializers.
+
+List endpoints used to resolve the related user once per row (N+1). These
+helpers fetch everything a page needs in one IN query, keyed for O(1) lookup
+while mapping.
+"""
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from .models import User
+
+
+def users_by_id(db: Session, user_ids: Iterable[Optional[int]]) -> Dict[int, User]:
+    """``{user.id: user}`` for every non-null id in *user_ids* (one query)."""
+    ids = {i for i in user_ids if i is not None}
+    if not ids:
+        return {}
+    return {u.id: u for u in db.query(User).filter(User.id.in_(ids)).all()}
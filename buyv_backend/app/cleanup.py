@@ -3,17 +3,18 @@ API endpoint pour nettoyer les posts invalides
 Protected: Admin-only access required
 """
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_async_db
 from .models import Post, User
 from .auth import get_current_admin_user
 
 router = APIRouter(prefix="/cleanup", tags=["cleanup"])
 
 @router.get("/check-invalid-posts")
-async def check_invalid_posts(db: Session = Depends(get_db), admin: User = Depends(get_current_admin_user)):
+async def check_invalid_posts(db: AsyncSession = Depends(get_async_db), admin: User = Depends(get_current_admin_user)):
     """Vérifie les posts avec URLs invalides"""
-    all_posts = db.query(Post).filter(Post.type.in_(['reel', 'video'])).all()
+    all_posts = (await db.scalars(select(Post).where(Post.type.in_(['reel', 'video'])))).all()
     invalid_posts = []
     
     for post in all_posts:
@@ -41,9 +42,9 @@ async def check_invalid_posts(db: Session = Depends(get_db), admin: User = Depen
     }
 
 @router.delete("/delete-invalid-posts")
-async def delete_invalid_posts(db: Session = Depends(get_db), admin: User = Depends(get_current_admin_user)):
+async def delete_invalid_posts(db: AsyncSession = Depends(get_async_db), admin: User = Depends(get_current_admin_user)):
     """Supprime les posts avec URLs invalides"""
-    all_posts = db.query(Post).filter(Post.type.in_(['reel', 'video'])).all()
+    all_posts = (await db.scalars(select(Post).where(Post.type.in_(['reel', 'video'])))).all()
     deleted_count = 0
     
     for post in all_posts:
@@ -56,12 +57,14 @@ async def delete_invalid_posts(db: Session = Depends(get_db), admin: User = Depe
             is_invalid = True
         
         if is_invalid:
-            db.delete(post)
+            await db.delete(post)
             deleted_count += 1
     
-    db.commit()
+    await db.commit()
     
-    remaining = db.query(Post).filter(Post.type.in_(['reel', 'video'])).count()
+    remaining = await db.scalar(
+        select(func.count()).select_from(Post).where(Post.type.in_(['reel', 'video']))
+    )
     
     return {
         "deleted_count": deleted_count,
@@ -8,6 +8,7 @@ from .database import get_db
 from .models import User, Post, Comment, CommentLike
 from .auth import get_current_user, get_current_user_optional
 from .schemas import CommentCreate, CommentOut
+from . import interactions
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
@@ -161,42 +162,46 @@ def toggle_like_comment(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Toggle like on a comment. If already liked, unlike it; otherwise, like it."""
-    # Find the post
-    post = db.query(Post).filter(Post.uid == post_uid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    """Toggle like on a comment. If already liked, unlike it; otherwise, like it.
 
-    # Find the comment
-    comment = db.query(Comment).filter(
+    DELETE the like, or INSERT it (ON CONFLICT DO NOTHING) when there was none,
+    then move comments.likes_count in SQL only if a row changed.
+    """
+    comment_id = db.query(Comment.id).join(Post, Post.id == Comment.post_id).filter(
         Comment.id == comment_id,
-        Comment.post_id == post.id
-    ).first()
-    if not comment:
+        Post.uid == post_uid
+    ).scalar()
+    if comment_id is None:
+        if db.query(Post.id).filter(Post.uid == post_uid).scalar() is None:
+            raise HTTPException(status_code=404, detail="Post not found")
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    existing_like = db.query(CommentLike).filter(
-        and_(
-            CommentLike.comment_id == comment.id,
-            CommentLike.user_id == current_user.id
-        )
-    ).first()
-
-    if existing_like:
+    likes = CommentLike.__table__
+    removed = db.execute(
+        likes.delete().where(likes.c.comment_id == comment_id, likes.c.user_id == current_user.id)
+    ).rowcount
+    if removed:
         # Unlike
-        db.delete(existing_like)
-        comment.likes_count = max((comment.likes_count or 0) - 1, 0)
+        likes_count = interactions.bump_counter(db, Comment.likes_count, comment_id, -1)
         is_liked = False
     else:
         # Like
-        like = CommentLike(comment_id=comment.id, user_id=current_user.id)
-        db.add(like)
-        comment.likes_count = (comment.likes_count or 0) + 1
+        inserted = db.execute(
+            interactions.insert_ignoring_conflict(db, CommentLike)
+            .values(comment_id=comment_id, user_id=current_user.id, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["comment_id", "user_id"])
+            .returning(likes.c.id)
+        ).scalar()
+        if inserted is not None:
+            likes_count = interactions.bump_counter(db, Comment.likes_count, comment_id, 1)
+        else:
+            # A concurrent request liked it first
+            likes_count = db.query(Comment.likes_count).filter(Comment.id == comment_id).scalar() or 0
         is_liked = True
 
     db.commit()
 
     return {
         "is_liked": is_liked,
-        "likes_count": comment.likes_count or 0
+        "likes_count": likes_count
     }
@@ -7,16 +7,23 @@ from .database import get_db
 from .models import User, Commission
 from .auth import get_current_user, get_current_admin_user
 from .schemas import CommissionOut, StatusUpdate
+from .batch_loaders import users_by_id
 
 router = APIRouter(prefix="/commissions", tags=["commissions"])
 
 
-def _map_commission_out(row: Commission, db: Session) -> dict:
+def _map_commissions_out(rows: list[Commission], db: Session) -> list[dict]:
+    """Map a page of commissions, resolving all user UIDs in one query."""
+    users = users_by_id(db, (r.user_id for r in rows))
+    return [_map_commission_out(row, db, users) for row in rows]
+
+
+def _map_commission_out(row: Commission, db: Session, users: dict | None = None) -> dict:
     # Resolve user UID
-    uid = None
-    if row.user_id:
-        u = db.query(User).filter(User.id == row.user_id).first()
-        uid = u.uid if u else None
+    if users is None:
+        users = users_by_id(db, [row.user_id])
+    u = users.get(row.user_id)
+    uid = u.uid if u else None
     if not uid:
         uid = row.user_uid
 
@@ -52,7 +59,7 @@ def list_my_commissions(db: Session = Depends(get_db), current_user: User = Depe
         .order_by(Commission.created_at.desc())
         .all()
     )
-    return [_map_commission_out(row, db) for row in rows]
+    return _map_commissions_out(rows, db)
 
 
 @router.post("/{commission_id}/status")
@@ -50,6 +50,101 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./buyv.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Following feed: authors with more followers than this are not fanned out on write;
+# their posts are merged into followers' timelines at read time instead.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", "5000"))
+
+# Auth hot-path caches (see app/auth_cache.py): how long a resolved user may be
+# served without a DB read, how often each worker re-syncs revoked tokens, and
+# the max entries per cache.
+AUTH_USER_CACHE_TTL_SECONDS = int(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+AUTH_REVOCATION_SYNC_SECONDS = int(os.getenv("AUTH_REVOCATION_SYNC_SECONDS", "5"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+# Tracking ingest (see app/tracking_ingest.py): /track/view and /track/click are
+# buffered in memory and written in batches every FLUSH_INTERVAL_MS or BATCH_SIZE
+# events, whichever comes first. Events beyond QUEUE_MAX_EVENTS are dropped. A batch
+# whose write fails goes back to the front of the buffer and is retried up to
+# FLUSH_MAX_RETRIES times, RETRY_BACKOFF_MS apart (doubling), before it is dropped.
+TRACKING_FLUSH_INTERVAL_MS = int(os.getenv("TRACKING_FLUSH_INTERVAL_MS", "500"))
+TRACKING_FLUSH_BATCH_SIZE = int(os.getenv("TRACKING_FLUSH_BATCH_SIZE", "500"))
+TRACKING_QUEUE_MAX_EVENTS = int(os.getenv("TRACKING_QUEUE_MAX_EVENTS", "50000"))
+TRACKING_DEDUP_WINDOW_SECONDS = int(os.getenv("TRACKING_DEDUP_WINDOW_SECONDS", "1800"))
+TRACKING_FLUSH_MAX_RETRIES = int(os.getenv("TRACKING_FLUSH_MAX_RETRIES", "5"))
+TRACKING_RETRY_BACKOFF_MS = int(os.getenv("TRACKING_RETRY_BACKOFF_MS", "500"))
+
+# Write-behind counters (see app/counters.py): product views, sound usage and
+# promotion view/click counters are summed in memory and written as one batched
+# UPDATE per column every FLUSH_INTERVAL_MS, or sooner once MAX_KEYS rows are dirty.
+COUNTER_FLUSH_INTERVAL_MS = int(os.getenv("COUNTER_FLUSH_INTERVAL_MS", "1000"))
+COUNTER_FLUSH_MAX_KEYS = int(os.getenv("COUNTER_FLUSH_MAX_KEYS", "5000"))
+
+# Public catalog response cache (see app/response_cache.py): serialized bodies of
+# categories, featured products, sound genres and trending sounds, per worker.
+# Admin writes invalidate them; the TTL bounds staleness for everything else.
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+
+# Promoter analytics rollups (see app/analytics_rollup.py): how often closed days
+# are compacted into promoter_daily_stats, and how many trailing days each run
+# re-derives to pick up late conversions / commission status changes.
+ROLLUP_COMPACTION_INTERVAL_SECONDS = int(os.getenv("ROLLUP_COMPACTION_INTERVAL_SECONDS", "3600"))
+ROLLUP_RECOMPACT_DAYS = int(os.getenv("ROLLUP_RECOMPACT_DAYS", "7"))
+
+# Follow suggestions (see app/suggestions.py): how often user_suggestions is rebuilt
+# from second-degree follows, how many candidates are kept per user, how many users
+# each batch covers, and the weight of log(1 + followers) next to the mutual count.
+SUGGESTIONS_REBUILD_INTERVAL_SECONDS = int(os.getenv("SUGGESTIONS_REBUILD_INTERVAL_SECONDS", "3600"))
+SUGGESTIONS_PER_USER = int(os.getenv("SUGGESTIONS_PER_USER", "50"))
+SUGGESTIONS_BATCH_USERS = int(os.getenv("SUGGESTIONS_BATCH_USERS", "500"))
+SUGGESTIONS_POPULARITY_WEIGHT = float(os.getenv("SUGGESTIONS_POPULARITY_WEIGHT", "0.5"))
+
+# Admin dashboard stats snapshot lifetime; stale snapshots are served while one
+# background refresh runs (see app/dashboard_stats.py).
+DASHBOARD_STATS_TTL_SECONDS = int(os.getenv("DASHBOARD_STATS_TTL_SECONDS", "60"))
+
+# Search backend (see app/search_index.py): "auto" uses Postgres tsvector + pg_trgm
+# or SQLite FTS5 depending on the database; "like" forces the plain ILIKE fallback.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+
+# Push dispatcher (see app/push_dispatcher.py): FCM sends leave the request path and
+# are coalesced into send_multicast chunks of at most PUSH_BATCH_SIZE tokens (the FCM
+# limit), sent by PUSH_WORKERS threads and retried PUSH_MAX_RETRIES times with
+# exponential backoff. PUSH_BACKEND=fake swaps Firebase for an in-memory recorder.
+PUSH_BACKEND = os.getenv("PUSH_BACKEND", "firebase").lower()
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", "4"))
+PUSH_BATCH_SIZE = int(os.getenv("PUSH_BATCH_SIZE", "500"))
+PUSH_FLUSH_INTERVAL_MS = int(os.getenv("PUSH_FLUSH_INTERVAL_MS", "250"))
+PUSH_QUEUE_MAX_JOBS = int(os.getenv("PUSH_QUEUE_MAX_JOBS", "10000"))
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "3"))
+PUSH_RETRY_BACKOFF_MS = int(os.getenv("PUSH_RETRY_BACKOFF_MS", "500"))
+
+# Audio extraction jobs (see app/audio_extract.py): videos are streamed to disk,
+# at most AUDIO_EXTRACT_WORKERS ffmpeg processes run at once, and results are stored
+# on Cloudinary (when CLOUDINARY_URL is set) or under AUDIO_STORAGE_DIR, served with
+# AUDIO_PUBLIC_BASE_URL as prefix (the submitting request's host when unset, so the
+# mobile client always gets an absolute URL). Submissions past the pending limits get a 429.
+# Railway / Render disks are ephemeral: local files disappear on every redeploy, so set
+# CLOUDINARY_URL in production (startup logs an error when it is missing).
+AUDIO_EXTRACT_WORKERS = int(os.getenv("AUDIO_EXTRACT_WORKERS", "2"))
+AUDIO_EXTRACT_MAX_DOWNLOADS = int(os.getenv("AUDIO_EXTRACT_MAX_DOWNLOADS", "4"))
+AUDIO_EXTRACT_MAX_PENDING = int(os.getenv("AUDIO_EXTRACT_MAX_PENDING", "20"))
+AUDIO_EXTRACT_MAX_PENDING_PER_USER = int(os.getenv("AUDIO_EXTRACT_MAX_PENDING_PER_USER", "2"))
+AUDIO_EXTRACT_CHUNK_BYTES = int(os.getenv("AUDIO_EXTRACT_CHUNK_BYTES", str(256 * 1024)))
+AUDIO_EXTRACT_MAX_DOWNLOAD_MB = int(os.getenv("AUDIO_EXTRACT_MAX_DOWNLOAD_MB", "200"))
+AUDIO_EXTRACT_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("AUDIO_EXTRACT_DOWNLOAD_TIMEOUT_SECONDS", "120"))
+AUDIO_EXTRACT_FFMPEG_TIMEOUT_SECONDS = float(os.getenv("AUDIO_EXTRACT_FFMPEG_TIMEOUT_SECONDS", "120"))
+AUDIO_EXTRACT_JOB_RETENTION_SECONDS = int(os.getenv("AUDIO_EXTRACT_JOB_RETENTION_SECONDS", "3600"))
+AUDIO_STORAGE_DIR = os.getenv("AUDIO_STORAGE_DIR", "./media/sounds")
+AUDIO_PUBLIC_BASE_URL = os.getenv("AUDIO_PUBLIC_BASE_URL", "")
+
+# Extracted audio dedup (see app/sound_store.py): artifacts are keyed by the hash of
+# the source video and by URL + ETag; local files past AUDIO_DEDUP_DISK_BUDGET_MB are
+# evicted least recently used first. The index defaults to AUDIO_STORAGE_DIR/index.db.
+AUDIO_DEDUP_ENABLED = os.getenv("AUDIO_DEDUP_ENABLED", "true").lower() in ("true", "1", "yes")
+AUDIO_DEDUP_DISK_BUDGET_MB = int(os.getenv("AUDIO_DEDUP_DISK_BUDGET_MB", "2048"))
+AUDIO_DEDUP_INDEX_PATH = os.getenv("AUDIO_DEDUP_INDEX_PATH", "")
+
 # Cloudinary Configuration
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "")
 CLOUDINARY_UPLOAD_PRESET = os.getenv("CLOUDINARY_UPLOAD_PRESET", "")
@@ -59,6 +154,43 @@ CJ_API_KEY = os.getenv("CJ_API_KEY", "")
 CJ_ACCOUNT_ID = os.getenv("CJ_ACCOUNT_ID", "")
 CJ_EMAIL = os.getenv("CJ_EMAIL", "")
 
+# CJ HTTP client (see app/marketplace/cj_service.py): one pooled keep-alive client per
+# worker, opened on the first CJ call and closed with the app lifespan. HTTP/2 is used
+# when the h2 package is installed (httpx[http2]).
+CJ_HTTP2 = os.getenv("CJ_HTTP2", "true").lower() in ("true", "1", "yes")
+CJ_MAX_CONNECTIONS = int(os.getenv("CJ_MAX_CONNECTIONS", "20"))
+CJ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CJ_MAX_KEEPALIVE_CONNECTIONS", "10"))
+CJ_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("CJ_KEEPALIVE_EXPIRY_SECONDS", "30"))
+CJ_TIMEOUT_SECONDS = float(os.getenv("CJ_TIMEOUT_SECONDS", "30"))
+CJ_CONNECT_TIMEOUT_SECONDS = float(os.getenv("CJ_CONNECT_TIMEOUT_SECONDS", "10"))
+
+# CJ catalog cache (see app/marketplace/cj_cache.py): "memory" (per-worker LRU),
+# "sqlite" (LRU in front of a SQLite file shared by the workers on one host) or "none".
+# Entries are fresh for their endpoint TTL, then served stale for up to
+# CJ_CACHE_STALE_SECONDS while one background request revalidates them.
+CJ_CACHE_BACKEND = os.getenv("CJ_CACHE_BACKEND", "memory").lower()
+CJ_CACHE_SQLITE_PATH = os.getenv("CJ_CACHE_SQLITE_PATH", "./cj_cache.db")
+CJ_CACHE_MAX_ENTRIES = int(os.getenv("CJ_CACHE_MAX_ENTRIES", "2000"))
+CJ_CACHE_STALE_SECONDS = int(os.getenv("CJ_CACHE_STALE_SECONDS", "3600"))
+CJ_CACHE_TTL_SEARCH_SECONDS = int(os.getenv("CJ_CACHE_TTL_SEARCH_SECONDS", "300"))
+CJ_CACHE_TTL_PRODUCT_SECONDS = int(os.getenv("CJ_CACHE_TTL_PRODUCT_SECONDS", "900"))
+CJ_CACHE_TTL_CATEGORIES_SECONDS = int(os.getenv("CJ_CACHE_TTL_CATEGORIES_SECONDS", "86400"))
+
+# Marketplace product list totals (see app/marketplace/product_counts.py): totals are
+# cached per filter signature and dropped on product writes; on Postgres a cache miss
+# uses the planner's row estimate instead of COUNT(*) once it exceeds the threshold.
+PRODUCT_COUNT_CACHE_TTL_SECONDS = int(os.getenv("PRODUCT_COUNT_CACHE_TTL_SECONDS", "300"))
+PRODUCT_COUNT_CACHE_MAX_ENTRIES = int(os.getenv("PRODUCT_COUNT_CACHE_MAX_ENTRIES", "1000"))
+PRODUCT_COUNT_ESTIMATE_THRESHOLD = int(os.getenv("PRODUCT_COUNT_ESTIMATE_THRESHOLD", "10000"))
+
+# Bulk CJ price/stock sync (see app/marketplace/cj_sync.py): products are fetched
+# CJ_SYNC_CONCURRENCY at a time, never faster than CJ_SYNC_REQUESTS_PER_SECOND CJ calls,
+# and written back (changed rows only) every CJ_SYNC_BATCH_SIZE products.
+CJ_SYNC_CONCURRENCY = int(os.getenv("CJ_SYNC_CONCURRENCY", "5"))
+CJ_SYNC_REQUESTS_PER_SECOND = float(os.getenv("CJ_SYNC_REQUESTS_PER_SECOND", "4"))
+CJ_SYNC_BATCH_SIZE = int(os.getenv("CJ_SYNC_BATCH_SIZE", "100"))
+CJ_SYNC_MAX_RETRIES = int(os.getenv("CJ_SYNC_MAX_RETRIES", "3"))
+
 # Stripe Configuration
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
@@ -0,0 +1,215 @@
+"""
+Write-behind buffer for hot counter columns.
+
+Endpoints such as GET /marketplace/products/{id} or POST /sounds/{uid}/use used
+to load the row, bump a counter and commit, so every request took a row lock on
+the same few popular rows. They now call ``buffer.incr(Model.column, pk)``,
+which only adds to an in-memory delta per (column, pk). A background flusher
+writes the deltas every COUNTER_FLUSH_INTERVAL_MS (or as soon as
+COUNTER_FLUSH_MAX_KEYS distinct rows are waiting) as one
+``UPDATE t SET col = COALESCE(col, 0) + :delta WHERE pk = :pk`` executemany per
+column, in its own session, and once more on shutdown.
+
+Deltas being written stay visible through ``pending()`` until the commit, so a
+reader can add them to the stored value and see its own increments. A failed
+flush merges the deltas back for the next attempt instead of losing them.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, func, inspect
+
+from .config import COUNTER_FLUSH_INTERVAL_MS, COUNTER_FLUSH_MAX_KEYS
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _column_key(attr) -> Tuple[type, str]:
+    return attr.class_, attr.key
+
+
+class CounterBuffer:
+    def __init__(
+        self,
+        flush_interval_ms: int = COUNTER_FLUSH_INTERVAL_MS,
+        max_keys: int = COUNTER_FLUSH_MAX_KEYS,
+        session_factory=SessionLocal,
+    ):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_keys = max_keys
+        self.session_factory = session_factory
+
+        # (model, attribute name) -> {pk: delta}
+        self._pending: Dict[Tuple[type, str], Dict[Any, int]] = defaultdict(dict)
+        self._inflight: Dict[Tuple[type, str], Dict[Any, int]] = {}
+        self._keys = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        # Loop running the flusher: incr() is called from threadpool threads, which
+        # must not touch the asyncio.Event directly
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._metrics = {
+            "increments_total": 0,
+            "rows_flushed_total": 0,
+            "statements_total": 0,
+            "flushes_total": 0,
+            "failed_flushes_total": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "last_flush_at": None,
+        }
+
+    # ── Producers (request path) ───────────────────────
+
+    def incr(self, attr, pk: Any, delta: int = 1) -> None:
+        """Add *delta* to ``attr`` (e.g. ``Sound.usage_count``) of the row with primary key *pk*."""
+        column = _column_key(attr)
+        with self._lock:
+            deltas = self._pending[column]
+            if pk not in deltas:
+                self._keys += 1
+                deltas[pk] = 0
+            deltas[pk] += delta
+            self._metrics["increments_total"] += 1
+            keys = self._keys
+        if keys >= self.max_keys:
+            self._wake()
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Loop already closed (shutdown): stop() flushes what is left
+            pass
+
+    def pending(self, attr, pk: Any) -> int:
+        """Increments for this row not yet committed to the database."""
+        column = _column_key(attr)
+        with self._lock:
+            return (self._pending.get(column, {}).get(pk, 0)
+                    + self._inflight.get(column, {}).get(pk, 0))
+
+    # ── Consumer ───────────────────────────────────────
+
+    def flush(self) -> int:
+        """Write every buffered delta synchronously. Returns rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._keys:
+                    return 0
+                batch = {column: deltas for column, deltas in self._pending.items() if deltas}
+                self._inflight = batch
+                self._pending = defaultdict(dict)
+                self._keys = 0
+            return self._write(batch)
+
+    def _write(self, batch) -> int:
+        started = time.perf_counter()
+        rows = sum(len(deltas) for deltas in batch.values())
+        db = None
+        try:
+            db = self.session_factory()
+            for (model, name), deltas in batch.items():
+                table = model.__table__
+                column = inspect(model).attrs[name].columns[0]
+                (pk,) = table.primary_key.columns
+                stmt = (
+                    table.update()
+                    .where(pk == bindparam("_pk"))
+                    .values({column: func.coalesce(column, 0) + bindparam("_delta")})
+                )
+                # Sorted so concurrent writers (other workers) lock rows in the same order
+                params = [{"_pk": key, "_delta": delta}
+                          for key, delta in sorted(deltas.items(), key=lambda kv: str(kv[0])) if delta]
+                if params:
+                    db.execute(stmt, params)
+            db.commit()
+            ok = True
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            logger.error(f"Counter flush failed, keeping {rows} deltas for the next attempt: {e}")
+            ok = False
+        finally:
+            if db is not None:
+                db.close()
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        with self._lock:
+            self._inflight = {}
+            if not ok:
+                for column, deltas in batch.items():
+                    target = self._pending[column]
+                    for key, delta in deltas.items():
+                        if key not in target:
+                            self._keys += 1
+                            target[key] = 0
+                        target[key] += delta
+            m = self._metrics
+            m["flushes_total"] += 1
+            if ok:
+                m["rows_flushed_total"] += rows
+                m["statements_total"] += len(batch)
+            else:
+                m["failed_flushes_total"] += 1
+            m["last_flush_ms"] = elapsed_ms
+            m["max_flush_ms"] = max(m["max_flush_ms"], elapsed_ms)
+            m["last_flush_at"] = datetime.utcnow().isoformat()
+        return rows if ok else 0
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._keys:
+                try:
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    logger.error(f"Counter flusher error: {e}")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the flusher and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+            self._loop = None
+        await run_in_threadpool(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending_rows": self._keys,
+                "max_keys": self.max_keys,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                **self._metrics,
+            }
+
+
+buffer = CounterBuffer()
@@ -0,0 +1,124 @@
+"""
+Admin dashboard stats engine.
+
+compute_dashboard_stats gathers every counter shown on the admin dashboard in a
+single round trip: one conditional-aggregate subquery per table (COUNT(*) FILTER
+/ SUM ... FILTER), cross-joined into one row. Revenue is summed in the database
+instead of loading every paid Commission.
+
+The result is kept as a process-wide snapshot for DASHBOARD_STATS_TTL_SECONDS.
+After that the stale snapshot is still served while one background task
+recomputes it (stale-while-revalidate), so the dashboard loads in constant time.
+Callers that need exact figures pass ``fresh=True``.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session
+
+from .config import DASHBOARD_STATS_TTL_SECONDS
+from .database import SessionLocal
+from .models import User, Post, Order, Commission, Follow, PostLike, Comment, WithdrawalRequest
+
+
+def compute_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """All dashboard counters in one SELECT."""
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=7)
+    count = func.count
+
+    users = select(
+        count().label("total_users"),
+        count().filter(User.is_verified == True).label("verified_users"),
+        count().filter(User.created_at >= today_start).label("new_users_today"),
+        count().filter(User.created_at >= week_start).label("new_users_this_week"),
+    ).select_from(User).subquery()
+    posts = select(
+        count().label("total_posts"),
+        count().filter(Post.type == 'reel').label("total_reels"),
+        count().filter(Post.type == 'product').label("total_products"),
+    ).select_from(Post).subquery()
+    comments = select(count().label("total_comments")).select_from(Comment).subquery()
+    likes = select(count().label("total_likes")).select_from(PostLike).subquery()
+    follows = select(count().label("total_follows")).select_from(Follow).subquery()
+    orders = select(
+        count().label("total_orders"),
+        count().filter(Order.status == 'pending').label("pending_orders"),
+    ).select_from(Order).subquery()
+    commissions = select(
+        count().label("total_commissions"),
+        count().filter(Commission.status == 'pending').label("pending_commissions"),
+        func.coalesce(
+            func.sum(Commission.commission_amount).filter(Commission.status == 'paid'), 0
+        ).label("total_revenue"),
+    ).select_from(Commission).subquery()
+    withdrawals = select(
+        count().filter(WithdrawalRequest.status == 'pending').label("pending_withdrawals"),
+        func.coalesce(
+            func.sum(WithdrawalRequest.amount).filter(WithdrawalRequest.status == 'pending'), 0
+        ).label("pending_withdrawals_amount"),
+    ).select_from(WithdrawalRequest).subquery()
+
+    parts = [users, posts, comments, likes, follows, orders, commissions, withdrawals]
+    joined = parts[0]
+    for part in parts[1:]:
+        joined = joined.join(part, true())
+
+    row = db.execute(select(*parts).select_from(joined)).mappings().one()
+    stats = dict(row)
+    stats["total_revenue"] = float(stats["total_revenue"] or 0)
+    stats["pending_withdrawals_amount"] = float(stats["pending_withdrawals_amount"] or 0)
+    stats["generated_at"] = datetime.utcnow()
+    return stats
+
+
+class DashboardStatsSnapshot:
+    def __init__(self, ttl_seconds: int = DASHBOARD_STATS_TTL_SECONDS, session_factory=SessionLocal):
+        self.ttl = ttl_seconds
+        self.session_factory = session_factory
+        self._stats: Optional[Dict[str, Any]] = None
+        self._computed_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, background_tasks: Optional[BackgroundTasks] = None, fresh: bool = False) -> Dict[str, Any]:
+        if fresh or self._stats is None:
+            return self._store(compute_dashboard_stats(db))
+
+        if time.monotonic() - self._computed_at >= self.ttl:
+            with self._lock:
+                schedule = not self._refreshing
+                self._refreshing = True
+            if schedule:
+                if background_tasks is not None:
+                    background_tasks.add_task(self.refresh)
+                else:
+                    self.refresh()
+        return self._stats
+
+    def refresh(self) -> None:
+        """Recompute the snapshot in a session of its own."""
+        db = self.session_factory()
+        try:
+            self._store(compute_dashboard_stats(db))
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing = False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stats = None
+
+    def _store(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._stats = stats
+            self._computed_at = time.monotonic()
+        return stats
+
+
+snapshot = DashboardStatsSnapshot()
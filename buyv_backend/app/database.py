@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .config import DATABASE_URL
 
@@ -31,6 +33,61 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
+# ── Async engine (for routes declared ``async def``) ──────────────────────────
+# Same database through an asyncio driver: asyncpg on Postgres, aiosqlite on
+# SQLite, aiomysql on MySQL. A sync Session inside an ``async def`` route blocks the
+# event loop for every round trip; those routes depend on get_async_db instead.
+# A database without an installed async driver fails at startup rather than
+# answering 500 on every ported route.
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _async_engine_args(url: str):
+    """(async URL, connect_args) for *url*, or None when there is no async driver for its backend."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return None
+    args = {}
+    if parsed.get_backend_name() == "sqlite":
+        args = {"check_same_thread": False}
+    elif parsed.get_backend_name() == "postgresql":
+        # asyncpg takes ssl=<mode> instead of libpq's sslmode
+        query = dict(parsed.query)
+        args = {"ssl": query.pop("sslmode", "prefer")}
+        parsed = parsed.set(query=query)
+    return parsed.set(drivername=driver), args
+
+
+def _create_async_engine(url: str):
+    resolved = _async_engine_args(url)
+    if resolved is None:
+        raise RuntimeError(f"No async database driver for {make_url(url).get_backend_name()}")
+    async_url, async_connect_args = resolved
+    pool_args = {} if async_url.get_backend_name() == "sqlite" else {
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "pool_size": 5,
+        "max_overflow": 10,
+    }
+    try:
+        return create_async_engine(async_url, connect_args=async_connect_args, **pool_args)
+    except ImportError as e:
+        raise RuntimeError(
+            f"Async database driver {async_url.drivername} is not installed ({e}); see requirements.txt"
+        ) from e
+
+
+async_engine = _create_async_engine(_db_url)
+
+# expire_on_commit=False: attributes stay loaded after commit, since lazy loads
+# are not possible on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False, autoflush=False)
+
 class Base(DeclarativeBase):
     pass
 
@@ -42,3 +99,8 @@ def get_db():
     finally:
         db.close()
 
+
+# Dependency for async def routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
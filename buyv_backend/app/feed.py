@@ -0,0 +1,122 @@
+"""
+Following feed — hybrid fan-out.
+
+Regular authors: create_post pushes the new post id into every follower's
+feed_inbox row set with a single INSERT ... SELECT over follows (fan-out-on-write).
+Large accounts (followers_count > FEED_FANOUT_MAX_FOLLOWERS) are skipped at
+write time; their recent posts are merged in when the timeline is read
+(fan-out-on-read), so one celebrity post never costs millions of inserts.
+"""
+from typing import List, Optional
+
+from sqlalchemy import select, literal, exists, delete
+from sqlalchemy.orm import Session
+
+from .config import FEED_FANOUT_MAX_FOLLOWERS
+from .models import User, Post, Follow, FeedInboxEntry
+from .pagination import apply_keyset
+
+# Recent posts copied into a new follower's inbox when they follow someone
+FOLLOW_BACKFILL_LIMIT = 50
+
+
+def _is_fanned_out(author: User) -> bool:
+    return (author.followers_count or 0) <= FEED_FANOUT_MAX_FOLLOWERS
+
+
+def fan_out_post(db: Session, post: Post, author: User) -> None:
+    """Push *post* into the inbox of every follower of *author* (one statement)."""
+    if not _is_fanned_out(author):
+        return
+    followers = select(
+        Follow.follower_id,
+        literal(post.id),
+        literal(author.id),
+        literal(post.created_at),
+    ).where(Follow.followed_id == author.id)
+    db.execute(
+        FeedInboxEntry.__table__.insert().from_select(
+            ["user_id", "post_id", "author_id", "created_at"], followers
+        )
+    )
+
+
+def backfill_on_follow(db: Session, follower: User, author: User) -> None:
+    """Copy the author's most recent posts into a new follower's inbox."""
+    if not _is_fanned_out(author):
+        return
+    recent = (
+        select(
+            literal(follower.id),
+            Post.id,
+            literal(author.id),
+            Post.created_at,
+        )
+        .where(
+            Post.user_id == author.id,
+            ~exists().where(
+                FeedInboxEntry.user_id == follower.id,
+                FeedInboxEntry.post_id == Post.id,
+            ),
+        )
+        .order_by(Post.created_at.desc())
+        .limit(FOLLOW_BACKFILL_LIMIT)
+    )
+    db.execute(
+        FeedInboxEntry.__table__.insert().from_select(
+            ["user_id", "post_id", "author_id", "created_at"], recent
+        )
+    )
+
+
+def remove_on_unfollow(db: Session, follower: User, author: User) -> None:
+    """Drop the author's posts from the former follower's inbox."""
+    db.execute(
+        delete(FeedInboxEntry).where(
+            FeedInboxEntry.user_id == follower.id,
+            FeedInboxEntry.author_id == author.id,
+        )
+    )
+
+
+def read_following_feed(db: Session, user: User, limit: int, cursor: Optional[str]) -> List[Post]:
+    """One page of the user's following timeline, newest first."""
+    inbox_rows = (
+        apply_keyset(
+            db.query(Post)
+            .join(FeedInboxEntry, FeedInboxEntry.post_id == Post.id)
+            .filter(FeedInboxEntry.user_id == user.id),
+            FeedInboxEntry.created_at,
+            FeedInboxEntry.post_id,
+            cursor,
+        )
+        .limit(limit)
+        .all()
+    )
+
+    # Fan-out-on-read for followed accounts too large to fan out on write
+    large_authors = (
+        select(Follow.followed_id)
+        .join(User, User.id == Follow.followed_id)
+        .where(
+            Follow.follower_id == user.id,
+            User.followers_count > FEED_FANOUT_MAX_FOLLOWERS,
+        )
+    )
+    pulled_rows = (
+        apply_keyset(
+            db.query(Post).filter(Post.user_id.in_(large_authors)),
+            Post.created_at,
+            Post.id,
+            cursor,
+        )
+        .limit(limit)
+        .all()
+    )
+
+    if not pulled_rows:
+        return inbox_rows
+
+    # An author may have crossed the threshold after some posts were fanned out
+    merged = {p.id: p for p in inbox_rows + pulled_rows}
+    return sorted(merged.values(), key=lambda p: (p.created_at, p.id), reverse=True)[:limit]
@@ -125,7 +125,8 @@ class FirebaseService:
         title: str,
         body: str,
         data: Optional[dict] = None,
-        notification_type: str = "general"
+        notification_type: str = "general",
+        raise_errors: bool = False,
     ) -> dict:
         """
         Send notification to multiple devices
@@ -136,6 +137,8 @@ class FirebaseService:
             body: Notification body
             data: Optional custom data payload
             notification_type: Type of notification
+            raise_errors: Re-raise send failures instead of reporting them
+                as failed (lets the push dispatcher retry)
             
         Returns:
             dict: {'success_count': int, 'failure_count': int, 'invalid_tokens': list}
@@ -217,6 +220,8 @@ class FirebaseService:
             }
             
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"❌ Failed to send multicast notification: {e}")
             return {
                 'success_count': 0,
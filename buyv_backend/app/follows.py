@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from .database import get_db
-from .models import User, Follow
+from .models import User, Follow, BlockedUser
 from .auth import get_current_user
+from .pagination import apply_keyset, next_cursor_for, NEXT_CURSOR_HEADER
+from . import feed, suggestions
 
 router = APIRouter(prefix="/users", tags=["follows"])
 
@@ -22,6 +25,24 @@ class FollowingStatusResponse(BaseModel):
     isFollowing: bool
     isFollowedBy: bool
 
+# Upper bound on target uids per POST /users/relationships (one page of a follower list)
+MAX_RELATIONSHIP_UIDS = 200
+
+class RelationshipsRequest(BaseModel):
+    """Target user uids for a batch relationship lookup"""
+    uids: List[str] = Field(..., max_length=MAX_RELATIONSHIP_UIDS)
+
+class RelationshipStatus(BaseModel):
+    """Follow and block state between the current user and one target"""
+    isFollowing: bool = False
+    isFollowedBy: bool = False
+    isBlocked: bool = False
+    isBlockedBy: bool = False
+
+class RelationshipsResponse(BaseModel):
+    """Relationship per target uid; unknown uids are left out"""
+    relationships: Dict[str, RelationshipStatus]
+
 
 @router.post("/{follower_id}/follow/{followed_id}")
 def follow_user(
@@ -53,6 +74,7 @@ def follow_user(
     # update counters
     current_user.following_count = (current_user.following_count or 0) + 1
     target.followers_count = (target.followers_count or 0) + 1
+    feed.backfill_on_follow(db, current_user, target)
     db.commit()
     return {"message": "Successfully followed user"}
 
@@ -86,6 +108,7 @@ def unfollow_user(
     # update counters
     current_user.following_count = max((current_user.following_count or 0) - 1, 0)
     target.followers_count = max((target.followers_count or 0) - 1, 0)
+    feed.remove_on_unfollow(db, current_user, target)
     db.commit()
     return {"message": "Successfully unfollowed user"}
 
@@ -129,68 +152,121 @@ def get_following_status(
     )
 
 
-@router.get("/{user_id}/followers", response_model=List[UserFollowInfo])
-def get_followers(user_id: str, db: Session = Depends(get_db)):
+@router.post("/relationships", response_model=RelationshipsResponse)
+def get_relationships(
+    payload: RelationshipsRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Get list of users who follow the specified user.
-    GET /users/{user_id}/followers
+    Follow / block state between the current user and up to MAX_RELATIONSHIP_UIDS targets.
+    POST /users/relationships {"uids": [...]}
+    Three queries whatever the number of targets: users, follows both ways, blocks both ways.
     """
-    user = db.query(User).filter(User.uid == user_id).first()
-    if not user:
+    uids = set(payload.uids)
+    if not uids:
+        return RelationshipsResponse(relationships={})
+
+    uid_by_id = dict(db.query(User.id, User.uid).filter(User.uid.in_(uids)).all())
+    statuses = {uid: RelationshipStatus() for uid in uid_by_id.values()}
+
+    target_ids = list(uid_by_id)
+    follows = db.query(Follow.follower_id, Follow.followed_id).filter(or_(
+        and_(Follow.follower_id == current_user.id, Follow.followed_id.in_(target_ids)),
+        and_(Follow.followed_id == current_user.id, Follow.follower_id.in_(target_ids)),
+    ))
+    for follower_id, followed_id in follows:
+        if follower_id == current_user.id and followed_id in uid_by_id:
+            statuses[uid_by_id[followed_id]].isFollowing = True
+        if followed_id == current_user.id and follower_id in uid_by_id:
+            statuses[uid_by_id[follower_id]].isFollowedBy = True
+
+    known = list(statuses)
+    blocks = db.query(BlockedUser.blocker_uid, BlockedUser.blocked_uid).filter(or_(
+        and_(BlockedUser.blocker_uid == current_user.uid, BlockedUser.blocked_uid.in_(known)),
+        and_(BlockedUser.blocked_uid == current_user.uid, BlockedUser.blocker_uid.in_(known)),
+    ))
+    for blocker_uid, blocked_uid in blocks:
+        if blocker_uid == current_user.uid and blocked_uid in statuses:
+            statuses[blocked_uid].isBlocked = True
+        if blocked_uid == current_user.uid and blocker_uid in statuses:
+            statuses[blocker_uid].isBlockedBy = True
+
+    return RelationshipsResponse(relationships=statuses)
+
+
+def _follow_page(db: Session, user_id: str, side, other_side, limit: int, cursor: Optional[str]):
+    """One page of *user_id*'s follow edges (newest first), joined to the other user.
+
+    *side* is the Follow column holding the listed user, *other_side* the column
+    pointing at the users to return. Only the UserFollowInfo columns are selected.
+    """
+    owner_id = db.query(User.id).filter(User.uid == user_id).scalar()
+    if owner_id is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get all follower relationships
-    follow_rows = db.query(Follow).filter(Follow.followed_id == user.id).all()
-    
-    # Fetch all follower users
-    follower_ids = [row.follower_id for row in follow_rows]
-    if not follower_ids:
-        return []
-    
-    followers = db.query(User).filter(User.id.in_(follower_ids)).all()
-    
+
+    query = (
+        db.query(
+            Follow.created_at, Follow.id,
+            User.uid, User.username, User.display_name, User.profile_image_url, User.is_verified,
+        )
+        .join(User, User.id == other_side)
+        .filter(side == owner_id)
+    )
+    return apply_keyset(query, Follow.created_at, Follow.id, cursor).limit(limit).all()
+
+
+def _to_follow_info(rows) -> List[UserFollowInfo]:
     return [
         UserFollowInfo(
-            id=u.uid,
-            username=u.username,
-            displayName=u.display_name,
-            profileImageUrl=u.profile_image_url,
-            isVerified=u.is_verified
+            id=r.uid,
+            username=r.username,
+            displayName=r.display_name,
+            profileImageUrl=r.profile_image_url,
+            isVerified=bool(r.is_verified)
         )
-        for u in followers
+        for r in rows
     ]
 
 
+@router.get("/{user_id}/followers", response_model=List[UserFollowInfo])
+def get_followers(
+    user_id: str,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get users who follow the specified user, most recent follows first.
+    GET /users/{user_id}/followers?limit=&cursor=
+    Pass the X-Next-Cursor header of a page as ?cursor= to get the next one.
+    """
+    rows = _follow_page(db, user_id, Follow.followed_id, Follow.follower_id, limit, cursor)
+    next_cursor = next_cursor_for(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return _to_follow_info(rows)
+
+
 @router.get("/{user_id}/following", response_model=List[UserFollowInfo])
-def get_following(user_id: str, db: Session = Depends(get_db)):
+def get_following(
+    user_id: str,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_db),
+):
     """
-    Get list of users that the specified user follows.
-    GET /users/{user_id}/following
+    Get users that the specified user follows, most recent follows first.
+    GET /users/{user_id}/following?limit=&cursor=
+    Pass the X-Next-Cursor header of a page as ?cursor= to get the next one.
     """
-    user = db.query(User).filter(User.uid == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get all following relationships
-    follow_rows = db.query(Follow).filter(Follow.follower_id == user.id).all()
-    
-    # Fetch all followed users
-    followed_ids = [row.followed_id for row in follow_rows]
-    if not followed_ids:
-        return []
-    
-    following_users = db.query(User).filter(User.id.in_(followed_ids)).all()
-    
-    return [
-        UserFollowInfo(
-            id=u.uid,
-            username=u.username,
-            displayName=u.display_name,
-            profileImageUrl=u.profile_image_url,
-            isVerified=u.is_verified
-        )
-        for u in following_users
-    ]
+    rows = _follow_page(db, user_id, Follow.follower_id, Follow.followed_id, limit, cursor)
+    next_cursor = next_cursor_for(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return _to_follow_info(rows)
 
 
 @router.get("/{uid}/counts")
@@ -209,17 +285,5 @@ def get_suggested_users(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    # Build exclusion set: self + already-followed users
-    followed_rows = db.query(Follow).filter(Follow.follower_id == current_user.id).all()
-    exclude_ids = {current_user.id}
-    exclude_ids.update(row.followed_id for row in followed_rows)
-
-    # Query top users not followed by current user, ordered by popularity
-    query = (
-        db.query(User)
-        .filter(~User.id.in_(exclude_ids))
-        .order_by(User.followers_count.desc(), User.created_at.desc())
-        .limit(limit)
-    )
-    users = query.all()
-    return {"suggested": [u.uid for u in users]}
\ No newline at end of file
+    # Precomputed friends-of-friends candidates, topped up with popular users
+    return {"suggested": suggestions.suggested_uids(db, current_user, limit)}
\ No newline at end of file
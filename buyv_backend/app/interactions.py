@@ -0,0 +1,108 @@
+"""
+Per-user interaction state (liked / bookmarked) for posts and marketplace products.
+
+Every list endpoint hydrates a page through ``liked_and_bookmarked``: one
+UNION ALL over post_likes and post_bookmarks restricted to the caller and the
+page's post ids, whatever the page size. Products carry their primary
+promotion's post in ``linked_post_id`` (see MarketplaceProduct), so they are
+hydrated from the same query.
+
+Writes (like / unlike, bookmark / unbookmark, comment likes) are race-free:
+the row is added with INSERT ... ON CONFLICT DO NOTHING RETURNING (or removed
+with DELETE ... RETURNING) and the counter is moved in SQL by ``bump_counter``
+only when a row actually changed. Concurrent taps can neither lose increments
+nor hit the unique constraint.
+"""
+from datetime import datetime
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy import DateTime, case, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from .models import User, Post, PostLike, PostBookmark
+
+
+def liked_and_bookmarked(db: Session, post_ids: Iterable[int], current_user: Optional[User]) -> Tuple[Set[int], Set[int]]:
+    """(liked, bookmarked) post ids among *post_ids* for *current_user*, in one query."""
+    post_ids = {i for i in post_ids if i}
+    if not current_user or not post_ids:
+        return set(), set()
+    rows = db.execute(union_all(
+        select(PostLike.post_id, literal("like")).where(
+            PostLike.user_id == current_user.id, PostLike.post_id.in_(post_ids)
+        ),
+        select(PostBookmark.post_id, literal("bookmark")).where(
+            PostBookmark.user_id == current_user.id, PostBookmark.post_id.in_(post_ids)
+        ),
+    ))
+    liked, bookmarked = set(), set()
+    for post_id, kind in rows:
+        (liked if kind == "like" else bookmarked).add(post_id)
+    return liked, bookmarked
+
+
+def enrich_products(products, db: Session, current_user: Optional[User]):
+    """Inject is_liked / is_bookmarked onto marketplace product instances."""
+    if not current_user or not products:
+        return products
+    liked_ids, bookmarked_ids = liked_and_bookmarked(db, (p.linked_post_id for p in products), current_user)
+    for product in products:
+        product.is_liked = product.linked_post_id in liked_ids
+        product.is_bookmarked = product.linked_post_id in bookmarked_ids
+    return products
+
+
+def insert_ignoring_conflict(db: Session, model):
+    """INSERT into *model*'s table supporting ``.on_conflict_do_nothing()`` (PostgreSQL / SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model.__table__)
+
+
+def add_post_interaction(db: Session, model, post_uid: str, user_id: int) -> Optional[int]:
+    """Add a PostLike / PostBookmark of *post_uid* in one statement.
+
+    Returns the post id when a row was inserted, None when it already existed
+    or the post does not exist (see ``post_id_for``).
+    """
+    table = model.__table__
+    stmt = (
+        insert_ignoring_conflict(db, model)
+        .from_select(
+            ["post_id", "user_id", "created_at"],
+            select(Post.id, literal(user_id), literal(datetime.utcnow(), DateTime)).where(Post.uid == post_uid),
+        )
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+        .returning(table.c.post_id)
+    )
+    return db.execute(stmt).scalar()
+
+
+def remove_post_interaction(db: Session, model, post_uid: str, user_id: int) -> Optional[int]:
+    """Delete a PostLike / PostBookmark of *post_uid*; returns the post id if a row was deleted."""
+    table = model.__table__
+    stmt = (
+        table.delete()
+        .where(
+            table.c.user_id == user_id,
+            table.c.post_id == select(Post.id).where(Post.uid == post_uid).scalar_subquery(),
+        )
+        .returning(table.c.post_id)
+    )
+    return db.execute(stmt).scalar()
+
+
+def post_id_for(db: Session, post_uid: str) -> Optional[int]:
+    return db.query(Post.id).filter(Post.uid == post_uid).scalar()
+
+
+def bump_counter(db: Session, attr, pk: int, delta: int) -> int:
+    """``col = col + delta`` (floored at 0) on the row *pk*, in SQL; returns the new value."""
+    table = attr.class_.__table__
+    column = table.c[attr.key]
+    current = func.coalesce(column, 0)
+    value = current + delta if delta >= 0 else case((current + delta > 0, current + delta), else_=0)
+    stmt = table.update().where(table.c.id == pk).values({attr.key: value}).returning(column)
+    return db.execute(stmt).scalar() or 0
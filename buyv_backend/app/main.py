@@ -1,10 +1,11 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from .database import engine, Base, SessionLocal
+from .database import engine, async_engine, Base, SessionLocal
 from .auth import router as auth_router
 from .users import router as users_router
 from .follows import router as follows_router
@@ -17,6 +18,7 @@ from .payments import router as payments_router
 from .cleanup import router as cleanup_router
 from .firebase_service import FirebaseService
 from .marketplace.router import router as marketplace_router
+from .marketplace.cj_service import close_cj_service
 from .tracking import router as tracking_router  # Phase 6
 from .withdrawal import router as withdrawal_router  # Phase 8
 from .admin_dashboard import router as admin_dashboard_router  # Phase 10 - Admin Mobile
@@ -24,6 +26,8 @@ from .admin_dashboard import orders_admin_router, commissions_admin_router  # Ad
 from .blocked_users import router as blocked_users_router
 from .reports import router as reports_router
 from .sounds import router as sounds_router
+from .search import router as search_router
+from . import tracking_ingest, analytics_rollup, search_index, push_dispatcher, audio_extract, counters, response_cache, suggestions
 import logging
 
 # Configure logging
@@ -36,13 +40,43 @@ try:
 except Exception as e:
     logger.warning(f"create_all skipped (tables may already exist or DB unavailable): {e}")
 
+# Full-text search indexes (tsvector/pg_trgm on Postgres, FTS5 on SQLite)
+search_index.ensure_search_index(engine)
+
 # Initialize Firebase on startup (will skip if credentials not found)
 try:
     FirebaseService.initialize()
 except Exception as e:
     logger.warning(f"Firebase initialization failed: {e}")
 
-app = FastAPI(title="Buyv API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background flusher for buffered /track/view and /track/click events
+    await tracking_ingest.queue.start()
+    # Write-behind flusher for view/usage counters
+    await counters.buffer.start()
+    # Periodic compaction of promoter analytics rollups
+    await analytics_rollup.compactor.start()
+    # Periodic rebuild of friends-of-friends follow suggestions
+    await suggestions.builder.start()
+    # Background FCM sender (batched send_multicast, retries, token pruning)
+    await push_dispatcher.dispatcher.start()
+    # Extracted audio on local disk is lost on redeploy: say so loudly in production
+    audio_extract.extractor.check_storage()
+    yield
+    # Kill running ffmpeg processes and drop unfinished audio extraction jobs
+    await audio_extract.extractor.shutdown()
+    # Release the pooled CJ connections (client is opened lazily on first CJ call)
+    await close_cj_service()
+    await push_dispatcher.dispatcher.stop()
+    await analytics_rollup.compactor.stop()
+    await suggestions.builder.stop()
+    await tracking_ingest.queue.stop()
+    await counters.buffer.stop()
+    await async_engine.dispose()
+
+
+app = FastAPI(title="Buyv API", version="0.1.0", lifespan=lifespan)
 
 # Rate Limiting Configuration
 limiter = Limiter(key_func=get_remote_address, default_limits=["200/minute"])
@@ -89,6 +123,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination (see app/pagination.py)
 )
 
 # ── Health & Version ──────────────────────────────────
@@ -137,9 +172,35 @@ def health_db():
             "detail": str(e),
         }
 
+@app.get("/health/tracking")
+def health_tracking():
+    """Tracking ingest queue depth, flush latency and dropped/failed event counters."""
+    return tracking_ingest.queue.stats()
+
+@app.get("/health/counters")
+def health_counters():
+    """Write-behind counter buffer: dirty rows, flush latency and failed flushes."""
+    return counters.buffer.stats()
+
+@app.get("/health/response-cache")
+def health_response_cache():
+    """Public catalog response cache: hits, misses, 304s and invalidation generations."""
+    return response_cache.cache.stats()
+
+@app.get("/health/push")
+def health_push():
+    """Push dispatcher queue depth, retries, delivered/failed and pruned-token counters."""
+    return push_dispatcher.dispatcher.stats()
+
+@app.get("/health/audio-extract")
+def health_audio_extract():
+    """Audio extraction jobs by status, worker limits, download and ffmpeg time counters."""
+    return audio_extract.extractor.stats()
+
 app.include_router(auth_router)
-app.include_router(users_router)
+# follows before users: GET /users/suggested must not be captured by GET /users/{uid}
 app.include_router(follows_router)
+app.include_router(users_router)
 app.include_router(notifications_router)
 app.include_router(orders_router)
 app.include_router(commissions_router)
@@ -155,4 +216,5 @@ app.include_router(orders_admin_router)       # Admin order management (/api/ord
 app.include_router(commissions_admin_router)  # Admin commission management (/api/commissions/admin/...)
 app.include_router(blocked_users_router)
 app.include_router(reports_router)
-app.include_router(sounds_router)
\ No newline at end of file
+app.include_router(sounds_router)
+app.include_router(search_router)
\ No newline at end of file
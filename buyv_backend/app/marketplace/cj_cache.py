@@ -0,0 +1,283 @@
+"""
+Response cache for CJ catalog lookups (search, product details, categories).
+
+The admin CJ search page and the import screen repeat the same queries, each of
+which used to be a round trip to CJ. Successful responses are cached per
+endpoint:
+
+- younger than the endpoint TTL          -> served from cache (hit)
+- older, but within CJ_CACHE_STALE_SECONDS -> served stale, and one background
+                                            request refreshes the entry
+- missing or older than that             -> fetched (concurrent misses for the
+                                            same key share one request)
+
+If a fetch fails and an expired entry is still around, that entry is served
+rather than the error. Error payloads (CJ ``code`` != 200) are never cached.
+
+Backends are pluggable: MemoryCacheBackend (per-worker LRU) and
+SQLiteCacheBackend (a file shared by the workers on one host), usually stacked
+with TieredCacheBackend. Inventory is deliberately not cached.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import (
+    CJ_CACHE_BACKEND,
+    CJ_CACHE_SQLITE_PATH,
+    CJ_CACHE_MAX_ENTRIES,
+    CJ_CACHE_STALE_SECONDS,
+    CJ_CACHE_TTL_SEARCH_SECONDS,
+    CJ_CACHE_TTL_PRODUCT_SECONDS,
+    CJ_CACHE_TTL_CATEGORIES_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+SEARCH = "search"
+PRODUCT = "product"
+CATEGORIES = "categories"
+
+DEFAULT_TTLS = {
+    SEARCH: CJ_CACHE_TTL_SEARCH_SECONDS,
+    PRODUCT: CJ_CACHE_TTL_PRODUCT_SECONDS,
+    CATEGORIES: CJ_CACHE_TTL_CATEGORIES_SECONDS,
+}
+
+# (stored_at epoch seconds, value)
+Entry = Tuple[float, Any]
+
+
+# ── Backends ───────────────────────────────────────────
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU."""
+
+    def __init__(self, max_entries: int = CJ_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def purge(self, prefix: str = "") -> int:
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """JSON values in a local SQLite file; survives restarts and is shared across workers."""
+
+    def __init__(self, path: str = CJ_CACHE_SQLITE_PATH, max_entries: int = CJ_CACHE_MAX_ENTRIES * 10):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cj_cache ("
+            " key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cj_cache_stored_at ON cj_cache (stored_at)")
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, value FROM cj_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, entry: Entry) -> None:
+        stored_at, value = entry
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cj_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, stored_at, json.dumps(value, default=str)),
+            )
+            # Evict the oldest rows once over capacity
+            self._conn.execute(
+                "DELETE FROM cj_cache WHERE key IN ("
+                " SELECT key FROM cj_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def purge(self, prefix: str = "") -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM cj_cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+            return cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cj_cache").fetchone()[0]
+
+
+class TieredCacheBackend:
+    """Reads go front to back and promote hits into the faster tiers; writes go to every tier."""
+
+    def __init__(self, *tiers):
+        self.tiers = tiers
+
+    def get(self, key: str) -> Optional[Entry]:
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, entry)
+                return entry
+        return None
+
+    def set(self, key: str, entry: Entry) -> None:
+        for tier in self.tiers:
+            tier.set(key, entry)
+
+    def purge(self, prefix: str = "") -> int:
+        return max(tier.purge(prefix) for tier in self.tiers)
+
+    def __len__(self) -> int:
+        return len(self.tiers[-1])
+
+
+# ── Cache ──────────────────────────────────────────────
+
+class CJResponseCache:
+    def __init__(
+        self,
+        backend,
+        ttls: Optional[Dict[str, int]] = None,
+        stale_seconds: int = CJ_CACHE_STALE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.backend = backend
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_seconds = stale_seconds
+        self.clock = clock
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(endpoint: str, params: Optional[dict] = None) -> str:
+        return f"{endpoint}:{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+    async def get_or_fetch(
+        self,
+        endpoint: str,
+        params: Optional[dict],
+        fetch: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        key = self.make_key(endpoint, params)
+        entry = self.backend.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = self.clock() - stored_at
+            ttl = self.ttls.get(endpoint, 0)
+            if age < ttl:
+                self._count(endpoint, "hits")
+                return value
+            if age < ttl + self.stale_seconds:
+                self._count(endpoint, "stale_hits")
+                self._revalidate(endpoint, key, fetch, cacheable)
+                return value
+
+        self._count(endpoint, "misses")
+        try:
+            return await self._start_fetch(endpoint, key, fetch, cacheable)
+        except Exception:
+            if entry is None:
+                raise
+            self._count(endpoint, "stale_on_error")
+            return entry[1]
+
+    def _start_fetch(self, endpoint, key, fetch, cacheable) -> asyncio.Task:
+        """One in-flight request per key; later callers await the same task."""
+        task = self._inflight.get(key)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._fetch_and_store(endpoint, key, fetch, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._inflight.pop(k, None) if self._inflight.get(k) is t else None)
+        return task
+
+    async def _fetch_and_store(self, endpoint, key, fetch, cacheable) -> Any:
+        value = await fetch()
+        if cacheable(value):
+            self.backend.set(key, (self.clock(), value))
+        return value
+
+    def _revalidate(self, endpoint, key, fetch, cacheable) -> None:
+        if key in self._inflight:
+            return
+        self._count(endpoint, "refreshes")
+        task = self._start_fetch(endpoint, key, fetch, cacheable)
+
+        def _done(t: asyncio.Task) -> None:
+            if not t.cancelled() and t.exception() is not None:
+                self._count(endpoint, "refresh_errors")
+                logger.warning(f"CJ cache refresh failed for {key}: {t.exception()}")
+
+        task.add_done_callback(_done)
+
+    def _count(self, endpoint: str, name: str) -> None:
+        with self._lock:
+            counters = self._metrics.setdefault(endpoint, {})
+            counters[name] = counters.get(name, 0) + 1
+
+    def purge(self, endpoint: Optional[str] = None) -> int:
+        """Drop every entry, or only those of *endpoint*. Returns entries removed."""
+        return self.backend.purge(f"{endpoint}:" if endpoint else "")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_endpoint = {e: dict(c) for e, c in self._metrics.items()}
+        for counters in per_endpoint.values():
+            served = counters.get("hits", 0) + counters.get("stale_hits", 0)
+            total = served + counters.get("misses", 0)
+            counters["hit_ratio"] = round(served / total, 3) if total else 0.0
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "ttls": self.ttls,
+            "stale_seconds": self.stale_seconds,
+            "endpoints": per_endpoint,
+        }
+
+
+def build_cache(backend: str = CJ_CACHE_BACKEND) -> Optional[CJResponseCache]:
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        try:
+            return CJResponseCache(TieredCacheBackend(MemoryCacheBackend(), SQLiteCacheBackend()))
+        except sqlite3.Error as e:
+            logger.warning(f"CJ cache: SQLite tier unavailable ({e}), using memory only")
+    return CJResponseCache(MemoryCacheBackend())
+
+
+cache = build_cache()
@@ -3,6 +3,8 @@ Service d'intégration avec l'API CJ Dropshipping.
 
 Documentation API: https://developers.cjdropshipping.com/
 """
+import asyncio
+import importlib.util
 import httpx
 import os
 import re
@@ -13,6 +15,16 @@ import decimal
 import logging
 from dotenv import load_dotenv
 
+from app.marketplace import cj_cache
+from app.config import (
+    CJ_HTTP2,
+    CJ_MAX_CONNECTIONS,
+    CJ_MAX_KEEPALIVE_CONNECTIONS,
+    CJ_KEEPALIVE_EXPIRY_SECONDS,
+    CJ_TIMEOUT_SECONDS,
+    CJ_CONNECT_TIMEOUT_SECONDS,
+)
+
 # Charger .env depuis buyv_backend/
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -25,10 +37,14 @@ class CJAuthError(Exception):
     pass
 
 
+# Default for CJDropshippingService(cache=...): use the process-wide cj_cache.cache
+_SHARED_CACHE = object()
+
+
 class CJDropshippingService:
     """Service pour interagir avec l'API CJ Dropshipping."""
     
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, cache=_SHARED_CACHE):
         self.api_key = os.getenv("CJ_API_KEY", "").strip()
         self.refresh_token = os.getenv("CJ_REFRESH_TOKEN", "").strip()
         self.account_id = os.getenv("CJ_ACCOUNT_ID", "").strip()
@@ -38,8 +54,50 @@ class CJDropshippingService:
         
         if not self.account_id:
             raise ValueError("CJ_ACCOUNT_ID not configured in .env")
+
+        # Shared keep-alive client, built lazily so it binds to the running event loop
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # Single-flight token refresh: concurrent 401s wait for one refresh
+        self._refresh_lock = asyncio.Lock()
+        self._failed_refresh_token: Optional[str] = None
+        # Catalog response cache (None disables caching)
+        self.cache: Optional[cj_cache.CJResponseCache] = (
+            cj_cache.cache if cache is _SHARED_CACHE else cache
+        )
         
         logger.info(f"CJ Service initialized - Account: {self.account_id}, URL: {self.base_url}")
+
+    @staticmethod
+    def _http2_available() -> bool:
+        if not CJ_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is not None:
+            return True
+        logger.warning("CJ_HTTP2 enabled but h2 is not installed — using HTTP/1.1")
+        return False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled client reused by every CJ call (TLS + DNS paid once per connection)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(CJ_TIMEOUT_SECONDS, connect=CJ_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=CJ_MAX_CONNECTIONS,
+                    max_keepalive_connections=CJ_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=CJ_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                http2=self._http2_available(),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close pooled connections (called from the app lifespan)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -47,7 +105,27 @@ class CJDropshippingService:
             "Content-Type": "application/json"
         }
 
-    async def _refresh_access_token(self) -> bool:
+    async def _refresh_access_token(self, stale_token: Optional[str] = None) -> bool:
+        """
+        Single-flight wrapper around _do_refresh_access_token.
+
+        *stale_token* is the access token the caller's request was rejected with.
+        If another coroutine already replaced it (or already failed to), the
+        caller reuses that outcome instead of refreshing again.
+        """
+        if stale_token is None:
+            stale_token = self.api_key
+        async with self._refresh_lock:
+            if self.api_key != stale_token:
+                return True
+            if self._failed_refresh_token == stale_token:
+                return False
+            refreshed = await self._do_refresh_access_token()
+            if not refreshed:
+                self._failed_refresh_token = stale_token
+            return refreshed
+
+    async def _do_refresh_access_token(self) -> bool:
         """
         Use CJ_REFRESH_TOKEN to obtain a new access token.
         Updates self.api_key and rewrites the .env file on success.
@@ -62,29 +140,28 @@ class CJDropshippingService:
         logger.info(f"CJ: attempting token refresh via {url}")
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                resp = await client.post(url, json=payload, headers={"Content-Type": "application/json"})
-                logger.info(f"CJ refresh response {resp.status_code}: {resp.text[:300]}")
-                data = resp.json()
-
-                if data.get("code") == 200:
-                    token_data = data.get("data", {})
-                    new_access = token_data.get("accessToken", "")
-                    new_refresh = token_data.get("refreshToken", "")
-
-                    if new_access:
-                        self.api_key = new_access.strip()
-                        if new_refresh:
-                            self.refresh_token = new_refresh.strip()
-                        self._update_env_tokens(new_access, new_refresh or self.refresh_token)
-                        logger.info(f"CJ token refreshed successfully. New token starts: {new_access[:30]}...")
-                        return True
-                    else:
-                        logger.error("CJ refresh returned 200 but no accessToken in data")
-                        return False
+            resp = await self.client.post(url, json=payload, headers={"Content-Type": "application/json"})
+            logger.info(f"CJ refresh response {resp.status_code}: {resp.text[:300]}")
+            data = resp.json()
+
+            if data.get("code") == 200:
+                token_data = data.get("data", {})
+                new_access = token_data.get("accessToken", "")
+                new_refresh = token_data.get("refreshToken", "")
+
+                if new_access:
+                    self.api_key = new_access.strip()
+                    if new_refresh:
+                        self.refresh_token = new_refresh.strip()
+                    self._update_env_tokens(new_access, new_refresh or self.refresh_token)
+                    logger.info(f"CJ token refreshed successfully. New token starts: {new_access[:30]}...")
+                    return True
                 else:
-                    logger.error(f"CJ refresh failed: code={data.get('code')} msg={data.get('message')}")
+                    logger.error("CJ refresh returned 200 but no accessToken in data")
                     return False
+            else:
+                logger.error(f"CJ refresh failed: code={data.get('code')} msg={data.get('message')}")
+                return False
         except Exception as e:
             logger.error(f"CJ refresh exception: {e}")
             return False
@@ -103,69 +180,59 @@ class CJDropshippingService:
         except Exception as e:
             logger.warning(f"Could not update .env with new tokens: {e}")
 
-    async def _get(self, path: str, params: Dict = None) -> Dict[str, Any]:
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
         """
-        Make an authenticated GET request to CJ API.
+        Make an authenticated request to CJ API on the shared client.
         Auto-refreshes token on 401 and retries once.
         Raises CJAuthError if auth cannot be fixed.
         """
         for attempt in range(2):  # 0 = first try, 1 = retry after refresh
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                resp = await client.get(
-                    f"{self.base_url}{path}",
-                    headers=self._get_headers(),
-                    params=params or {}
-                )
-                logger.info(f"CJ GET {path} → {resp.status_code}")
-
-                if resp.status_code == 401:
-                    if attempt == 0:
-                        logger.warning("CJ 401 — attempting token refresh")
-                        refreshed = await self._refresh_access_token()
-                        if not refreshed:
-                            raise CJAuthError(
-                                "CJ API token expired and refresh failed. "
-                                "Please renew your CJ token: run generate_cj_token.py "
-                                "or visit https://cjdropshipping.com → Settings → API."
-                            )
-                        continue  # retry with new token
-                    else:
-                        raise CJAuthError("CJ API authentication failed even after token refresh.")
-
-                resp.raise_for_status()
-                return resp.json()
+            sent_token = self.api_key
+            resp = await self.client.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=self._get_headers(),
+                **kwargs
+            )
+            logger.info(f"CJ {method} {path} → {resp.status_code}")
+
+            if resp.status_code == 401:
+                if attempt == 0:
+                    logger.warning("CJ 401 — attempting token refresh")
+                    refreshed = await self._refresh_access_token(sent_token)
+                    if not refreshed:
+                        raise CJAuthError(
+                            "CJ API token expired and refresh failed. "
+                            "Please renew your CJ token: run generate_cj_token.py "
+                            "or visit https://cjdropshipping.com → Settings → API."
+                        )
+                    continue  # retry with new token
+                else:
+                    raise CJAuthError("CJ API authentication failed even after token refresh.")
+
+            resp.raise_for_status()
+            return resp.json()
 
         raise CJAuthError("CJ API request failed after token refresh.")
 
+    async def _get(self, path: str, params: Dict = None) -> Dict[str, Any]:
+        """Make an authenticated GET request to CJ API."""
+        return await self._request("GET", path, params=params or {})
+
     async def _post(self, path: str, payload: Dict) -> Dict[str, Any]:
-        """
-        Make an authenticated POST request to CJ API.
-        Auto-refreshes token on 401 and retries once.
-        """
-        for attempt in range(2):
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                resp = await client.post(
-                    f"{self.base_url}{path}",
-                    headers=self._get_headers(),
-                    json=payload
-                )
-                logger.info(f"CJ POST {path} → {resp.status_code}")
-
-                if resp.status_code == 401:
-                    if attempt == 0:
-                        refreshed = await self._refresh_access_token()
-                        if not refreshed:
-                            raise CJAuthError(
-                                "CJ API token expired and refresh failed. Please renew CJ_API_KEY."
-                            )
-                        continue
-                    else:
-                        raise CJAuthError("CJ API authentication failed even after token refresh.")
-
-                resp.raise_for_status()
-                return resp.json()
+        """Make an authenticated POST request to CJ API."""
+        return await self._request("POST", path, json=payload)
 
-        raise CJAuthError("CJ API request failed after token refresh.")
+    async def _cached_get(self, endpoint: str, path: str, params: Dict = None, fresh: bool = False) -> Dict[str, Any]:
+        """GET through the catalog cache; only ``code == 200`` responses are stored."""
+        if self.cache is None or fresh:
+            return await self._get(path, params)
+        return await self.cache.get_or_fetch(
+            endpoint,
+            {"path": path, **(params or {})},
+            lambda: self._get(path, params),
+            cacheable=lambda data: data.get("code") == 200,
+        )
     
     async def search_products(
         self,
@@ -179,16 +246,16 @@ class CJDropshippingService:
         if category:
             params["categoryId"] = category
 
-        data = await self._get("/product/list", params)
+        data = await self._cached_get(cj_cache.SEARCH, "/product/list", params)
         if data.get("code") == 200:
             return data.get("data", {})
         else:
             logger.error(f"CJ search error: code={data.get('code')} msg={data.get('message')}")
             return {"list": [], "total": 0}
     
-    async def get_product_details(self, product_id: str) -> Dict[str, Any]:
-        """Obtenir les détails d'un produit CJ."""
-        data = await self._get("/product/query", {"pid": product_id})
+    async def get_product_details(self, product_id: str, fresh: bool = False) -> Dict[str, Any]:
+        """Obtenir les détails d'un produit CJ (fresh=True contourne le cache)."""
+        data = await self._cached_get(cj_cache.PRODUCT, "/product/query", {"pid": product_id}, fresh=fresh)
         if data.get("code") == 200:
             return data.get("data", {})
         else:
@@ -214,7 +281,7 @@ class CJDropshippingService:
     async def get_categories(self) -> List[Dict[str, Any]]:
         """Obtenir la liste des catégories CJ."""
         try:
-            data = await self._get("/product/getCategory")
+            data = await self._cached_get(cj_cache.CATEGORIES, "/product/getCategory")
             if data.get("code") == 200:
                 return data.get("data", [])
             return []
@@ -222,8 +289,15 @@ class CJDropshippingService:
             logger.error(f"Failed to get categories: {e}")
             return []
     
-    async def check_inventory(self, product_id: str, variant_id: Optional[str] = None) -> Dict[str, Any]:
-        """Vérifier le stock d'un produit."""
+    async def check_inventory(
+        self, product_id: str, variant_id: Optional[str] = None, strict: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Vérifier le stock d'un produit.
+
+        strict=True propage les erreurs au lieu de répondre "hors stock", pour
+        qu'une panne CJ ne passe pas tout le catalogue en out_of_stock.
+        """
         try:
             params = {"pid": product_id}
             if variant_id:
@@ -231,8 +305,12 @@ class CJDropshippingService:
             data = await self._get("/product/inventory", params)
             if data.get("code") == 200:
                 return data.get("data", {})
+            if strict:
+                raise Exception(f"Inventory lookup failed: {product_id} — {data.get('message')}")
             return {"in_stock": False, "quantity": 0}
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"Failed to check inventory: {e}")
             return {"in_stock": False, "quantity": 0}
     
@@ -354,3 +432,23 @@ class CJDropshippingService:
             "tags": cj_product.get("categoryName", "").split() if cj_product.get("categoryName") else [],
             "category_slug": self._map_cj_category(cj_product.get("categoryName", ""))
         }
+
+
+# Process-wide instance: env is read once and the connection pool is shared by
+# every request. Closed by the app lifespan (see app/main.py).
+_service: Optional[CJDropshippingService] = None
+
+
+def get_cj_service() -> CJDropshippingService:
+    """Return the shared CJ service, creating it on first use."""
+    global _service
+    if _service is None:
+        _service = CJDropshippingService()
+    return _service
+
+
+async def close_cj_service() -> None:
+    global _service
+    if _service is not None:
+        await _service.aclose()
+        _service = None
@@ -0,0 +1,312 @@
+"""
+Bulk price/stock synchronization of imported products with CJ Dropshipping.
+
+Products with a cj_product_id are walked in id order, CJ_SYNC_BATCH_SIZE at a
+time. For each batch, the product details and inventory of every product are
+fetched concurrently (at most CJ_SYNC_CONCURRENCY products in flight, and no
+more than CJ_SYNC_REQUESTS_PER_SECOND CJ calls). Rate-limited or transient
+failures are retried with backoff. The remote state is diffed against the local
+row, and only the changed rows are written, with one executemany UPDATE per batch.
+
+Progress lives in cj_sync_runs. The batch writes and the checkpoint (last
+product id, counters) are committed in the same transaction, so an interrupted
+run resumes after the last written batch; starting afresh instead (resume=False)
+marks the unfinished run 'aborted'. Products that an admin set to
+'inactive' keep that status; only their prices are synced.
+
+Run from the CLI (``python sync_cj_products.py``) or from the admin API
+(POST /api/v1/admin/cj/sync-all), which runs it as a background task.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+
+from app.config import (
+    CJ_SYNC_CONCURRENCY,
+    CJ_SYNC_REQUESTS_PER_SECOND,
+    CJ_SYNC_BATCH_SIZE,
+    CJ_SYNC_MAX_RETRIES,
+)
+from app.database import SessionLocal
+from app.marketplace.cj_service import CJAuthError, CJDropshippingService, get_cj_service
+from app import response_cache
+from app.marketplace.models import CJSyncRun, MarketplaceProduct
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+ABORTED = "aborted"  # Unfinished run replaced by a fresh one (resume=False)
+
+_MAX_STORED_ERRORS = 50
+_CENT = Decimal("0.01")
+
+
+class RateLimiter:
+    """Spaces calls evenly so that at most *rate* start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n: int = 1) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval * n
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(_CENT)
+
+
+async def fetch_remote_state(cj: CJDropshippingService, cj_product_id: str) -> Dict[str, Any]:
+    """Current CJ prices and stock for one product (both calls in parallel, uncached)."""
+    details, inventory = await asyncio.gather(
+        cj.get_product_details(cj_product_id, fresh=True),
+        cj.check_inventory(cj_product_id, strict=True),
+    )
+    parsed = cj.parse_product_data(details)
+    return {
+        "original_price": parsed["original_price"],
+        "selling_price": parsed["selling_price"],
+        "in_stock": bool(inventory.get("in_stock", False)),
+    }
+
+
+def diff_product(product, remote: Dict[str, Any]) -> Dict[str, Any]:
+    """Columns of *product* that differ from the CJ *remote* state."""
+    changes: Dict[str, Any] = {}
+    for field in ("original_price", "selling_price"):
+        if _money(getattr(product, field)) != _money(remote[field]):
+            changes[field] = _money(remote[field])
+    if product.status != "inactive":
+        status = "active" if remote["in_stock"] else "out_of_stock"
+        if product.status != status:
+            changes["status"] = status
+    return changes
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class CJSyncJob:
+    def __init__(
+        self,
+        cj: CJDropshippingService,
+        session_factory=SessionLocal,
+        concurrency: int = CJ_SYNC_CONCURRENCY,
+        requests_per_second: float = CJ_SYNC_REQUESTS_PER_SECOND,
+        batch_size: int = CJ_SYNC_BATCH_SIZE,
+        max_retries: int = CJ_SYNC_MAX_RETRIES,
+        retry_backoff_seconds: float = 1.0,
+        trigger: str = "cli",
+    ):
+        self.cj = cj
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_seconds
+        self.trigger = trigger
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(requests_per_second)
+
+    async def run(self, resume: bool = True) -> Dict[str, Any]:
+        """Sync the whole catalog (or resume the last unfinished run). Returns a summary."""
+        started = time.perf_counter()
+        run_id, last_id, resumed = await run_in_threadpool(self._open_run, resume)
+        logger.info(f"CJ sync run {run_id} {'resumed' if resumed else 'started'} ({self.trigger})")
+        status = COMPLETED
+        try:
+            while True:
+                batch = await run_in_threadpool(self._load_batch, last_id)
+                if not batch:
+                    break
+                results = await asyncio.gather(*(self._sync_one(p) for p in batch))
+                await run_in_threadpool(self._write_batch, run_id, batch, results)
+                last_id = batch[-1].id
+        except Exception as e:
+            status = FAILED
+            logger.error(f"CJ sync run {run_id} failed: {e}")
+            if isinstance(e, CJAuthError):
+                await run_in_threadpool(self._record_error, run_id, None, str(e))
+        summary = await run_in_threadpool(self._close_run, run_id, status)
+        summary["resumed"] = resumed
+        summary["duration_seconds"] = round(time.perf_counter() - started, 2)
+        logger.info(f"CJ sync run {run_id} {status}: {summary}")
+        return summary
+
+    # ── Remote ─────────────────────────────────────────
+
+    async def _sync_one(self, product) -> Dict[str, Any]:
+        """``{"changes": {...}}`` on success, ``{"error": "..."}`` when CJ could not be read."""
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._limiter.acquire(2)  # details + inventory
+                try:
+                    remote = await fetch_remote_state(self.cj, product.cj_product_id)
+                    return {"changes": diff_product(product, remote)}
+                except CJAuthError:
+                    raise  # every other product would fail the same way
+                except Exception as e:
+                    if attempt < self.max_retries and _is_retryable(e):
+                        await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                        continue
+                    return {"error": str(e)[:300]}
+
+    # ── Database (run in the threadpool) ───────────────
+
+    def _open_run(self, resume: bool):
+        db = self.session_factory()
+        try:
+            run = None
+            if resume:
+                run = (
+                    db.query(CJSyncRun)
+                    .filter(CJSyncRun.status.in_((RUNNING, FAILED)))
+                    .order_by(CJSyncRun.id.desc())
+                    .first()
+                )
+            else:
+                # Unfinished runs will never be resumed once a fresh one starts
+                now = datetime.now(timezone.utc)
+                for stale in db.query(CJSyncRun).filter(CJSyncRun.status.in_((RUNNING, FAILED))):
+                    stale.status = ABORTED
+                    stale.finished_at = stale.finished_at or now
+            resumed = run is not None
+            if run is None:
+                total = (
+                    db.query(MarketplaceProduct)
+                    .filter(MarketplaceProduct.cj_product_id.isnot(None))
+                    .count()
+                )
+                run = CJSyncRun(trigger=self.trigger, total=total, errors=[])
+                db.add(run)
+            run.status = RUNNING
+            run.finished_at = None
+            db.commit()
+            return run.id, run.last_product_id, resumed
+        finally:
+            db.close()
+
+    def _load_batch(self, after_id) -> List[Any]:
+        db = self.session_factory()
+        try:
+            query = db.query(
+                MarketplaceProduct.id,
+                MarketplaceProduct.cj_product_id,
+                MarketplaceProduct.original_price,
+                MarketplaceProduct.selling_price,
+                MarketplaceProduct.status,
+            ).filter(MarketplaceProduct.cj_product_id.isnot(None))
+            if after_id is not None:
+                query = query.filter(MarketplaceProduct.id > after_id)
+            return query.order_by(MarketplaceProduct.id).limit(self.batch_size).all()
+        finally:
+            db.close()
+
+    def _write_batch(self, run_id: int, batch, results) -> None:
+        """Apply changed rows and advance the checkpoint in one transaction."""
+        updates = [
+            {"id": p.id, **r["changes"]}
+            for p, r in zip(batch, results)
+            if r.get("changes")
+        ]
+        errors = [
+            {"cj_product_id": p.cj_product_id, "error": r["error"]}
+            for p, r in zip(batch, results)
+            if "error" in r
+        ]
+        db = self.session_factory()
+        try:
+            # Rows carry different column sets; group them so each UPDATE is one executemany
+            by_columns: Dict[tuple, List[dict]] = {}
+            for row in updates:
+                by_columns.setdefault(tuple(sorted(row)), []).append(row)
+            for rows in by_columns.values():
+                db.execute(update(MarketplaceProduct), rows)
+
+            run = db.get(CJSyncRun, run_id)
+            run.processed += len(batch)
+            run.changed += len(updates)
+            run.failed += len(errors)
+            run.last_product_id = batch[-1].id
+            if errors and len(run.errors or []) < _MAX_STORED_ERRORS:
+                run.errors = ((run.errors or []) + errors)[:_MAX_STORED_ERRORS]
+            db.commit()
+            if updates:
+                response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _record_error(self, run_id: int, cj_product_id: Optional[str], message: str) -> None:
+        db = self.session_factory()
+        try:
+            run = db.get(CJSyncRun, run_id)
+            run.errors = ((run.errors or []) + [{"cj_product_id": cj_product_id, "error": message}])[:_MAX_STORED_ERRORS]
+            db.commit()
+        finally:
+            db.close()
+
+    def _close_run(self, run_id: int, status: str) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            run = db.get(CJSyncRun, run_id)
+            run.status = status
+            run.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            return run_summary(run)
+        finally:
+            db.close()
+
+
+def run_summary(run: CJSyncRun) -> Dict[str, Any]:
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "trigger": run.trigger,
+        "total": run.total,
+        "processed": run.processed,
+        "changed": run.changed,
+        "unchanged": run.processed - run.changed - run.failed,
+        "failed": run.failed,
+        "errors": run.errors or [],
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+    }
+
+
+# ── Admin-triggered background job ─────────────────────
+
+_background_task: Optional[asyncio.Task] = None
+
+
+def is_running() -> bool:
+    return _background_task is not None and not _background_task.done()
+
+
+def start_background_sync(resume: bool = True) -> bool:
+    """Start a sync on the running event loop. False if one is already running in this worker."""
+    global _background_task
+    if is_running():
+        return False
+    job = CJSyncJob(get_cj_service(), trigger="admin")
+    _background_task = asyncio.create_task(job.run(resume=resume))
+    return True
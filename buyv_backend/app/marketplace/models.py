@@ -84,6 +84,14 @@ class MarketplaceProduct(Base):
     # Reel vidéo liée (URL Cloudinary uploadée par le promoteur)
     reel_video_url = Column(String(1000), nullable=True)
     
+    # Promotion principale (la plus ancienne), dénormalisée pour éviter de charger
+    # promotions + posts à chaque sérialisation. Maintenue par
+    # service.refresh_promotion_summary (promotions) et refresh_post_likes (likes).
+    promoter_user_id = Column(String(100))  # UID du promoteur (split de commission)
+    post_uid = Column(String(100))  # Post.uid lié (commentaires)
+    linked_post_id = Column(Integer, index=True)  # Post.id lié (likes / bookmarks)
+    post_likes_count = Column(Integer, default=0)
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -93,33 +101,6 @@ class MarketplaceProduct(Base):
     promotions = relationship("ProductPromotion", back_populates="product")
     sales = relationship("AffiliateSale", back_populates="product")
 
-    @property
-    def promoter_user_id(self) -> str:
-        """Retourne l'UID du premier promoteur lié à ce produit."""
-        if self.promotions:
-            return self.promotions[0].promoter_user_id
-        return ""
-
-    @property
-    def post_uid(self) -> str:
-        """Retourne le post_id de la première promotion liée (pour les commentaires)."""
-        if self.promotions:
-            return self.promotions[0].post_id
-        return ""
-
-    @property
-    def post_likes_count(self) -> int:
-        """Retourne le nombre de likes du post lié à la première promotion."""
-        if not self.promotions:
-            return 0
-        from sqlalchemy.orm import object_session
-        session = object_session(self)
-        if session is None:
-            return 0
-        from ..models import Post as PostModel
-        post = session.query(PostModel).filter(PostModel.uid == self.promotions[0].post_id).first()
-        return (post.likes_count or 0) if post else 0
-
 
 class ProductPromotion(Base):
     """Relation entre un post/reel et un produit (promotion)."""
@@ -310,3 +291,26 @@ class PromotionalBanner(Base):
 
     def __repr__(self):
         return f"<PromotionalBanner id={self.id} title={self.title!r} active={self.is_active}>"
+
+
+class CJSyncRun(Base):
+    """Suivi (et point de reprise) d'une synchronisation prix/stock CJ en masse."""
+    __tablename__ = "cj_sync_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 'running' | 'completed' | 'failed' | 'aborted'
+    status = Column(String(20), nullable=False, default="running")
+    trigger = Column(String(20), nullable=False, default="cli")  # 'cli' | 'admin'
+    # Checkpoint: products are synced in id order, everything <= this id is done
+    last_product_id = Column(UUID(as_uuid=True))
+    total = Column(Integer, default=0, nullable=False)
+    processed = Column(Integer, default=0, nullable=False)
+    changed = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    errors = Column(JSONB, default=list)  # Premières erreurs (pid + message)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<CJSyncRun id={self.id} status={self.status} {self.processed}/{self.total}>"
@@ -0,0 +1,154 @@
+"""
+Totaux pour la liste paginée des produits (GET /marketplace/products).
+
+Le COUNT(*) sur l'ensemble filtré coûtait un second parcours complet à chaque
+page. Modes de comptage :
+
+- ``auto``  (défaut) : total en cache par signature de filtres. En cas de
+  miss sur PostgreSQL, l'estimation du planner (EXPLAIN) est utilisée si elle
+  dépasse PRODUCT_COUNT_ESTIMATE_THRESHOLD, sinon un COUNT exact.
+- ``exact`` : COUNT exact (puis mis en cache).
+- ``none``  : pas de total ; seul ``has_more`` (page lue avec limit + 1) est
+  renseigné, ce qui suffit au client mobile.
+
+Le cache est invalidé au commit de toute écriture ORM qui touche un champ
+filtrable d'un produit (statut, catégorie, prix, commission, texte), y compris
+les UPDATE groupés de cj_sync. Les compteurs (vues, likes) écrits en SQL brut
+ne l'invalident pas. Le TTL borne la dérive dans les autres cas.
+"""
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Query, Session
+
+from app.cache import TTLCache
+from app.config import (
+    PRODUCT_COUNT_CACHE_TTL_SECONDS,
+    PRODUCT_COUNT_CACHE_MAX_ENTRIES,
+    PRODUCT_COUNT_ESTIMATE_THRESHOLD,
+)
+from app.marketplace.models import MarketplaceProduct
+
+logger = logging.getLogger(__name__)
+
+AUTO = "auto"
+EXACT = "exact"
+NONE = "none"
+
+# Colonnes dont la modification peut changer le résultat d'un filtre
+_FILTERED_COLUMNS = (
+    "status", "category_id", "selling_price", "commission_rate",
+    "name", "description", "short_description", "tags",
+)
+
+_DIRTY_KEY = "product_counts_dirty"
+
+
+class ProductCounter:
+    def __init__(
+        self,
+        ttl_seconds: int = PRODUCT_COUNT_CACHE_TTL_SECONDS,
+        max_entries: int = PRODUCT_COUNT_CACHE_MAX_ENTRIES,
+        estimate_threshold: int = PRODUCT_COUNT_ESTIMATE_THRESHOLD,
+    ):
+        self.ttl = ttl_seconds
+        self.estimate_threshold = estimate_threshold
+        self._cache = TTLCache(max_entries)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "exact": 0, "estimated": 0, "invalidations": 0}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._metrics["invalidations"] += 1
+        self._cache.clear()
+
+    def count(self, db: Session, query: Query, signature: Tuple, mode: str = AUTO) -> Tuple[int, bool]:
+        """Retourne (total, estimé ?) pour *query* filtrée selon *signature*."""
+        # Génération lue avant le comptage : un total calculé pendant une écriture
+        # concurrente est rangé sous l'ancienne génération et jamais relu.
+        with self._lock:
+            key = (self._generation, signature)
+        if mode == AUTO:
+            cached = self._cache.get(key)
+            if cached is not None:
+                with self._lock:
+                    self._metrics["hits"] += 1
+                return cached
+            estimate = self._estimate(db, query)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                result = (estimate, True)
+                with self._lock:
+                    self._metrics["estimated"] += 1
+                self._cache.set(key, result, self.ttl)
+                return result
+
+        total = query.enable_eagerloads(False).order_by(None).count()
+        with self._lock:
+            self._metrics["exact"] += 1
+        self._cache.set(key, (total, False), self.ttl)
+        return total, False
+
+    @staticmethod
+    def _estimate(db: Session, query: Query) -> Optional[int]:
+        """Nombre de lignes estimé par le planner PostgreSQL (None ailleurs)."""
+        if db.get_bind().dialect.name != "postgresql":
+            return None
+        try:
+            stmt = query.enable_eagerloads(False).order_by(None).statement
+            compiled = stmt.compile(dialect=db.get_bind().dialect)
+            plan = db.connection().exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params
+            ).scalar()
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except Exception as e:
+            logger.warning(f"Product count estimate failed, falling back to COUNT: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"generation": self._generation, "ttl_seconds": self.ttl, **self._metrics}
+
+
+counter = ProductCounter()
+
+
+# ── Invalidation ───────────────────────────────────────
+
+def _touches_filters(product: MarketplaceProduct) -> bool:
+    state = inspect(product)
+    return any(state.attrs[name].history.has_changes() for name in _FILTERED_COLUMNS)
+
+
+@event.listens_for(MarketplaceProduct, "after_insert")
+@event.listens_for(MarketplaceProduct, "after_delete")
+def _product_added_or_removed(mapper, connection, target) -> None:
+    Session.object_session(target).info[_DIRTY_KEY] = True
+
+
+@event.listens_for(MarketplaceProduct, "after_update")
+def _product_updated(mapper, connection, target) -> None:
+    if _touches_filters(target):
+        Session.object_session(target).info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_product_write(state) -> None:
+    # UPDATE / DELETE groupés via l'ORM (ex. cj_sync) ; pas d'événements par ligne
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None \
+            and state.bind_mapper.class_ is MarketplaceProduct:
+        state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        counter.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
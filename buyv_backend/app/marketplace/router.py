@@ -1,17 +1,23 @@
 """
 Router API pour le Marketplace.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
 from decimal import Decimal
 
 from app.database import get_db
+from app import response_cache
 from app.auth import get_current_user, require_admin_role, get_current_user_optional
-from app.models import User, Post, PostLike, PostBookmark
-from app.marketplace.service import MarketplaceService
+from app.interactions import liked_and_bookmarked, enrich_products
+from app.models import User
+from app.marketplace.service import MarketplaceService, refresh_promotion_summary
 from app.marketplace.cj_service import CJAuthError
+from app.marketplace import cj_cache, cj_sync
+from app.marketplace.models import CJSyncRun
 from app.marketplace.schemas import (
     ProductResponse, ProductListResponse, ProductCreate, ProductUpdate,
     CategoryResponse, CategoryCreate, CategoryUpdate,
@@ -25,39 +31,6 @@ from app.marketplace.schemas import (
 router = APIRouter(prefix="/api/v1", tags=["marketplace"])
 
 
-def _enrich_with_like_bookmark_status(products, db: Session, current_user):
-    """Inject is_liked / is_bookmarked onto marketplace product instances."""
-    if not current_user or not products:
-        return products
-    post_uids = [p.post_uid for p in products if p.post_uid]
-    if not post_uids:
-        return products
-    posts = db.query(Post).filter(Post.uid.in_(post_uids)).all()
-    uid_to_int_id = {p.uid: p.id for p in posts}
-    int_ids = list(uid_to_int_id.values())
-    if int_ids:
-        liked_ids = {
-            r.post_id for r in db.query(PostLike).filter(
-                PostLike.post_id.in_(int_ids),
-                PostLike.user_id == current_user.id
-            ).all()
-        }
-        bookmarked_ids = {
-            r.post_id for r in db.query(PostBookmark).filter(
-                PostBookmark.post_id.in_(int_ids),
-                PostBookmark.user_id == current_user.id
-            ).all()
-        }
-    else:
-        liked_ids = set()
-        bookmarked_ids = set()
-    for product in products:
-        int_id = uid_to_int_id.get(product.post_uid) if product.post_uid else None
-        product.is_liked = int_id in liked_ids if int_id is not None else False
-        product.is_bookmarked = int_id in bookmarked_ids if int_id is not None else False
-    return products
-
-
 # ============================================
 # PRODUCTS - Public
 # ============================================
@@ -72,10 +45,14 @@ def get_products(
     sort_by: str = Query("relevance", regex="^(relevance|price_asc|price_desc|commission|rating|sales|recent|popular)$"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    count: str = Query("auto", regex="^(auto|exact|none)$"),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """Liste des produits avec filtres."""
+    """Liste des produits avec filtres.
+
+    ``count=none`` saute le calcul du total (seul ``has_more`` est renseigné).
+    """
     service = MarketplaceService(db)
     result = service.get_products(
         category_id=category,
@@ -85,23 +62,35 @@ def get_products(
         search=search,
         sort_by=sort_by,
         page=page,
-        limit=limit
+        limit=limit,
+        count_mode=count
     )
-    _enrich_with_like_bookmark_status(result["items"], db, current_user)
+    enrich_products(result["items"], db, current_user)
     return result
 
 
 @router.get("/marketplace/products/featured", response_model=List[ProductResponse])
 def get_featured_products(
+    request: Request,
     limit: int = Query(10, ge=1, le=50),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """Produits mis en avant."""
-    service = MarketplaceService(db)
-    products = service.get_featured_products(limit)
-    _enrich_with_like_bookmark_status(products, db, current_user)
-    return products
+    """Produits mis en avant (réponse anonyme en cache, likes/bookmarks appliqués par utilisateur)."""
+    cache = response_cache.cache
+    key, entry = cache.lookup(response_cache.FEATURED_PRODUCTS, {"limit": limit})
+    if entry is None:
+        products = MarketplaceService(db).get_featured_products(limit)
+        entry = cache.store(key, List[ProductResponse], products,
+                            meta=[p.linked_post_id for p in products])
+    liked_ids, bookmarked_ids = liked_and_bookmarked(db, entry.meta, current_user)
+    if not liked_ids and not bookmarked_ids:
+        return cache.respond(request, entry)
+    items = json.loads(entry.body)
+    for item, post_id in zip(items, entry.meta):
+        item["is_liked"] = post_id in liked_ids
+        item["is_bookmarked"] = post_id in bookmarked_ids
+    return cache.respond(request, entry, json.dumps(items).encode())
 
 
 @router.get("/marketplace/products/{product_id}", response_model=ProductResponse)
@@ -115,18 +104,22 @@ def get_product(
     product = service.get_product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    _enrich_with_like_bookmark_status([product], db, current_user)
+    service.record_product_view(product)
+    enrich_products([product], db, current_user)
     return product
 
 
 @router.get("/marketplace/categories", response_model=List[CategoryResponse])
 def get_categories(
+    request: Request,
     parent_id: Optional[UUID] = None,
     db: Session = Depends(get_db)
 ):
-    """Liste des catégories."""
-    service = MarketplaceService(db)
-    return service.get_categories(parent_id)
+    """Liste des catégories (réponse en cache, voir app/response_cache.py)."""
+    return response_cache.cache.get_or_build(
+        request, response_cache.CATEGORIES, {"parent_id": parent_id}, List[CategoryResponse],
+        lambda: MarketplaceService(db).get_categories(parent_id),
+    )
 
 
 # ============================================
@@ -231,6 +224,7 @@ def update_category(
         setattr(db_category, key, value)
     
     db.commit()
+    response_cache.cache.invalidate(response_cache.CATEGORIES)
     db.refresh(db_category)
     return db_category
 
@@ -256,6 +250,7 @@ def delete_category(
     
     db.delete(db_category)
     db.commit()
+    response_cache.cache.invalidate(response_cache.CATEGORIES)
     return {"message": "Category deleted"}
 
 
@@ -317,6 +312,56 @@ async def sync_product_with_cj(
     return {"message": "Product synced successfully"}
 
 
+@router.post("/admin/cj/sync-all", status_code=status.HTTP_202_ACCEPTED)
+async def sync_all_products_with_cj(
+    resume: bool = True,
+    admin: User = Depends(require_admin_role("admin"))
+):
+    """Lancer la synchronisation prix/stock de tout le catalogue CJ en tâche de fond (Admin).
+
+    resume=true reprend la dernière exécution interrompue à son point de contrôle ;
+    resume=false la marque 'aborted' et repart du premier produit.
+    """
+    try:
+        started = cj_sync.start_background_sync(resume=resume)
+    except ValueError as e:  # CJ not configured
+        raise HTTPException(status_code=400, detail=str(e))
+    if not started:
+        raise HTTPException(status_code=409, detail="A CJ sync is already running")
+    return {"message": "CJ sync started"}
+
+
+@router.get("/admin/cj/sync-all/status")
+def get_cj_sync_status(
+    db: Session = Depends(get_db),
+    admin: User = Depends(require_admin_role("admin"))
+):
+    """État de la dernière synchronisation CJ en masse (Admin)."""
+    run = db.query(CJSyncRun).order_by(CJSyncRun.id.desc()).first()
+    if not run:
+        return {"status": "never_run", "in_progress": False}
+    return {**cj_sync.run_summary(run), "in_progress": cj_sync.is_running()}
+
+
+@router.get("/admin/cj/cache/stats")
+def get_cj_cache_stats(admin: User = Depends(require_admin_role("admin"))):
+    """Statistiques du cache catalogue CJ : hits / stale / misses par endpoint (Admin)."""
+    if cj_cache.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cj_cache.cache.stats()}
+
+
+@router.delete("/admin/cj/cache")
+def purge_cj_cache(
+    endpoint: Optional[str] = Query(None, pattern="^(search|product|categories)$"),
+    admin: User = Depends(require_admin_role("admin"))
+):
+    """Vider le cache catalogue CJ, en entier ou pour un seul endpoint (Admin)."""
+    if cj_cache.cache is None:
+        return {"purged": 0}
+    return {"purged": cj_cache.cache.purge(endpoint)}
+
+
 # ============================================
 # PROMOTIONS
 # ============================================
@@ -375,7 +420,7 @@ def get_user_promotions(
 
 @router.delete("/promotions/{promotion_id}", status_code=204)
 def delete_promotion(
-    promotion_id: int,
+    promotion_id: UUID,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -386,10 +431,15 @@ def delete_promotion(
         raise HTTPException(status_code=404, detail="Promotion not found")
     uid = current_user.uid if hasattr(current_user, 'uid') else str(current_user.id)
     is_admin = current_user.is_admin if hasattr(current_user, 'is_admin') else False
-    if promotion.promoter_uid != uid and not is_admin:
+    if promotion.promoter_user_id != uid and not is_admin:
         raise HTTPException(status_code=403, detail="Access denied")
+    product = promotion.product
     db.delete(promotion)
+    if product is not None:
+        product.total_promotions = max(0, (product.total_promotions or 0) - 1)
+        refresh_promotion_summary(db, product)
     db.commit()
+    response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
 
 
 # ============================================
@@ -135,10 +135,12 @@ class ProductResponse(ProductBase):
 
 class ProductListResponse(BaseModel):
     items: List[ProductResponse]
-    total: int
+    total: Optional[int] = None  # None avec count=none
     page: int
     limit: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    has_more: bool = False  # Page suivante disponible (toujours exact)
+    total_is_estimate: bool = False  # total estimé par le planner (grandes listes)
 
 
 # ============================================
@@ -1,8 +1,9 @@
 """
 Service métier pour le Marketplace.
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc, func
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, desc, func, select
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from decimal import Decimal
@@ -16,18 +17,58 @@ from app.marketplace.schemas import (
     ProductCreate, ProductUpdate, CategoryCreate, CategoryUpdate,
     PromotionCreate, AffiliateSaleCreate, WithdrawalRequest as WithdrawalRequestSchema
 )
-from app.marketplace.cj_service import CJDropshippingService
+from app.marketplace.cj_service import CJDropshippingService, get_cj_service
+from app.marketplace.cj_sync import fetch_remote_state, diff_product
+from app.marketplace import product_counts
 from app.models import Post  # For reel_video_url update on promotion creation
+from app import search_index, counters, response_cache
 
 logger = logging.getLogger(__name__)
 
 
+def refresh_promotion_summary(db: Session, product: MarketplaceProduct) -> None:
+    """Recalculer la promotion principale dénormalisée d'un produit (sans commit).
+
+    À appeler après chaque création / suppression de promotion du produit.
+    """
+    db.flush()
+    primary = db.query(
+        ProductPromotion.post_id, ProductPromotion.promoter_user_id
+    ).filter(
+        ProductPromotion.product_id == product.id
+    ).order_by(ProductPromotion.created_at, ProductPromotion.id).first()
+    post = db.query(Post.id, Post.likes_count).filter(
+        Post.uid == primary.post_id
+    ).first() if primary else None
+
+    product.promoter_user_id = primary.promoter_user_id if primary else None
+    product.post_uid = primary.post_id if primary else None
+    product.linked_post_id = post.id if post else None
+    product.post_likes_count = (post.likes_count or 0) if post else 0
+
+
+def refresh_post_likes(db: Session, post_id: int) -> None:
+    """Recopier Post.likes_count sur les produits dont c'est le post principal (sans commit)."""
+    db.flush()
+    # UPDATE sur la table (pas via l'ORM) : un compteur n'invalide pas les totaux en cache
+    products = MarketplaceProduct.__table__
+    db.execute(
+        products.update()
+        .where(products.c.linked_post_id == post_id)
+        .values(post_likes_count=select(Post.likes_count).where(Post.id == post_id).scalar_subquery())
+    )
+
+
 class MarketplaceService:
     """Service pour gérer le marketplace."""
     
     def __init__(self, db: Session):
         self.db = db
-        self.cj_service = CJDropshippingService()
+
+    @property
+    def cj_service(self) -> CJDropshippingService:
+        """Shared CJ client; only created (and CJ config checked) when a CJ call is made."""
+        return get_cj_service()
     
     # ============================================
     # PRODUCTS
@@ -43,10 +84,17 @@ class MarketplaceService:
         status: str = "active",
         sort_by: str = "relevance",
         page: int = 1,
-        limit: int = 20
+        limit: int = 20,
+        count_mode: str = product_counts.AUTO
     ) -> Dict[str, Any]:
-        """Liste des produits avec filtres."""
-        query = self.db.query(MarketplaceProduct).filter(
+        """Liste des produits avec filtres.
+
+        ``total`` / ``total_pages`` suivent *count_mode* (voir product_counts) ;
+        ``has_more`` est toujours exact (page lue avec limit + 1).
+        """
+        query = self.db.query(MarketplaceProduct).options(
+            joinedload(MarketplaceProduct.category)
+        ).filter(
             MarketplaceProduct.status == status
         )
         
@@ -64,14 +112,8 @@ class MarketplaceService:
             query = query.filter(MarketplaceProduct.commission_rate >= min_commission)
         
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                or_(
-                    MarketplaceProduct.name.ilike(search_term),
-                    MarketplaceProduct.description.ilike(search_term),
-                    MarketplaceProduct.tags.contains([search])
-                )
-            )
+            # Full-text match on name/description/tags; ranked first for "relevance"
+            query = search_index.apply(self.db, query, "products", search, rank=(sort_by == "relevance"))
         
         # Tri
         if sort_by == "price_asc":
@@ -99,35 +141,56 @@ class MarketplaceService:
             )
         
         # Pagination
-        total = query.count()
-        products = query.offset((page - 1) * limit).limit(limit).all()
+        rows = query.offset((page - 1) * limit).limit(limit + 1).all()
+        products, has_more = rows[:limit], len(rows) > limit
+        
+        total = total_pages = None
+        total_is_estimate = False
+        if count_mode != product_counts.NONE:
+            signature = (status, category_id, min_price, max_price, min_commission,
+                         (search or "").strip().lower())
+            if not has_more and (page == 1 or products):
+                # Dernière page : le total se déduit sans COUNT
+                total = (page - 1) * limit + len(products)
+            else:
+                total, total_is_estimate = product_counts.counter.count(
+                    self.db, query, signature, count_mode
+                )
+            total_pages = (total + limit - 1) // limit
         
         return {
             "items": products,
             "total": total,
             "page": page,
             "limit": limit,
-            "total_pages": (total + limit - 1) // limit
+            "total_pages": total_pages,
+            "has_more": has_more,
+            "total_is_estimate": total_is_estimate
         }
     
     def get_product(self, product_id: UUID) -> Optional[MarketplaceProduct]:
         """Obtenir un produit par ID."""
-        product = self.db.query(MarketplaceProduct).filter(
+        return self.db.query(MarketplaceProduct).options(
+            joinedload(MarketplaceProduct.category)
+        ).filter(
             MarketplaceProduct.id == product_id
         ).first()
-        
-        if product:
-            # Incrémenter vues
-            product.total_views += 1
-            self.db.commit()
-        
-        return product
+    
+    def record_product_view(self, product: MarketplaceProduct) -> None:
+        """Compter une vue (écriture différée, voir app/counters.py)."""
+        counters.buffer.incr(MarketplaceProduct.total_views, product.id)
+        product.total_views = (product.total_views or 0) + counters.buffer.pending(
+            MarketplaceProduct.total_views, product.id
+        )
+        # Valeur affichée seulement : ne pas l'écrire au prochain commit
+        set_committed_value(product, "total_views", product.total_views)
     
     def create_product(self, product_data: ProductCreate) -> MarketplaceProduct:
         """Créer un nouveau produit."""
         product = MarketplaceProduct(**product_data.dict())
         self.db.add(product)
         self.db.commit()
+        response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
         self.db.refresh(product)
         return product
     
@@ -142,6 +205,7 @@ class MarketplaceService:
             setattr(product, field, value)
         
         self.db.commit()
+        response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
         self.db.refresh(product)
         return product
     
@@ -153,11 +217,14 @@ class MarketplaceService:
         
         product.status = "inactive"
         self.db.commit()
+        response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
         return True
     
     def get_featured_products(self, limit: int = 10) -> List[MarketplaceProduct]:
         """Produits mis en avant."""
-        return self.db.query(MarketplaceProduct).filter(
+        return self.db.query(MarketplaceProduct).options(
+            joinedload(MarketplaceProduct.category)
+        ).filter(
             MarketplaceProduct.status == "active"
         ).order_by(
             desc(MarketplaceProduct.is_featured),
@@ -274,27 +341,18 @@ class MarketplaceService:
         return self.create_product(product_data)
     
     async def sync_product_with_cj(self, product_id: UUID) -> bool:
-        """Synchroniser prix/stock avec CJ."""
+        """Synchroniser prix/stock avec CJ (voir cj_sync pour le catalogue entier)."""
         product = self.get_product(product_id)
         if not product or not product.cj_product_id:
             return False
         
         try:
-            cj_data = await self.cj_service.get_product_details(product.cj_product_id)
-            parsed = self.cj_service.parse_product_data(cj_data)
-            
-            # Mettre à jour prix
-            product.original_price = parsed["original_price"]
-            product.selling_price = parsed["selling_price"]
-            
-            # Vérifier stock
-            inventory = await self.cj_service.check_inventory(product.cj_product_id)
-            if not inventory.get("in_stock", False):
-                product.status = "out_of_stock"
-            else:
-                product.status = "active"
-            
+            # Détails + stock en parallèle, sans passer par le cache catalogue
+            remote = await fetch_remote_state(self.cj_service, product.cj_product_id)
+            for field, value in diff_product(product, remote).items():
+                setattr(product, field, value)
             self.db.commit()
+            response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
             return True
         except Exception as e:
             logger.error(f"Failed to sync product {product_id}: {str(e)}")
@@ -322,6 +380,7 @@ class MarketplaceService:
         category = ProductCategory(**category_data.dict())
         self.db.add(category)
         self.db.commit()
+        response_cache.cache.invalidate(response_cache.CATEGORIES)
         self.db.refresh(category)
         return category
     
@@ -351,6 +410,7 @@ class MarketplaceService:
         product = self.get_product(promotion_data.product_id)
         if product:
             product.total_promotions += 1
+            refresh_promotion_summary(self.db, product)
             # Lier la vidéo du post au produit pour l'affichage dans le feed reels
             try:
                 post = self.db.query(Post).filter(Post.uid == str(promotion_data.post_id)).first()
@@ -361,6 +421,7 @@ class MarketplaceService:
                 logger.warning(f"⚠️ Could not update reel_video_url: {e}")
         
         self.db.commit()
+        response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
         self.db.refresh(promotion)
         return promotion
     
@@ -383,22 +444,12 @@ class MarketplaceService:
         ).order_by(desc(ProductPromotion.created_at)).all()
     
     def increment_promotion_view(self, promotion_id: UUID):
-        """Incrémenter vues d'une promotion."""
-        promotion = self.db.query(ProductPromotion).filter(
-            ProductPromotion.id == promotion_id
-        ).first()
-        if promotion:
-            promotion.views_count += 1
-            self.db.commit()
+        """Incrémenter vues d'une promotion (écriture différée)."""
+        counters.buffer.incr(ProductPromotion.views_count, promotion_id)
     
     def increment_promotion_click(self, promotion_id: UUID):
-        """Incrémenter clics d'une promotion."""
-        promotion = self.db.query(ProductPromotion).filter(
-            ProductPromotion.id == promotion_id
-        ).first()
-        if promotion:
-            promotion.clicks_count += 1
-            self.db.commit()
+        """Incrémenter clics d'une promotion (écriture différée)."""
+        counters.buffer.incr(ProductPromotion.clicks_count, promotion_id)
     
     # ============================================
     # AFFILIATE SALES
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, UniqueConstraint, Float
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, ForeignKey, UniqueConstraint, Float, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from datetime import datetime
+from datetime import date, datetime
 import uuid
 from .database import Base
 
@@ -29,6 +29,9 @@ class User(Base):
     # FCM token for push notifications
     fcm_token: Mapped[str | None] = mapped_column(String(512), nullable=True)
 
+    # Maintained by app/notifications.py so the unread badge is a PK lookup
+    unread_notifications_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
     def is_promoter(self, db_session) -> bool:
         """Check if user is a promoter by checking if they have a PromoterWallet"""
         from sqlalchemy import select
@@ -46,6 +49,12 @@ class Notification(Base):
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Inbox pages (keyset on created_at, id) and unread scans per user
+        Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        Index('ix_notifications_user_created_id', 'user_id', 'created_at', 'id'),
+    )
+
     user = relationship("User")
 
 class Follow(Base):
@@ -57,12 +66,34 @@ class Follow(Base):
 
     __table_args__ = (
         UniqueConstraint('follower_id', 'followed_id', name='uq_follow_pair'),
+        # Keyset-paginated follower / following lists, newest first. The other side's
+        # id is the last column so each page is an index-only range scan.
+        Index('ix_follows_followed_created', 'followed_id', 'created_at', 'id', 'follower_id'),
+        Index('ix_follows_follower_created', 'follower_id', 'created_at', 'id', 'followed_id'),
     )
 
     follower = relationship("User", foreign_keys=[follower_id])
     followed = relationship("User", foreign_keys=[followed_id])
 
 
+class UserSuggestion(Base):
+    """Precomputed "people you may know" candidates for one user.
+
+    Rebuilt by suggestions.build_suggestions from second-degree follows (accounts
+    followed by the accounts the user follows); GET /users/suggested reads it.
+    """
+    __tablename__ = "user_suggestions"
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    candidate_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    mutual_count: Mapped[int] = mapped_column(Integer, default=0)  # followed accounts that follow the candidate
+    score: Mapped[float] = mapped_column(Float, default=0.0)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_user_suggestions_user_score', 'user_id', 'score', 'candidate_id'),
+    )
+
+
 class Order(Base):
     __tablename__ = "orders"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -151,11 +182,38 @@ class Post(Base):
     marketplace_product_uid: Mapped[str | None] = mapped_column(String(36), nullable=True, index=True)
     is_promoted: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    __table_args__ = (
+        # Keyset pagination of the feed: ORDER BY created_at DESC, id DESC
+        Index('ix_posts_created_at_id', 'created_at', 'id'),
+        # Per-author timelines (profile grid, fan-out-on-read for large accounts)
+        Index('ix_posts_user_created_at', 'user_id', 'created_at'),
+    )
+
     user = relationship("User")
     likes = relationship("PostLike", back_populates="post", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
 
 
+class FeedInboxEntry(Base):
+    """Materialized "following" timeline: one row per (follower, post).
+
+    Written at post time (fan-out-on-write) for authors below
+    FEED_FANOUT_MAX_FOLLOWERS; posts by larger accounts are merged in at read time.
+    created_at mirrors the post's created_at so the inbox shares the feed's keyset cursor.
+    """
+    __tablename__ = "feed_inbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id: Mapped[int] = mapped_column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    author_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'post_id', name='uq_feed_inbox_entry'),
+        Index('ix_feed_inbox_user_created_post', 'user_id', 'created_at', 'post_id'),
+    )
+
+
 class PostLike(Base):
     __tablename__ = "post_likes"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -244,6 +302,11 @@ class AffiliateClick(Base):
     converted_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     order_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("orders.id"), nullable=True)
 
+    __table_args__ = (
+        # Raw tail of promoter analytics (rows newer than the last compacted day)
+        Index('ix_affiliate_clicks_promoter_created', 'promoter_uid', 'created_at'),
+    )
+
 
 class ReelView(Base):
     """Track Reel impressions for analytics"""
@@ -269,6 +332,28 @@ class ReelView(Base):
     # Unique constraint: one view per user per reel per session
     __table_args__ = (
         UniqueConstraint('reel_id', 'viewer_uid', 'session_id', name='uq_reel_view'),
+        Index('ix_reel_views_promoter_created', 'promoter_uid', 'created_at'),
+    )
+
+
+class PromoterDailyStat(Base):
+    """Per-promoter daily rollup of reel_views / affiliate_clicks / commissions.
+
+    Rebuilt for closed days by analytics_rollup.compact_promoter_rollups; the
+    current day is always read from the raw tables.
+    """
+    __tablename__ = "promoter_daily_stats"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    promoter_uid: Mapped[str] = mapped_column(String(36), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    views: Mapped[int] = mapped_column(Integer, default=0)
+    clicks: Mapped[int] = mapped_column(Integer, default=0)
+    conversions: Mapped[int] = mapped_column(Integer, default=0)  # clicks made that day that later converted
+    commission_amount: Mapped[float] = mapped_column(Float, default=0.0)  # commissions created that day
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('promoter_uid', 'day', name='uq_promoter_daily_stat'),
     )
 
 
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Iterable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, case, or_, update
 from sqlalchemy.orm import Session
 from .database import get_db
 from .models import User, Notification
 from .auth import get_current_user
 from .schemas import NotificationCreate, NotificationOut
-from .firebase_service import FirebaseService, NotificationType
+from .push_dispatcher import dispatcher as push_dispatcher
+from .pagination import apply_keyset, decode_cursor, next_cursor_for, NEXT_CURSOR_HEADER
+from . import auth_cache
 import json
 import logging
 
@@ -12,14 +17,63 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 
+def adjust_unread_count(db: Session, user_ids: Iterable[int], delta: int) -> None:
+    """Add *delta* to users.unread_notifications_count in one UPDATE, never going below 0.
+
+    Callers commit. Every write that creates, reads or deletes unread
+    notifications goes through here so GET /notifications/unread-count stays O(1).
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    col = User.unread_notifications_count
+    uids = db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        # Keep updated_at as is: the badge counter is not a profile edit
+        .values(
+            unread_notifications_count=case((col + delta > 0, col + delta), else_=0),
+            updated_at=User.updated_at,
+        )
+        .returning(User.uid)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    auth_cache.evict_users_on_commit(db, uids)
+
+
+def _reset_unread_count(db: Session, user_id: int) -> None:
+    uids = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(unread_notifications_count=0, updated_at=User.updated_at)
+        .returning(User.uid)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    auth_cache.evict_users_on_commit(db, uids)
+
+
+def _to_out(row: Notification, user_uid: str) -> NotificationOut:
+    return NotificationOut(
+        id=row.id,
+        userId=user_uid,
+        title=row.title,
+        body=row.body,
+        type=row.type,
+        # Parse JSON string from DB
+        data=(json.loads(row.data) if row.data else {}),
+        isRead=row.is_read,
+        createdAt=row.created_at,
+    )
+
+
 @router.post("/", response_model=NotificationOut)
 def create_notification(payload: NotificationCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Create a notification for a target user.
-    Also sends a push notification if the user has an FCM token registered.
+    Also queues a push notification if the user has an FCM token registered.
     """
     # Create notification for the target user by uid provided, defaulting to current user
-    target_uid = payload.userId or current_user.uid
+    target_uid = payload.user_id or current_user.uid
     target = db.query(User).filter(User.uid == target_uid).first()
     if not target:
         raise HTTPException(status_code=404, detail="User not found")
@@ -34,26 +88,21 @@ def create_notification(payload: NotificationCreate, db: Session = Depends(get_d
         data=json.dumps(payload.data or {}),
     )
     db.add(notif)
+    adjust_unread_count(db, [target.id], 1)
     db.commit()
     db.refresh(notif)
     
-    # Send push notification if user has FCM token
+    # Queue a push notification if user has FCM token; sent by app/push_dispatcher.py
     if target.fcm_token:
-        try:
-            notification_data = payload.data or {}
-            notification_data['notification_id'] = str(notif.id)
-            
-            FirebaseService.send_notification(
-                token=target.fcm_token,
-                title=payload.title,
-                body=payload.body,
-                data=notification_data,
-                notification_type=payload.type
-            )
-            logger.info(f"Push notification sent to user {target.uid}")
-        except Exception as e:
-            logger.error(f"Failed to send push notification: {e}")
-            # Don't fail the request if push notification fails
+        notification_data = dict(payload.data or {})
+        notification_data['notification_id'] = str(notif.id)
+        push_dispatcher.enqueue(
+            tokens=[target.fcm_token],
+            title=payload.title,
+            body=payload.body,
+            data=notification_data,
+            notification_type=payload.type,
+        )
     
     return NotificationOut(
         id=notif.id,
@@ -69,21 +118,73 @@ def create_notification(payload: NotificationCreate, db: Session = Depends(get_d
 
 
 @router.get("/me", response_model=list[NotificationOut])
-def list_my_notifications(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    rows = db.query(Notification).filter(Notification.user_id == current_user.id).order_by(Notification.created_at.desc()).all()
-    return [
-        NotificationOut(
-            id=row.id,
-            userId=current_user.uid,
-            title=row.title,
-            body=row.body,
-            type=row.type,
-            # Parse JSON string from DB
-            data=(json.loads(row.data) if row.data else {}),
-            isRead=row.is_read,
-            createdAt=row.created_at,
-        ) for row in rows
-    ]
+def list_my_notifications(
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    unread_only: bool = Query(default=False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    The current user's inbox, newest first, one page at a time.
+    Pass the X-Next-Cursor header of the previous page as ?cursor= to continue.
+    """
+    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)  # noqa: E712
+    rows = apply_keyset(query, Notification.created_at, Notification.id, cursor).limit(limit).all()
+
+    next_cursor = next_cursor_for(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return [_to_out(row, current_user.uid) for row in rows]
+
+
+@router.get("/unread-count")
+def get_unread_count(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Unread badge count, read from the maintained counter (primary-key lookup)."""
+    count = (
+        db.query(User.unread_notifications_count)
+        .filter(User.id == current_user.id)
+        .scalar()
+    )
+    return {"unread_count": count or 0}
+
+
+@router.post("/read-all")
+def mark_all_as_read(
+    cursor: Optional[str] = Query(default=None, description="Only mark notifications up to and including this page cursor"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Mark the inbox read with a single UPDATE.
+
+    Without a cursor every notification is marked read. With ?cursor= (an
+    X-Next-Cursor value) only the notifications the client has already paged
+    through -- that row and everything newer -- are marked read.
+    """
+    conditions = [Notification.user_id == current_user.id, Notification.is_read == False]  # noqa: E712
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        conditions.append(or_(
+            Notification.created_at > created_at,
+            and_(Notification.created_at == created_at, Notification.id >= row_id),
+        ))
+    result = db.execute(
+        update(Notification)
+        .where(*conditions)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    if cursor:
+        adjust_unread_count(db, [current_user.id], -result.rowcount)
+    else:
+        _reset_unread_count(db, current_user.id)
+    db.commit()
+    return {"status": "ok", "updated": result.rowcount}
 
 
 @router.post("/{notification_id}/read")
@@ -91,7 +192,9 @@ def mark_as_read(notification_id: int, db: Session = Depends(get_db), current_us
     notif = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id).first()
     if not notif:
         raise HTTPException(status_code=404, detail="Notification not found")
-    notif.is_read = True
+    if not notif.is_read:
+        notif.is_read = True
+        adjust_unread_count(db, [current_user.id], -1)
     db.commit()
     return {"status": "ok"}
 
@@ -101,6 +204,8 @@ def delete_notification(notification_id: int, db: Session = Depends(get_db), cur
     notif = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id).first()
     if not notif:
         raise HTTPException(status_code=404, detail="Notification not found")
+    if not notif.is_read:
+        adjust_unread_count(db, [current_user.id], -1)
     db.delete(notif)
     db.commit()
     return {"status": "ok"}
@@ -109,5 +214,6 @@ def delete_notification(notification_id: int, db: Session = Depends(get_db), cur
 @router.delete("/")
 def clear_all_notifications(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     count = db.query(Notification).filter(Notification.user_id == current_user.id).delete()
+    _reset_unread_count(db, current_user.id)
     db.commit()
-    return {"status": "ok", "deleted": count}
\ No newline at end of file
+    return {"status": "ok", "deleted": count}
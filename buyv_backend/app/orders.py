@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from datetime import datetime
 import json
 
@@ -61,7 +61,6 @@ def _map_order_out(order: Order, db: Session) -> dict:
     except Exception:
         shipping_addr_dict = None
 
-    user = db.query(User).filter(User.id == order.user_id).first()
     # order.user_id is int. Schema OrderOut.user_id is int. OrderOut.promoter_uid is string.
 
     return {
@@ -203,6 +202,7 @@ def list_my_orders(
 ):
     rows = (
         db.query(Order)
+        .options(selectinload(Order.items))
         .filter(Order.user_id == current_user.id)
         .order_by(Order.created_at.desc())
         .all()
@@ -234,6 +234,7 @@ def list_my_orders_by_status(
 ):
     rows = (
         db.query(Order)
+        .options(selectinload(Order.items))
         .filter(Order.user_id == current_user.id, Order.status == status)
         .order_by(Order.created_at.desc())
         .all()
@@ -0,0 +1,53 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token encoding the sort key of the last row
+of a page: ``(created_at, id)``. The next page is everything strictly "after"
+that key in ``created_at DESC, id DESC`` order, which stays stable when new
+rows are inserted mid-scroll and costs one index range scan regardless of depth.
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode a ``(created_at, id)`` sort key as an opaque cursor string."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by :func:`encode_cursor`. Raises 400 if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_raw, id_raw = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(created_raw), int(id_raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, created_col, id_col, cursor: Optional[str]):
+    """Order *query* newest-first and, if *cursor* is given, seek past it."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                created_col < created_at,
+                and_(created_col == created_at, id_col < row_id),
+            )
+        )
+    return query.order_by(created_col.desc(), id_col.desc())
+
+
+def next_cursor_for(rows, limit: int, created_attr: str = "created_at", id_attr: str = "id") -> Optional[str]:
+    """Return the cursor for the page after *rows*, or None when it was the last page."""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, created_attr), getattr(last, id_attr))
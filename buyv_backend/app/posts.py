@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -6,8 +6,14 @@ from datetime import datetime
 from .database import get_db
 from .models import User, Post, PostLike, PostBookmark
 from .marketplace.models import MarketplaceProduct, ProductPromotion
+from .marketplace.service import refresh_post_likes, refresh_promotion_summary
 from .auth import get_current_user, get_current_user_optional
-from .schemas import PostOut, CountResponse, PostCreate
+from .schemas import (
+    PostOut, CountResponse, PostCreate,
+    InteractionStateRequest, InteractionStateResponse, PostState, ProductState,
+)
+from .pagination import apply_keyset, next_cursor_for, NEXT_CURSOR_HEADER
+from . import feed, interactions, search_index
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
@@ -63,27 +69,16 @@ def create_post(
     # Update counters for reels
     if post_type == "reel":
         current_user.reels_count = (current_user.reels_count or 0) + 1
+    db.flush()
+    # Push into followers' "following" timelines in the same transaction
+    feed.fan_out_post(db, row, current_user)
     db.commit()
     db.refresh(row)
     return _map_post_out(row, current_user, liked=False)
 
 
-@router.get("/feed", response_model=List[PostOut])
-def get_feed(
-    limit: int = Query(default=20, ge=1, le=100),
-    offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional),
-):
-    # Global feed for now
-    rows = (
-        db.query(Post)
-        .order_by(Post.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
-    
+def _map_posts_out(rows: List[Post], db: Session, current_user: Optional[User]) -> List[PostOut]:
+    """Hydrate a page of posts with authors and my like/bookmark state (2 queries max)."""
     if not rows:
         return []
 
@@ -93,16 +88,7 @@ def get_feed(
     user_map = {u.id: u for u in users}
 
     # Fetch my likes and bookmarks if authenticated
-    liked_post_ids = set()
-    bookmarked_post_ids = set()
-    
-    if current_user:
-        post_ids = [r.id for r in rows]
-        my_likes = db.query(PostLike).filter(PostLike.user_id == current_user.id, PostLike.post_id.in_(post_ids)).all()
-        liked_post_ids = {l.post_id for l in my_likes}
-
-        my_bookmarks = db.query(PostBookmark).filter(PostBookmark.user_id == current_user.id, PostBookmark.post_id.in_(post_ids)).all()
-        bookmarked_post_ids = {b.post_id for b in my_bookmarks}
+    liked_post_ids, bookmarked_post_ids = interactions.liked_and_bookmarked(db, (r.id for r in rows), current_user)
 
     out = []
     for r in rows:
@@ -115,6 +101,57 @@ def get_feed(
     return out
 
 
+@router.get("/feed", response_model=List[PostOut])
+def get_feed(
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+):
+    """
+    Global feed, newest first.
+
+    Two paging modes coexist:
+      - cursor (preferred): pass the X-Next-Cursor header of the previous page as ?cursor=.
+        Seeks on the (created_at, id) index, so deep pages cost the same as page 1 and
+        reels posted mid-scroll never shift items between pages.
+      - offset (legacy clients): ?offset=N, ignored when a cursor is given.
+    """
+    query = apply_keyset(db.query(Post), Post.created_at, Post.id, cursor)
+    if not cursor:
+        query = query.offset(offset)
+    rows = query.limit(limit).all()
+
+    next_cursor = next_cursor_for(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return _map_posts_out(rows, db, current_user)
+
+
+@router.get("/feed/following", response_model=List[PostOut])
+def get_following_feed(
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Posts from accounts the current user follows, newest first.
+    Served from the precomputed feed_inbox (see app/feed.py), cursor-paginated like /feed.
+    """
+    rows = feed.read_following_feed(db, current_user, limit, cursor)
+
+    next_cursor = next_cursor_for(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return _map_posts_out(rows, db, current_user)
+
+
 @router.get("/bookmarks", response_model=List[PostOut])
 def get_my_bookmarked_posts(
     skip: int = Query(default=0, ge=0),
@@ -144,11 +181,7 @@ def get_my_bookmarked_posts(
     author_map = {a.id: a for a in authors}
 
     # Fetch likes for current user
-    my_likes = db.query(PostLike).filter(
-        PostLike.user_id == current_user.id,
-        PostLike.post_id.in_(post_ids)
-    ).all()
-    liked_post_ids = {l.post_id for l in my_likes}
+    liked_post_ids, _ = interactions.liked_and_bookmarked(db, post_ids, current_user)
 
     out: List[PostOut] = []
     for br in bookmark_rows:
@@ -161,6 +194,83 @@ def get_my_bookmarked_posts(
     return out
 
 
+# Declared before /{post_uid} so "search" is not captured as a post uid
+@router.get("/search", response_model=List[PostOut])
+def search_posts(
+    q: str = Query(..., min_length=1, description="Search query"),
+    type: Optional[str] = Query(default=None, description="Filter by post type: reel, product, photo"),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+):
+    """Search posts by caption with pagination, most relevant first"""
+    query = search_index.apply(db, db.query(Post), "posts", q)
+    
+    # Filter by type if provided
+    if type and type in {"reel", "product", "photo"}:
+        query = query.filter(Post.type == type)
+    
+    # Apply pagination
+    rows = (
+        query.order_by(Post.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    
+    return _map_posts_out(rows, db, current_user)
+
+
+@router.post("/state", response_model=InteractionStateResponse)
+def get_interaction_state(
+    payload: InteractionStateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Liked / bookmarked state and counters for many posts and marketplace products.
+    POST /posts/state {"postUids": [...], "productIds": [...]}
+    At most three queries: posts, products, then my likes and bookmarks for both.
+    Unknown uids / ids are left out of the response.
+    """
+    posts = []
+    if payload.post_uids:
+        posts = db.query(Post.id, Post.uid, Post.likes_count, Post.comments_count).filter(
+            Post.uid.in_(set(payload.post_uids))
+        ).all()
+    products = []
+    if payload.product_ids:
+        products = db.query(
+            MarketplaceProduct.id, MarketplaceProduct.post_uid,
+            MarketplaceProduct.linked_post_id, MarketplaceProduct.post_likes_count,
+        ).filter(MarketplaceProduct.id.in_(set(payload.product_ids))).all()
+
+    liked, bookmarked = interactions.liked_and_bookmarked(
+        db, [p.id for p in posts] + [p.linked_post_id for p in products], current_user
+    )
+    return InteractionStateResponse(
+        posts={
+            p.uid: PostState(
+                is_liked=p.id in liked,
+                is_bookmarked=p.id in bookmarked,
+                likes_count=p.likes_count or 0,
+                comments_count=p.comments_count or 0,
+            )
+            for p in posts
+        },
+        products={
+            str(p.id): ProductState(
+                post_uid=p.post_uid,
+                is_liked=p.linked_post_id in liked,
+                is_bookmarked=p.linked_post_id in bookmarked,
+                post_likes_count=p.post_likes_count or 0,
+            )
+            for p in products
+        },
+    )
+
+
 @router.get("/{post_uid}", response_model=PostOut)
 def get_post(
     post_uid: str,
@@ -172,18 +282,11 @@ def get_post(
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Get the author
-    author = db.query(User).filter(User.id == post.user_id).first()
-    if not author:
+    # Author plus my like / bookmark state, through the same loader as the lists
+    out = _map_posts_out([post], db, current_user)
+    if not out:
         raise HTTPException(status_code=404, detail="Post author not found")
-    
-    # Check if current user liked this post
-    liked = db.query(PostLike).filter(
-        PostLike.user_id == current_user.id,
-        PostLike.post_id == post.id
-    ).first() is not None
-    
-    return _map_post_out(post, author, liked=liked)
+    return out[0]
 
 
 @router.get("/user/{uid}", response_model=List[PostOut])
@@ -306,11 +409,7 @@ def list_user_bookmarked_posts(
     author_map = {a.id: a for a in authors}
 
     # Fetch likes status for these posts for the current user
-    my_likes = db.query(PostLike).filter(
-        PostLike.user_id == current_user.id, 
-        PostLike.post_id.in_(post_ids)
-    ).all()
-    liked_post_ids = {l.post_id for l in my_likes}
+    liked_post_ids, _ = interactions.liked_and_bookmarked(db, post_ids, current_user)
 
     out: List[PostOut] = []
     for br in bookmark_rows:
@@ -326,60 +425,11 @@ def list_user_bookmarked_posts(
     return out
 
 
-@router.get("/search", response_model=List[PostOut])
-def search_posts(
-    q: str = Query(..., min_length=1, description="Search query"),
-    type: Optional[str] = Query(default=None, description="Filter by post type: reel, product, photo"),
-    limit: int = Query(default=20, ge=1, le=100),
-    offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional),
-):
-    """Search posts by caption with pagination"""
-    search_pattern = f"%{q}%"
-    
-    # Base query
-    query = db.query(Post).filter(Post.caption.ilike(search_pattern))
-    
-    # Filter by type if provided
-    if type and type in {"reel", "product", "photo"}:
-        query = query.filter(Post.type == type)
-    
-    # Apply pagination
-    rows = (
-        query.order_by(Post.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
-    
-    if not rows:
-        return []
-    
-    # Fetch authors
-    user_ids = list({p.user_id for p in rows})
-    users = db.query(User).filter(User.id.in_(user_ids)).all()
-    user_map = {u.id: u for u in users}
-    
-    # Fetch likes if user is authenticated
-    liked_post_ids = set()
-    if current_user:
-        post_ids = [r.id for r in rows]
-        my_likes = db.query(PostLike).filter(
-            PostLike.user_id == current_user.id,
-            PostLike.post_id.in_(post_ids)
-        ).all()
-        liked_post_ids = {l.post_id for l in my_likes}
-    
-    # Map to output
-    out = []
-    for r in rows:
-        author = user_map.get(r.user_id)
-        if author:
-            is_liked = r.id in liked_post_ids
-            out.append(_map_post_out(r, author, liked=is_liked))
-    
-    return out
+def _not_found_or(db: Session, post_uid: str, status: str) -> dict:
+    """No row changed: the post is missing (404) or the state was already *status*."""
+    if interactions.post_id_for(db, post_uid) is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return {"status": status}
 
 
 @router.post("/{post_uid}/like")
@@ -388,15 +438,11 @@ def like_post(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    post = db.query(Post).filter(Post.uid == post_uid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    existing = db.query(PostLike).filter(PostLike.post_id == post.id, PostLike.user_id == current_user.id).first()
-    if existing:
-        return {"status": "already_liked"}
-    like = PostLike(post_id=post.id, user_id=current_user.id)
-    db.add(like)
-    post.likes_count = (post.likes_count or 0) + 1
+    post_id = interactions.add_post_interaction(db, PostLike, post_uid, current_user.id)
+    if post_id is None:
+        return _not_found_or(db, post_uid, "already_liked")
+    interactions.bump_counter(db, Post.likes_count, post_id, 1)
+    refresh_post_likes(db, post_id)
     db.commit()
     return {"status": "liked"}
 
@@ -407,14 +453,11 @@ def unlike_post(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    post = db.query(Post).filter(Post.uid == post_uid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    existing = db.query(PostLike).filter(PostLike.post_id == post.id, PostLike.user_id == current_user.id).first()
-    if not existing:
-        return {"status": "not_liked"}
-    db.delete(existing)
-    post.likes_count = max(0, (post.likes_count or 0) - 1)
+    post_id = interactions.remove_post_interaction(db, PostLike, post_uid, current_user.id)
+    if post_id is None:
+        return _not_found_or(db, post_uid, "not_liked")
+    interactions.bump_counter(db, Post.likes_count, post_id, -1)
+    refresh_post_likes(db, post_id)
     db.commit()
     return {"status": "unliked"}
 
@@ -438,20 +481,8 @@ def bookmark_post(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    post = db.query(Post).filter(Post.uid == post_uid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    existing = db.query(PostBookmark).filter(
-        PostBookmark.post_id == post.id,
-        PostBookmark.user_id == current_user.id
-    ).first()
-    
-    if existing:
-        return {"status": "already_bookmarked"}
-    
-    bookmark = PostBookmark(post_id=post.id, user_id=current_user.id)
-    db.add(bookmark)
+    if interactions.add_post_interaction(db, PostBookmark, post_uid, current_user.id) is None:
+        return _not_found_or(db, post_uid, "already_bookmarked")
     db.commit()
     return {"status": "bookmarked"}
 
@@ -462,19 +493,8 @@ def unbookmark_post(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    post = db.query(Post).filter(Post.uid == post_uid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    existing = db.query(PostBookmark).filter(
-        PostBookmark.post_id == post.id,
-        PostBookmark.user_id == current_user.id
-    ).first()
-    
-    if not existing:
-        return {"status": "not_bookmarked"}
-    
-    db.delete(existing)
+    if interactions.remove_post_interaction(db, PostBookmark, post_uid, current_user.id) is None:
+        return _not_found_or(db, post_uid, "not_bookmarked")
     db.commit()
     return {"status": "unbookmarked"}
 
@@ -508,9 +528,14 @@ def delete_post(
         raise HTTPException(status_code=403, detail="Not allowed")
     post_type = post.type
     # Clean up related product_promotions (post_id is the post UID string)
+    promoted = db.query(MarketplaceProduct).join(
+        ProductPromotion, ProductPromotion.product_id == MarketplaceProduct.id
+    ).filter(ProductPromotion.post_id == post_uid).all()
     db.query(ProductPromotion).filter(ProductPromotion.post_id == post_uid).delete()
     # Delete the post (comments, likes, bookmarks cascade via FK)
     db.delete(post)
+    for product in promoted:
+        refresh_promotion_summary(db, product)
     if post_type == "reel":
         current_user.reels_count = max(0, (current_user.reels_count or 0) - 1)
     db.commit()
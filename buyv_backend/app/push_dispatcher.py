@@ -0,0 +1,344 @@
+"""
+Background push notification dispatcher.
+
+Request handlers only enqueue a push job (tokens + payload) and return. A
+background flusher drains the queue every PUSH_FLUSH_INTERVAL_MS (or as soon as
+PUSH_BATCH_SIZE tokens are waiting), coalesces jobs
+that carry the same payload, splits their tokens into send_multicast chunks of
+PUSH_BATCH_SIZE and sends the chunks on a pool of PUSH_WORKERS threads.
+
+A chunk whose send raises is retried up to PUSH_MAX_RETRIES times with
+exponential backoff starting at PUSH_RETRY_BACKOFF_MS. Tokens FCM reports as
+unregistered (``invalid_tokens``) are cleared from users.fcm_token with one
+UPDATE per flush so they are not retried forever.
+
+The transport is swappable: PUSH_BACKEND=fake (or assigning ``dispatcher.transport``)
+replaces Firebase with FakePushTransport, which records sends in memory.
+
+When the queue holds PUSH_QUEUE_MAX_JOBS jobs, new ones are dropped and counted.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+
+from .config import (
+    PUSH_BACKEND,
+    PUSH_WORKERS,
+    PUSH_BATCH_SIZE,
+    PUSH_FLUSH_INTERVAL_MS,
+    PUSH_QUEUE_MAX_JOBS,
+    PUSH_MAX_RETRIES,
+    PUSH_RETRY_BACKOFF_MS,
+)
+from .database import SessionLocal
+from .firebase_service import FirebaseService
+from .models import User
+from . import auth_cache
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DROPPED = "dropped"
+SKIPPED = "skipped"
+
+
+# ── Transports ─────────────────────────────────────────
+
+class FirebasePushTransport:
+    """Sends through FirebaseService, raising on errors so chunks can be retried."""
+
+    def send_multicast(self, tokens: List[str], title: str, body: str,
+                       data: Optional[dict], notification_type: str) -> dict:
+        return FirebaseService.send_multicast(
+            tokens=tokens,
+            title=title,
+            body=body,
+            data=dict(data or {}),
+            notification_type=notification_type,
+            raise_errors=True,
+        )
+
+
+class FakePushTransport:
+    """In-memory stand-in for FCM.
+
+    Every call is appended to ``sent``. Tokens in ``invalid_tokens`` are reported
+    as unregistered, and the next ``fail_next`` calls raise to exercise retries.
+    """
+
+    def __init__(self, invalid_tokens: Iterable[str] = (), fail_next: int = 0):
+        self.invalid_tokens = set(invalid_tokens)
+        self.fail_next = fail_next
+        self.sent: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def send_multicast(self, tokens: List[str], title: str, body: str,
+                       data: Optional[dict], notification_type: str) -> dict:
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise ConnectionError("fake transient FCM failure")
+            self.sent.append({
+                "tokens": list(tokens),
+                "title": title,
+                "body": body,
+                "data": dict(data or {}),
+                "type": notification_type,
+            })
+        invalid = [t for t in tokens if t in self.invalid_tokens]
+        return {
+            "success_count": len(tokens) - len(invalid),
+            "failure_count": len(invalid),
+            "invalid_tokens": invalid,
+        }
+
+
+def make_transport(backend: str = PUSH_BACKEND):
+    if backend == "fake":
+        return FakePushTransport()
+    return FirebasePushTransport()
+
+
+# ── Dispatcher ─────────────────────────────────────────
+
+class PushDispatcher:
+    def __init__(
+        self,
+        transport=None,
+        workers: int = PUSH_WORKERS,
+        batch_size: int = PUSH_BATCH_SIZE,
+        flush_interval_ms: int = PUSH_FLUSH_INTERVAL_MS,
+        max_jobs: int = PUSH_QUEUE_MAX_JOBS,
+        max_retries: int = PUSH_MAX_RETRIES,
+        retry_backoff_ms: int = PUSH_RETRY_BACKOFF_MS,
+        session_factory=SessionLocal,
+    ):
+        self.transport = transport or make_transport()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_jobs = max_jobs
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000.0
+        self.session_factory = session_factory
+
+        self._jobs: deque = deque()
+        self._queued_tokens = 0
+        self._jobs_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Loop running the flusher: enqueue() is called from threadpool threads,
+        # which must not touch the asyncio.Event directly
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._metrics = {
+            "enqueued_total": 0,
+            "dropped_total": 0,
+            "chunks_sent_total": 0,
+            "retries_total": 0,
+            "delivered_total": 0,
+            "failed_total": 0,
+            "invalid_tokens_pruned_total": 0,
+            "last_flush_ms": 0.0,
+            "last_flush_at": None,
+        }
+
+    # ── Producers (request path) ───────────────────────
+
+    def enqueue(
+        self,
+        tokens: Iterable[Optional[str]],
+        title: str,
+        body: str,
+        data: Optional[dict] = None,
+        notification_type: str = "general",
+    ) -> str:
+        tokens = [t for t in tokens if t]
+        if not tokens:
+            return SKIPPED
+        job = {
+            "tokens": tokens,
+            "title": title,
+            "body": body,
+            "data": data or {},
+            "type": notification_type,
+        }
+        with self._jobs_lock:
+            if len(self._jobs) >= self.max_jobs:
+                self._metrics["dropped_total"] += 1
+                return DROPPED
+            self._jobs.append(job)
+            self._queued_tokens += len(tokens)
+            self._metrics["enqueued_total"] += 1
+            full = self._queued_tokens >= self.batch_size
+        if full:
+            # A whole multicast chunk is waiting: send it now, not at the next tick
+            self._wake()
+        return QUEUED
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Loop already closed (shutdown): stop() sends what is left
+            pass
+
+    # ── Consumer ───────────────────────────────────────
+
+    def flush(self) -> int:
+        """Send everything queued so far. Returns the number of tokens delivered."""
+        with self._flush_lock:
+            with self._jobs_lock:
+                jobs = list(self._jobs)
+                self._jobs.clear()
+                self._queued_tokens = 0
+            if not jobs:
+                return 0
+
+            started = time.perf_counter()
+            chunks = self._chunk(self._coalesce(jobs))
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="push"
+                )
+            results = list(self._executor.map(self._send_chunk, chunks))
+
+            delivered = sum(r["success_count"] for r in results)
+            invalid = {t for r in results for t in r["invalid_tokens"]}
+            pruned = self._prune_tokens(invalid)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._jobs_lock:
+                m = self._metrics
+                m["delivered_total"] += delivered
+                m["failed_total"] += sum(r["failure_count"] for r in results)
+                m["invalid_tokens_pruned_total"] += pruned
+                m["last_flush_ms"] = round(elapsed_ms, 2)
+                m["last_flush_at"] = datetime.utcnow().isoformat()
+            return delivered
+
+    @staticmethod
+    def _coalesce(jobs: List[dict]) -> List[dict]:
+        """Merge jobs with identical payloads into one job with the union of tokens."""
+        groups: Dict[tuple, dict] = {}
+        for job in jobs:
+            key = (job["title"], job["body"], job["type"],
+                   json.dumps(job["data"], sort_keys=True, default=str))
+            group = groups.get(key)
+            if group is None:
+                groups[key] = group = {**job, "tokens": {}}
+            group["tokens"].update(dict.fromkeys(job["tokens"]))
+        return [{**g, "tokens": list(g["tokens"])} for g in groups.values()]
+
+    def _chunk(self, groups: List[dict]) -> List[dict]:
+        chunks = []
+        for group in groups:
+            tokens = group["tokens"]
+            for i in range(0, len(tokens), self.batch_size):
+                chunks.append({**group, "tokens": tokens[i:i + self.batch_size]})
+        return chunks
+
+    def _send_chunk(self, chunk: dict) -> dict:
+        tokens = chunk["tokens"]
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self.transport.send_multicast(
+                    tokens, chunk["title"], chunk["body"], chunk["data"], chunk["type"]
+                )
+                with self._jobs_lock:
+                    self._metrics["chunks_sent_total"] += 1
+                return result
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Push chunk of {len(tokens)} tokens failed after {attempt + 1} attempts: {e}")
+                    break
+                with self._jobs_lock:
+                    self._metrics["retries_total"] += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+        return {"success_count": 0, "failure_count": len(tokens), "invalid_tokens": []}
+
+    def _prune_tokens(self, invalid_tokens) -> int:
+        """Clear fcm_token for every user holding a token FCM reported as invalid."""
+        if not invalid_tokens:
+            return 0
+        db = self.session_factory()
+        try:
+            uids = db.execute(
+                update(User)
+                .where(User.fcm_token.in_(invalid_tokens))
+                .values(fcm_token=None)
+                .returning(User.uid)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            auth_cache.evict_users_on_commit(db, uids)
+            db.commit()
+            return len(uids)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to prune {len(invalid_tokens)} invalid FCM tokens: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._jobs:
+                try:
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    logger.error(f"Push dispatcher error: {e}")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the flusher, send whatever is still queued and release the workers."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+            self._loop = None
+        await run_in_threadpool(self.flush)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._jobs_lock:
+            return {
+                "queue_depth": len(self._jobs),
+                "max_jobs": self.max_jobs,
+                "batch_size": self.batch_size,
+                "workers": self.workers,
+                "backend": type(self.transport).__name__,
+                **self._metrics,
+            }
+
+
+dispatcher = PushDispatcher()
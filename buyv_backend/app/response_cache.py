@@ -0,0 +1,123 @@
+"""
+Response cache for public catalog endpoints.
+
+GET /marketplace/categories, /marketplace/products/featured, /sounds/genres and
+/sounds/trending return the same body to every caller and change rarely. Each
+one builds its response through ``response_cache.get_or_build``:
+
+- the cache key is the route's namespace plus its normalized query params;
+- on a miss the route's data is validated against its response model and
+  serialized once, and the JSON bytes are stored with their ETag;
+- a hit returns those bytes as-is (no query, no Pydantic), or 304 when the
+  client's If-None-Match already matches.
+
+Entries live for RESPONSE_CACHE_TTL_SECONDS. Admin endpoints that change the
+underlying rows call ``invalidate(namespace, ...)``, which also discards any
+entry whose build started before the invalidation. Like the other caches in
+app/cache.py, the copy is per worker.
+"""
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from .cache import TTLCache
+from .config import RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES
+
+CATEGORIES = "categories"
+FEATURED_PRODUCTS = "featured_products"
+SOUND_GENRES = "sound_genres"
+TRENDING_SOUNDS = "trending_sounds"
+
+
+class CachedBody:
+    __slots__ = ("body", "etag", "meta")
+
+    def __init__(self, body: bytes, meta: Any = None):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.meta = meta
+
+
+class ResponseCache:
+    def __init__(self, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl_seconds
+        self._entries = TTLCache(max_entries)
+        self._generations: Dict[str, int] = {}
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    def _key(self, namespace: str, params: Dict[str, Any]) -> Tuple:
+        with self._lock:
+            generation = self._generations.get(namespace, 0)
+        return namespace, generation, tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+    def _adapter(self, model) -> TypeAdapter:
+        adapter = self._adapters.get(model)
+        if adapter is None:
+            adapter = self._adapters[model] = TypeAdapter(model)
+        return adapter
+
+    def lookup(self, namespace: str, params: Dict[str, Any]) -> Tuple[Tuple, Optional[CachedBody]]:
+        """(key, entry or None). Pass the key back to ``store`` after building.
+
+        The key (and its generation) is taken before building: an invalidation
+        that lands meanwhile makes the stored entry unreachable instead of stale.
+        """
+        key = self._key(namespace, params)
+        entry = self._entries.get(key)
+        with self._lock:
+            self._metrics["hits" if entry is not None else "misses"] += 1
+        return key, entry
+
+    def store(self, key: Tuple, model, data, meta: Any = None) -> CachedBody:
+        """Validate *data* against *model*, serialize it once and cache the bytes."""
+        adapter = self._adapter(model)
+        body = adapter.dump_json(adapter.validate_python(data, from_attributes=True), by_alias=True)
+        entry = CachedBody(body, meta)
+        self._entries.set(key, entry, self.ttl)
+        return entry
+
+    def get_or_build(
+        self,
+        request: Request,
+        namespace: str,
+        params: Dict[str, Any],
+        model,
+        build: Callable[[], Any],
+    ) -> Response:
+        """Cached JSON response for *namespace*/*params*, built with ``build()`` on a miss."""
+        key, entry = self.lookup(namespace, params)
+        if entry is None:
+            entry = self.store(key, model, build())
+        return self.respond(request, entry)
+
+    def respond(self, request: Request, entry: CachedBody, body: Optional[bytes] = None) -> Response:
+        """Response for *entry*; pass *body* to send a per-user variant (no ETag)."""
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+        headers = {"ETag": entry.etag, "Cache-Control": f"public, max-age={self.ttl}"}
+        if request.headers.get("if-none-match") == entry.etag:
+            with self._lock:
+                self._metrics["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *namespaces: str) -> None:
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._metrics["invalidations"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ttl_seconds": self.ttl, "generations": dict(self._generations), **self._metrics}
+
+
+cache = ResponseCache()
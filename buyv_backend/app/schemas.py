@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from typing import Optional, List, Any, Dict
 from datetime import datetime
+from uuid import UUID
 
 def to_camel(string: str) -> str:
     words = string.split('_')
@@ -266,6 +267,26 @@ class PostCreate(CamelModel):
     caption: Optional[str] = None
     additional_data: Optional[dict] = None
 
+class InteractionStateRequest(CamelModel):
+    post_uids: List[str] = Field(default_factory=list, max_length=100)
+    product_ids: List[UUID] = Field(default_factory=list, max_length=100)
+
+class PostState(CamelModel):
+    is_liked: bool = False
+    is_bookmarked: bool = False
+    likes_count: int = 0
+    comments_count: int = 0
+
+class ProductState(CamelModel):
+    post_uid: Optional[str] = None  # primary promotion's post (likes / comments target)
+    is_liked: bool = False
+    is_bookmarked: bool = False
+    post_likes_count: int = 0
+
+class InteractionStateResponse(CamelModel):
+    posts: Dict[str, PostState] = {}  # keyed by post uid
+    products: Dict[str, ProductState] = {}  # keyed by product id
+
 
 # -------------------- Comments --------------------
 
@@ -0,0 +1,67 @@
+"""
+Unified search: GET /search?q=... returns posts, users, products and sounds
+matching the query in one request, each list ranked by app/search_index.py.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel
+
+from .database import get_db
+from .models import User, Post, Sound
+from .marketplace.models import MarketplaceProduct
+from .marketplace.schemas import ProductResponse
+from .interactions import enrich_products
+from .schemas import PostOut, UserOut
+from .auth import get_current_user_optional, user_to_out
+from .posts import _map_posts_out
+from .sounds import SoundOut, _sound_to_out
+from . import search_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+SEARCH_TYPES = ("posts", "users", "products", "sounds")
+
+
+class SearchResults(BaseModel):
+    posts: List[PostOut] = []
+    users: List[UserOut] = []
+    products: List[ProductResponse] = []
+    sounds: List[SoundOut] = []
+
+
+@router.get("", response_model=SearchResults)
+def search(
+    q: str = Query(..., min_length=1, description="Search query"),
+    types: Optional[str] = Query(default=None, description="Comma-separated subset of: posts, users, products, sounds"),
+    limit: int = Query(default=10, ge=1, le=50, description="Max results per type"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+):
+    """Search every content type at once, most relevant first within each type"""
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else list(SEARCH_TYPES)
+    unknown = set(wanted) - set(SEARCH_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search type(s): {', '.join(sorted(unknown))}")
+
+    results = SearchResults()
+
+    if "posts" in wanted:
+        rows = search_index.apply(db, db.query(Post), "posts", q).limit(limit).all()
+        results.posts = _map_posts_out(rows, db, current_user)
+
+    if "users" in wanted:
+        rows = search_index.apply(db, db.query(User), "users", q).limit(limit).all()
+        results.users = [user_to_out(u) for u in rows]
+
+    if "products" in wanted:
+        query = db.query(MarketplaceProduct).filter(MarketplaceProduct.status == "active")
+        rows = search_index.apply(db, query, "products", q).limit(limit).all()
+        enrich_products(rows, db, current_user)
+        results.products = [ProductResponse.model_validate(p) for p in rows]
+
+    if "sounds" in wanted:
+        rows = search_index.apply(db, db.query(Sound), "sounds", q).limit(limit).all()
+        results.sounds = [_sound_to_out(s) for s in rows]
+
+    return results
@@ -0,0 +1,233 @@
+"""
+Pluggable full-text search for posts, users, products and sounds.
+
+``apply(db, query, entity, q)`` narrows a SQLAlchemy query to rows matching *q*
+and (optionally) orders them by relevance. The backend is picked per dialect:
+
+- PostgreSQL: one ``tsvector`` GIN index (prefix matching via ``term:*``) and one
+  ``pg_trgm`` GIN index (substring ILIKE + typo-tolerant ``<%`` word similarity)
+  per table, both over the same concatenated document expression. Rank is
+  ``ts_rank + word_similarity``.
+- SQLite (dev/tests): an external-content FTS5 table per entity with the
+  trigram tokenizer, kept in sync by triggers, ranked by ``bm25``. Queries with
+  terms shorter than 3 characters fall back to LIKE.
+- Anything else, or SEARCH_BACKEND=like, or when the indexes could not be
+  created: the previous ``ILIKE '%q%'`` behaviour.
+
+ensure_search_index(engine) creates the indexes (idempotent) and is run at
+startup next to create_all; migrations/add_search_indexes.sql is the Postgres
+equivalent for running ahead of a deploy.
+"""
+import logging
+import re
+from typing import Dict, List
+
+from sqlalchemy import Float, Integer, String, Text, cast, func, literal, literal_column, or_, text
+from sqlalchemy.orm import Session
+
+from .config import SEARCH_BACKEND
+from .models import Post, User, Sound
+from .marketplace.models import MarketplaceProduct
+
+logger = logging.getLogger(__name__)
+
+
+class SearchEntity:
+    def __init__(self, name: str, model, columns: List[str], integer_pk: bool = True):
+        self.name = name
+        self.model = model
+        self.table = model.__tablename__
+        self.columns = columns
+        self.integer_pk = integer_pk
+
+    @property
+    def fts_table(self) -> str:
+        return f"{self.table}_fts"
+
+    @property
+    def rowid(self):
+        # FTS5 rows are keyed by the content table's rowid (the PK for integer ids)
+        if self.integer_pk:
+            return self.model.id
+        return literal_column(f"{self.table}.rowid")
+
+    def text_columns(self):
+        out = []
+        for name in self.columns:
+            col = getattr(self.model, name)
+            out.append(col if isinstance(col.type, (String, Text)) else cast(col, Text))
+        return out
+
+    def document(self, qualified: bool = True):
+        """``coalesce(a::text, '') || ' ' || coalesce(b::text, '')`` — the indexed expression."""
+        doc = None
+        for name in self.columns:
+            col = getattr(self.model, name) if qualified else literal_column(name)
+            part = func.coalesce(cast(col, Text), literal_column("''"))
+            doc = part if doc is None else doc.op("||")(literal_column("' '")).op("||")(part)
+        return doc
+
+
+ENTITIES: Dict[str, SearchEntity] = {
+    "posts": SearchEntity("posts", Post, ["caption"]),
+    "users": SearchEntity("users", User, ["username", "display_name"]),
+    "sounds": SearchEntity("sounds", Sound, ["title", "artist"]),
+    "products": SearchEntity("products", MarketplaceProduct, ["name", "description", "tags"], integer_pk=False),
+}
+
+
+def _terms(q: str) -> List[str]:
+    return [t.lower() for t in re.findall(r"\w+", q)]
+
+
+# ── Backends ────────────────────────────────────────────
+
+class LikeSearchBackend:
+    name = "like"
+
+    def apply(self, query, entity: SearchEntity, q: str, rank: bool = True):
+        pattern = f"%{q}%"
+        return query.filter(or_(*[col.ilike(pattern) for col in entity.text_columns()]))
+
+    def ensure(self, conn) -> None:
+        pass
+
+
+class SqliteFtsBackend(LikeSearchBackend):
+    name = "sqlite_fts5"
+
+    def apply(self, query, entity: SearchEntity, q: str, rank: bool = True):
+        terms = _terms(q)
+        if not terms or any(len(t) < 3 for t in terms):
+            # The trigram tokenizer cannot match terms shorter than one trigram
+            return super().apply(query, entity, q, rank)
+
+        match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        fts = entity.fts_table
+        hits = (
+            text(f"SELECT rowid AS rid, bm25({fts}) AS score FROM {fts} WHERE {fts} MATCH :match")
+            .bindparams(match=match)
+            .columns(rid=Integer, score=Float)
+            .subquery()
+        )
+        query = query.join(hits, hits.c.rid == entity.rowid)
+        if rank:
+            query = query.order_by(hits.c.score.asc())  # bm25: lower is better
+        return query
+
+    def ensure(self, conn) -> None:
+        for entity in ENTITIES.values():
+            fts, table = entity.fts_table, entity.table
+            cols = ", ".join(entity.columns)
+            new_vals = ", ".join(f"new.{c}" for c in entity.columns)
+            old_vals = ", ".join(f"old.{c}" for c in entity.columns)
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+            ).first()
+            if not exists:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', "
+                    f"content_rowid='{'id' if entity.integer_pk else 'rowid'}', tokenize='trigram')"
+                ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_vals}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_vals}); END"
+            ))
+            # Only edits of indexed text reindex the row; counter updates skip the trigger.
+            # Dropped first so databases created with the old column-less trigger get this one.
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_au"))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_vals}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_vals}); END"
+            ))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    name = "postgres"
+
+    @staticmethod
+    def _tsvector(doc):
+        return func.to_tsvector(literal_column("'simple'"), doc)
+
+    def apply(self, query, entity: SearchEntity, q: str, rank: bool = True):
+        doc = entity.document()
+        conditions = [doc.ilike(f"%{q}%"), literal(q).op("<%")(doc)]
+        score = func.word_similarity(q, doc)
+
+        terms = _terms(q)
+        if terms:
+            tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{t}:*" for t in terms))
+            tsvector = self._tsvector(doc)
+            conditions.append(tsvector.op("@@")(tsquery))
+            score = score + func.ts_rank(tsvector, tsquery)
+
+        query = query.filter(or_(*conditions))
+        if rank:
+            query = query.order_by(score.desc())
+        return query
+
+    def ddl(self) -> List[str]:
+        from sqlalchemy.dialects import postgresql
+
+        def sql(expr):
+            return str(expr.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+        statements = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+        for entity in ENTITIES.values():
+            doc = entity.document(qualified=False)
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS ix_{entity.table}_search_tsv "
+                f"ON {entity.table} USING GIN ({sql(self._tsvector(doc))})"
+            )
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS ix_{entity.table}_search_trgm "
+                f"ON {entity.table} USING GIN (({sql(doc)}) gin_trgm_ops)"
+            )
+        return statements
+
+    def ensure(self, conn) -> None:
+        for statement in self.ddl():
+            conn.execute(text(statement))
+
+
+_BACKENDS = {
+    "sqlite": SqliteFtsBackend(),
+    "postgresql": PostgresSearchBackend(),
+}
+_fallback = LikeSearchBackend()
+
+# Dialects whose indexes were created successfully by ensure_search_index
+_ready: set = set()
+
+
+def ensure_search_index(engine) -> None:
+    """Create the search indexes for *engine*'s dialect (idempotent)."""
+    dialect = engine.dialect.name
+    backend = _BACKENDS.get(dialect)
+    if SEARCH_BACKEND == "like" or backend is None:
+        return
+    try:
+        with engine.begin() as conn:
+            backend.ensure(conn)
+        _ready.add(dialect)
+    except Exception as e:
+        logger.warning(f"Search index setup failed on {dialect}, falling back to ILIKE: {e}")
+
+
+def get_backend(db: Session) -> LikeSearchBackend:
+    dialect = db.get_bind().dialect.name
+    if dialect in _ready:
+        return _BACKENDS[dialect]
+    return _fallback
+
+
+def apply(db: Session, query, entity: str, q: str, rank: bool = True):
+    """Filter *query* to rows of *entity* matching *q*; order by relevance when *rank*."""
+    return get_backend(db).apply(query, ENTITIES[entity], q, rank)
@@ -0,0 +1,188 @@
+"""
+Content-addressed store of extracted audio (see app/audio_extract.py).
+
+Every artifact is keyed by the SHA-256 of the downloaded video bytes, so the
+same video extracted twice, even from different URLs, is encoded only once.
+A second index maps a source (URL + ETag / Last-Modified) to that hash, which
+lets repeat extractions of an unchanged URL skip the download as well.
+
+Artifacts stored locally live in AUDIO_STORAGE_DIR as ``<sha256>.aac``. Once
+they exceed AUDIO_DEDUP_DISK_BUDGET_MB, the least recently used files are
+evicted, except those a Sound still points at. Cloudinary artifacts take no
+local disk and are only indexed. The index is a SQLite file next to the audio,
+like the CJ cache (app/marketplace/cj_cache.py).
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .config import AUDIO_STORAGE_DIR, AUDIO_DEDUP_INDEX_PATH, AUDIO_DEDUP_DISK_BUDGET_MB
+
+logger = logging.getLogger(__name__)
+
+LOCAL = "local"
+REMOTE = "remote"
+
+
+def source_key(url: str, validator: Optional[str]) -> Optional[str]:
+    """Key of a source URL at one version, or None when the server sent no validator."""
+    if not validator:
+        return None
+    return hashlib.sha256(f"{url}\n{validator}".encode()).hexdigest()
+
+
+class SoundArtifactStore:
+    def __init__(
+        self,
+        storage_dir: str = AUDIO_STORAGE_DIR,
+        index_path: Optional[str] = AUDIO_DEDUP_INDEX_PATH,
+        disk_budget_bytes: int = AUDIO_DEDUP_DISK_BUDGET_MB * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.storage_dir = storage_dir
+        self.disk_budget_bytes = disk_budget_bytes
+        self.clock = clock
+        os.makedirs(storage_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            index_path or os.path.join(storage_dir, "index.db"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " content_hash TEXT PRIMARY KEY, location TEXT NOT NULL, audio_url TEXT NOT NULL,"
+            " duration REAL, size_bytes INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_artifacts_location_last_used ON artifacts (location, last_used_at)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " source_key TEXT PRIMARY KEY, content_hash TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sources_content_hash ON sources (content_hash)")
+
+    @staticmethod
+    def file_name(content_hash: str) -> str:
+        return f"{content_hash}.aac"
+
+    def local_path(self, content_hash: str) -> str:
+        return os.path.join(self.storage_dir, self.file_name(content_hash))
+
+    # ── Lookups (each marks the artifact as used) ──────
+
+    def get_by_source(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM sources WHERE source_key = ?", (key,)
+            ).fetchone()
+        return self.get_by_content(row[0]) if row else None
+
+    def get_by_content(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, location, audio_url, duration, size_bytes"
+                " FROM artifacts WHERE content_hash = ?",
+                (content_hash,),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] == LOCAL and not os.path.isfile(self.local_path(row[0])):
+                # File vanished (disk wiped by a redeploy): forget it
+                self._delete(row[0])
+                return None
+            self._conn.execute(
+                "UPDATE artifacts SET last_used_at = ? WHERE content_hash = ?", (self.clock(), row[0])
+            )
+        return {"content_hash": row[0], "location": row[1], "audio_url": row[2],
+                "duration": row[3], "size_bytes": row[4]}
+
+    # ── Writes ─────────────────────────────────────────
+
+    def put(self, content_hash: str, location: str, audio_url: str,
+            duration: Optional[float], size_bytes: int = 0) -> Dict[str, Any]:
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts"
+                " (content_hash, location, audio_url, duration, size_bytes, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, location, audio_url, duration, size_bytes, now, now),
+            )
+        return {"content_hash": content_hash, "location": location, "audio_url": audio_url,
+                "duration": duration, "size_bytes": size_bytes}
+
+    def link_source(self, key: Optional[str], content_hash: str) -> None:
+        if not key:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (source_key, content_hash) VALUES (?, ?)",
+                (key, content_hash),
+            )
+
+    def evict(self, pinned: Callable[[List[str]], Set[str]] = lambda urls: set()) -> int:
+        """Delete least recently used local files until under the disk budget.
+
+        *pinned* receives candidate audio URLs and returns those that must be kept
+        (e.g. referenced by a Sound). Returns the number of artifacts removed.
+        """
+        with self._lock:
+            used = self._local_bytes()
+            if used <= self.disk_budget_bytes:
+                return 0
+            rows = self._conn.execute(
+                "SELECT content_hash, audio_url, size_bytes FROM artifacts"
+                " WHERE location = ? ORDER BY last_used_at",
+                (LOCAL,),
+            ).fetchall()
+        keep = pinned([r[1] for r in rows])
+        removed = 0
+        for content_hash, audio_url, size in rows:
+            if used <= self.disk_budget_bytes:
+                break
+            if audio_url in keep:
+                continue
+            with self._lock:
+                self._delete(content_hash)
+            used -= size
+            removed += 1
+        if removed:
+            logger.info(f"Sound store: evicted {removed} artifact(s), {used} bytes in use")
+        return removed
+
+    def _delete(self, content_hash: str) -> None:
+        """Caller holds the lock."""
+        try:
+            os.unlink(self.local_path(content_hash))
+        except OSError:
+            pass
+        self._conn.execute("DELETE FROM sources WHERE content_hash = ?", (content_hash,))
+        self._conn.execute("DELETE FROM artifacts WHERE content_hash = ?", (content_hash,))
+
+    def _local_bytes(self) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM artifacts WHERE location = ?", (LOCAL,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            artifacts, sources = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM artifacts), (SELECT COUNT(*) FROM sources)"
+            ).fetchone()
+            used = self._local_bytes()
+        return {
+            "artifacts": artifacts,
+            "sources": sources,
+            "local_bytes": used,
+            "disk_budget_bytes": self.disk_budget_bytes,
+        }
@@ -2,7 +2,10 @@
 Sounds API Endpoints
 Provides sound/music library for Reels creation.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
 from datetime import datetime
@@ -12,9 +15,12 @@ from .database import get_db
 from .models import User, Sound
 from .auth import get_current_user, get_current_user_optional, require_admin_role
 from .schemas import CamelModel
+from . import search_index, audio_extract, counters, response_cache
 
 router = APIRouter(prefix="/api/sounds", tags=["Sounds"])
 
+_SSE_KEEPALIVE_SECONDS = 15
+
 
 # ============ Response Schemas ============
 
@@ -56,10 +62,7 @@ def get_sounds(
     query = db.query(Sound)
 
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (Sound.title.ilike(search_term)) | (Sound.artist.ilike(search_term))
-        )
+        query = search_index.apply(db, query, "sounds", search)
     if genre:
         query = query.filter(Sound.genre == genre)
     if featured is not None:
@@ -70,31 +73,40 @@ def get_sounds(
     return [_sound_to_out(s) for s in sounds]
 
 
-@router.get("/genres")
-def get_genres(db: Session = Depends(get_db)):
-    """Get all available sound genres."""
-    genres = (
-        db.query(Sound.genre)
-        .filter(Sound.genre.isnot(None))
-        .distinct()
-        .all()
-    )
-    return [g[0] for g in genres if g[0]]
+@router.get("/genres", response_model=List[str])
+def get_genres(request: Request, db: Session = Depends(get_db)):
+    """Get all available sound genres (cached, see app/response_cache.py)."""
+    def build():
+        genres = (
+            db.query(Sound.genre)
+            .filter(Sound.genre.isnot(None))
+            .distinct()
+            .all()
+        )
+        return [g[0] for g in genres if g[0]]
+
+    return response_cache.cache.get_or_build(request, response_cache.SOUND_GENRES, {}, List[str], build)
 
 
 @router.get("/trending", response_model=List[SoundOut])
 def get_trending_sounds(
+    request: Request,
     limit: int = Query(20, le=50),
     db: Session = Depends(get_db),
 ):
-    """Get trending sounds (most used)."""
-    sounds = (
-        db.query(Sound)
-        .order_by(desc(Sound.usage_count))
-        .limit(limit)
-        .all()
+    """Get trending sounds (most used; cached for RESPONSE_CACHE_TTL_SECONDS)."""
+    def build():
+        sounds = (
+            db.query(Sound)
+            .order_by(desc(Sound.usage_count))
+            .limit(limit)
+            .all()
+        )
+        return [_sound_to_out(s) for s in sounds]
+
+    return response_cache.cache.get_or_build(
+        request, response_cache.TRENDING_SOUNDS, {"limit": limit}, List[SoundOut], build
     )
-    return [_sound_to_out(s) for s in sounds]
 
 
 @router.get("/{sound_uid}", response_model=SoundOut)
@@ -115,14 +127,13 @@ def increment_sound_usage(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Increment usage count when a sound is used in a Reel."""
+    """Increment usage count when a sound is used in a Reel (written behind, see app/counters.py)."""
     sound = db.query(Sound).filter(Sound.uid == sound_uid).first()
     if not sound:
         raise HTTPException(status_code=404, detail="Sound not found")
 
-    sound.usage_count += 1
-    db.commit()
-    return {"message": "Usage recorded", "usage_count": sound.usage_count}
+    counters.buffer.incr(Sound.usage_count, sound.id)
+    return {"message": "Usage recorded", "usage_count": _usage_count(sound)}
 
 
 # ============ Admin Endpoints ============
@@ -144,6 +155,7 @@ def create_sound(
     )
     db.add(sound)
     db.commit()
+    response_cache.cache.invalidate(response_cache.SOUND_GENRES, response_cache.TRENDING_SOUNDS)
     db.refresh(sound)
     return _sound_to_out(sound)
 
@@ -161,6 +173,7 @@ def delete_sound(
 
     db.delete(sound)
     db.commit()
+    response_cache.cache.invalidate(response_cache.SOUND_GENRES, response_cache.TRENDING_SOUNDS)
     return {"message": "Sound deleted successfully"}
 
 
@@ -177,6 +190,7 @@ def toggle_featured(
 
     sound.is_featured = not sound.is_featured
     db.commit()
+    response_cache.cache.invalidate(response_cache.SOUND_GENRES, response_cache.TRENDING_SOUNDS)
     return {"message": f"Sound {'featured' if sound.is_featured else 'unfeatured'}", "is_featured": sound.is_featured}
 
 
@@ -184,122 +198,93 @@ def toggle_featured(
 # Audio Extraction from Video
 # ============================================================
 
-@router.post("/extract")
+@router.post("/extract", status_code=202)
 async def extract_audio_from_video(
+    request: Request,
     video_url: str = Query(..., description="Public URL of the source video"),
     title: Optional[str] = Query(None, description="Title for the extracted sound"),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
-    Download a video from *video_url* and extract its audio track using FFmpeg.
-
-    Returns a URL to the extracted audio file (uploaded to Cloudinary when configured,
-    otherwise served from /tmp as a base64 data-URI fallback).
+    Queue extraction of the audio track of the video at *video_url*.
 
-    Requires FFmpeg installed on the server.
+    Returns a job id at once; the download and FFmpeg run in the background
+    (see app/audio_extract.py). Poll GET /api/sounds/extract/{job_id} or follow
+    GET /api/sounds/extract/{job_id}/events (SSE) until the job is completed;
+    its ``result`` then holds the audio URL and duration.
     """
-    import subprocess
-    import tempfile
-    import os
-    import base64
-    import mimetypes
-    import httpx as _httpx
-
-    # ---- Download source video ----
+    if not video_url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="video_url must be an http(s) URL")
     try:
-        async with _httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
-            video_resp = await client.get(video_url)
-        if video_resp.status_code != 200:
-            raise HTTPException(status_code=400, detail=f"Could not download video (HTTP {video_resp.status_code})")
-        video_bytes = video_resp.content
-    except _httpx.RequestError as exc:
-        raise HTTPException(status_code=503, detail=f"Network error downloading video: {exc}")
+        job = audio_extract.extractor.submit(current_user.id, video_url, title, str(request.base_url))
+    except audio_extract.ExtractorBusy:
+        raise HTTPException(status_code=429, detail="Too many extractions in progress, retry later")
+    return {
+        **job.to_dict(),
+        "status_url": f"/api/sounds/extract/{job.id}",
+        "events_url": f"/api/sounds/extract/{job.id}/events",
+    }
 
-    # ---- Write to temp file ----
-    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp_video:
-        tmp_video.write(video_bytes)
-        tmp_video_path = tmp_video.name
 
-    tmp_audio_path = tmp_video_path.replace(".mp4", "_audio.aac")
+@router.get("/extract/files/{name}")
+def get_extracted_audio(name: str):
+    """Audio files stored locally by extraction jobs (when Cloudinary is not configured)."""
+    path = audio_extract.extractor.file_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, media_type="audio/aac")
 
-    try:
-        # ---- Run FFmpeg ----
-        result = subprocess.run(
-            [
-                "ffmpeg", "-y", "-i", tmp_video_path,
-                "-vn", "-acodec", "aac", "-b:a", "128k",
-                tmp_audio_path,
-            ],
-            capture_output=True,
-            timeout=120,
-        )
-        if result.returncode != 0:
-            # Fallback: copy audio stream without re-encoding
-            result2 = subprocess.run(
-                ["ffmpeg", "-y", "-i", tmp_video_path, "-vn", "-acodec", "copy", tmp_audio_path],
-                capture_output=True,
-                timeout=120,
-            )
-            if result2.returncode != 0:
-                raise HTTPException(status_code=500, detail="FFmpeg failed to extract audio")
-
-        # ---- Probe duration ----
-        probe = subprocess.run(
-            [
-                "ffprobe", "-v", "quiet", "-print_format", "json",
-                "-show_format", tmp_audio_path,
-            ],
-            capture_output=True,
-            timeout=30,
-        )
-        duration: Optional[float] = None
-        if probe.returncode == 0:
-            import json as _json
-            probe_data = _json.loads(probe.stdout)
-            try:
-                duration = float(probe_data["format"]["duration"])
-            except (KeyError, ValueError):
-                duration = None
-
-        # ---- Upload or encode ----
-        cloudinary_url = os.getenv("CLOUDINARY_URL")
-        audio_url: str
-
-        if cloudinary_url:
-            import cloudinary
-            import cloudinary.uploader
-            upload_result = cloudinary.uploader.upload(
-                tmp_audio_path,
-                resource_type="video",  # Cloudinary uses "video" for audio files
-                folder="sounds/extracted",
-                format="aac",
-            )
-            audio_url = upload_result.get("secure_url", upload_result["url"])
-        else:
-            # Fallback: return base64 data-URI (MVP — not suitable for large files)
-            with open(tmp_audio_path, "rb") as f:
-                audio_b64 = base64.b64encode(f.read()).decode()
-            audio_url = f"data:audio/aac;base64,{audio_b64}"
-
-    finally:
-        for path in (tmp_video_path, tmp_audio_path):
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
 
-    return {
-        "audio_url": audio_url,
-        "duration": duration,
-        "source_video_url": video_url,
-        "title": title or "Extracted Sound",
-        "message": "Audio extracted successfully",
-    }
+@router.get("/extract/{job_id}")
+async def get_extraction_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Current status of an extraction job (``result`` is set once completed)."""
+    return _own_job(job_id, current_user).to_dict()
+
+
+@router.get("/extract/{job_id}/events")
+async def stream_extraction_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Server-Sent Events: one ``status`` event per job change, closed once the job finishes."""
+    job = _own_job(job_id, current_user)
+
+    async def events():
+        while True:
+            seen = job.version
+            yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.done:
+                return
+            while not await job.wait_for_change(seen, _SSE_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/extract/{job_id}")
+async def cancel_extraction_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Cancel a queued or running extraction (a running FFmpeg is killed)."""
+    job = _own_job(job_id, current_user)
+    if not audio_extract.extractor.cancel(job.id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return {"message": "Cancellation requested", "job_id": job.id}
 
 
 # ============ Helpers ============
 
+def _own_job(job_id: str, user: User) -> audio_extract.ExtractionJob:
+    job = audio_extract.extractor.get(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    return job
+
+
+def _usage_count(sound: Sound) -> int:
+    """Stored usage_count plus uses still waiting in the counter buffer."""
+    return (sound.usage_count or 0) + counters.buffer.pending(Sound.usage_count, sound.id)
+
+
 def _sound_to_out(sound: Sound) -> SoundOut:
     return SoundOut(
         id=sound.id,
@@ -310,7 +295,7 @@ def _sound_to_out(sound: Sound) -> SoundOut:
         cover_image_url=sound.cover_image_url,
         duration=sound.duration,
         genre=sound.genre,
-        usage_count=sound.usage_count,
+        usage_count=_usage_count(sound),
         is_featured=sound.is_featured,
         created_at=sound.created_at
     )
@@ -0,0 +1,174 @@
+"""
+Follow suggestions ("people you may know").
+
+user_suggestions holds, per user, the accounts followed by the accounts they
+follow (second-degree follows) that they do not follow yet, scored by
+
+    mutual_count + SUGGESTIONS_POPULARITY_WEIGHT * log(1 + followers_count)
+
+so shared connections dominate and popularity breaks ties. A periodic job
+rebuilds the table SUGGESTIONS_BATCH_USERS followers at a time: each batch is
+one grouped self-join of follows (the sparse follow matrix squared, restricted
+to the batch's rows), keeping the best SUGGESTIONS_PER_USER candidates per user.
+
+GET /users/suggested is then one indexed read of the caller's rows. Follows and
+blocks made since the last rebuild are filtered at read time, and users with
+too few candidates (new accounts) are topped up with the most-followed users.
+"""
+import asyncio
+import heapq
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.orm import Session, aliased
+
+from .config import (
+    SUGGESTIONS_REBUILD_INTERVAL_SECONDS,
+    SUGGESTIONS_PER_USER,
+    SUGGESTIONS_BATCH_USERS,
+    SUGGESTIONS_POPULARITY_WEIGHT,
+)
+from .database import SessionLocal
+from .models import User, Follow, BlockedUser, UserSuggestion
+
+logger = logging.getLogger(__name__)
+
+
+def _score(mutual_count: int, followers_count: Optional[int]) -> float:
+    return mutual_count + SUGGESTIONS_POPULARITY_WEIGHT * math.log1p(followers_count or 0)
+
+
+def _second_degree(db: Session, user_ids: List[int]):
+    """(user_id, candidate_id, mutual_count, followers_count) for *user_ids*."""
+    mine, theirs, already = aliased(Follow), aliased(Follow), aliased(Follow)
+    return (
+        db.query(mine.follower_id, theirs.followed_id, func.count(), User.followers_count)
+        .select_from(mine)
+        .join(theirs, theirs.follower_id == mine.followed_id)
+        .join(User, User.id == theirs.followed_id)
+        .filter(
+            mine.follower_id.in_(user_ids),
+            theirs.followed_id != mine.follower_id,
+            ~exists().where(
+                already.follower_id == mine.follower_id,
+                already.followed_id == theirs.followed_id,
+            ),
+        )
+        .group_by(mine.follower_id, theirs.followed_id, User.followers_count)
+        .all()
+    )
+
+
+def build_suggestions(
+    db: Session,
+    per_user: int = SUGGESTIONS_PER_USER,
+    batch_users: int = SUGGESTIONS_BATCH_USERS,
+) -> int:
+    """Rebuild user_suggestions for every user who follows someone. Returns rows written."""
+    started = datetime.utcnow()
+    written = 0
+    last_id = 0
+    while True:
+        user_ids = [
+            row[0] for row in db.query(Follow.follower_id)
+            .filter(Follow.follower_id > last_id)
+            .distinct()
+            .order_by(Follow.follower_id)
+            .limit(batch_users)
+        ]
+        if not user_ids:
+            break
+
+        candidates = defaultdict(list)
+        for user_id, candidate_id, mutual_count, followers_count in _second_degree(db, user_ids):
+            candidates[user_id].append((_score(mutual_count, followers_count), candidate_id, mutual_count))
+
+        db.query(UserSuggestion).filter(UserSuggestion.user_id.in_(user_ids)).delete(synchronize_session=False)
+        rows = [
+            UserSuggestion(user_id=user_id, candidate_id=candidate_id, mutual_count=mutual_count,
+                           score=score, computed_at=started)
+            for user_id, scored in candidates.items()
+            for score, candidate_id, mutual_count in heapq.nlargest(per_user, scored)
+        ]
+        db.add_all(rows)
+        db.commit()
+        written += len(rows)
+        last_id = user_ids[-1]
+
+    # Users who no longer follow anyone (or were not reached by this run)
+    db.query(UserSuggestion).filter(UserSuggestion.computed_at < started).delete(synchronize_session=False)
+    db.commit()
+    return written
+
+
+def suggested_uids(db: Session, user: User, limit: int) -> List[str]:
+    """Up to *limit* uids to suggest to *user*: precomputed candidates, then popular users."""
+    not_followed = ~exists().where(Follow.follower_id == user.id, Follow.followed_id == User.id)
+    not_blocked = ~exists().where(or_(
+        and_(BlockedUser.blocker_uid == user.uid, BlockedUser.blocked_uid == User.uid),
+        and_(BlockedUser.blocker_uid == User.uid, BlockedUser.blocked_uid == user.uid),
+    ))
+
+    uids = [
+        row[0] for row in db.query(User.uid)
+        .join(UserSuggestion, UserSuggestion.candidate_id == User.id)
+        .filter(UserSuggestion.user_id == user.id, not_followed, not_blocked)
+        .order_by(UserSuggestion.score.desc(), UserSuggestion.candidate_id.desc())
+        .limit(limit)
+    ]
+    if len(uids) < limit:
+        popular = db.query(User.uid).filter(User.id != user.id, not_followed, not_blocked)
+        if uids:
+            popular = popular.filter(User.uid.notin_(uids))
+        uids += [
+            row[0] for row in popular
+            .order_by(User.followers_count.desc(), User.created_at.desc())
+            .limit(limit - len(uids))
+        ]
+    return uids
+
+
+class SuggestionBuilder:
+    """Runs build_suggestions every SUGGESTIONS_REBUILD_INTERVAL_SECONDS."""
+
+    def __init__(self, interval_seconds: int = SUGGESTIONS_REBUILD_INTERVAL_SECONDS, session_factory=SessionLocal):
+        self.interval = interval_seconds
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            return build_suggestions(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Follow suggestions rebuild failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await run_in_threadpool(self.run_once)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+builder = SuggestionBuilder()
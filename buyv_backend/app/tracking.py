@@ -3,16 +3,19 @@ Phase 6: Tracking & Analytics Endpoints
 Handles tracking of affiliate clicks, Reel views, and conversions
 """
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel
 
-from .database import get_db
-from .models import AffiliateClick, ReelView, PromoterWallet, Commission, Order, OrderItem, User
+from .database import get_async_db, SessionLocal
+from .models import AffiliateClick, PromoterWallet, Commission, Order, User
 from .marketplace.models import MarketplaceProduct
 from .auth import get_current_user_uid, get_current_user_optional
+from . import tracking_ingest, analytics_rollup
 
 router = APIRouter(prefix="/api/marketplace", tags=["Tracking"])
 
@@ -50,111 +53,64 @@ class TrackingResponse(BaseModel):
 
 
 # ============ Endpoints ============
-@router.post("/track/view", response_model=TrackingResponse)
+@router.post("/track/view", response_model=TrackingResponse, status_code=202)
 async def track_reel_view(
     request: TrackReelViewRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
     current_user: User | None = Depends(get_current_user_optional)
 ):
     """
     Track Reel view/impression
     Called automatically when Reel appears on screen (>50% visible for 1+ seconds)
+
+    The view is buffered and written in a batch by tracking_ingest; one view per
+    (reel, viewer, session) is kept.
     """
-    try:
-        # Check if view already exists (prevent duplicate tracking)
-        if request.viewer_uid and request.session_id:
-            existing = db.query(ReelView).filter(
-                and_(
-                    ReelView.reel_id == request.reel_id,
-                    ReelView.viewer_uid == request.viewer_uid,
-                    ReelView.session_id == request.session_id
-                )
-            ).first()
-            if existing:
-                return TrackingResponse(
-                    success=True,
-                    message="View already tracked",
-                    tracking_id=existing.id
-                )
-        
-        # Create view record
-        view = ReelView(
-            reel_id=request.reel_id,
-            promoter_uid=request.promoter_uid,
-            product_id=request.product_id,
-            viewer_uid=request.viewer_uid,
-            session_id=request.session_id,
-            watch_duration=request.watch_duration,
-            completion_rate=request.completion_rate,
-            created_at=datetime.utcnow()
-        )
-        db.add(view)
-        db.commit()
-        db.refresh(view)
-        
-        # Update promoter wallet stats (async)
-        background_tasks.add_task(update_promoter_views, db, request.promoter_uid)
-        
-        return TrackingResponse(
-            success=True,
-            message="Reel view tracked",
-            tracking_id=view.id
-        )
-    
-    except Exception as e:
-        db.rollback()
-        print(f"Error tracking view: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to track view: {str(e)}")
+    result = tracking_ingest.queue.enqueue_view({
+        "reel_id": request.reel_id,
+        "promoter_uid": request.promoter_uid,
+        "product_id": request.product_id,
+        "viewer_uid": request.viewer_uid,
+        "session_id": request.session_id,
+        "watch_duration": request.watch_duration,
+        "completion_rate": request.completion_rate,
+    })
+    return _ingest_response(result, "View")
 
 
-@router.post("/track/click", response_model=TrackingResponse)
+@router.post("/track/click", response_model=TrackingResponse, status_code=202)
 async def track_affiliate_click(
     request: TrackClickRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
     current_user: User | None = Depends(get_current_user_optional)
 ):
     """
     Track click on Marketplace product badge in Reel
     Called when user taps the orange product badge
     """
-    try:
-        # Create click record
-        click = AffiliateClick(
-            viewer_uid=request.viewer_uid,
-            reel_id=request.reel_id,
-            product_id=request.product_id,
-            promoter_uid=request.promoter_uid,
-            session_id=request.session_id,
-            device_info=str(request.device_info) if request.device_info else None,
-            created_at=datetime.utcnow(),
-            converted=False
-        )
-        db.add(click)
-        db.commit()
-        db.refresh(click)
-        
-        # Update promoter wallet stats (async)
-        background_tasks.add_task(update_promoter_clicks, db, request.promoter_uid)
-        
-        return TrackingResponse(
-            success=True,
-            message="Click tracked",
-            tracking_id=click.id
-        )
-    
-    except Exception as e:
-        db.rollback()
-        print(f"Error tracking click: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to track click: {str(e)}")
+    result = tracking_ingest.queue.enqueue_click({
+        "viewer_uid": request.viewer_uid,
+        "reel_id": request.reel_id,
+        "product_id": request.product_id,
+        "promoter_uid": request.promoter_uid,
+        "session_id": request.session_id,
+        "device_info": str(request.device_info) if request.device_info else None,
+        "converted": False,
+    })
+    return _ingest_response(result, "Click")
+
+
+def _ingest_response(result: str, label: str) -> TrackingResponse:
+    if result == tracking_ingest.DUPLICATE:
+        return TrackingResponse(success=True, message=f"{label} already tracked")
+    if result == tracking_ingest.DROPPED:
+        return TrackingResponse(success=False, message="Tracking queue full, event dropped")
+    return TrackingResponse(success=True, message=f"{label} queued")
 
 
 @router.post("/track/conversion", response_model=TrackingResponse)
 async def track_conversion(
     request: TrackConversionRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_uid: str = Depends(get_current_user_uid)
 ):
     """
@@ -162,11 +118,14 @@ async def track_conversion(
     Called when order is placed and contains items from affiliate click
     """
     try:
+        # The click may still be sitting in the ingest buffer
+        await run_in_threadpool(tracking_ingest.queue.flush)
+
         # Find the click record
-        click = db.query(AffiliateClick).filter(
+        click = await db.scalar(select(AffiliateClick).where(
             AffiliateClick.session_id == request.click_session_id,
             AffiliateClick.converted == False
-        ).first()
+        ).limit(1))
         
         if not click:
             return TrackingResponse(
@@ -178,19 +137,19 @@ async def track_conversion(
         click.converted = True
         click.converted_at = datetime.utcnow()
         click.order_id = request.order_id
+        await db.run_sync(analytics_rollup.record_conversion, click)
         
         # Calculate commission
-        order = db.query(Order).filter(Order.id == request.order_id).first()
-        if order:
+        order_id = await db.scalar(select(Order.id).where(Order.id == request.order_id))
+        if order_id:
             background_tasks.add_task(
                 calculate_and_create_commission,
-                db,
-                order,
+                order_id,
                 click.promoter_uid,
                 click.product_id
             )
         
-        db.commit()
+        await db.commit()
         
         return TrackingResponse(
             success=True,
@@ -199,7 +158,7 @@ async def track_conversion(
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error tracking conversion: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to track conversion: {str(e)}")
 
@@ -209,64 +168,56 @@ async def track_conversion(
 async def get_promoter_analytics(
     promoter_uid: str,
     days: int = 30,
-    db: Session = Depends(get_db),
+    series: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user_uid: str = Depends(get_current_user_uid)
 ):
     """
     Get analytics for a promoter (views, clicks, conversions, earnings)
     Only accessible by the promoter themselves
+    
+    ?series=true adds a zero-filled per-day breakdown under "daily".
     """
     if current_user_uid != promoter_uid:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    # Date range
-    start_date = datetime.utcnow() - timedelta(days=days)
+    # Day-aligned window: the previous `days` full days plus today
+    days = max(days, 0)
+    start_day = datetime.utcnow().date() - timedelta(days=days)
     
     # Get wallet info
-    wallet = db.query(PromoterWallet).filter(
+    wallet = await db.scalar(select(PromoterWallet).where(
         PromoterWallet.user_id == promoter_uid
-    ).first()
+    ))
     
     if not wallet:
         # Create wallet if doesn't exist
         wallet = PromoterWallet(user_id=promoter_uid)
         db.add(wallet)
-        db.commit()
-        db.refresh(wallet)
-    
-    # Get metrics
-    total_views = db.query(func.count(ReelView.id)).filter(
-        ReelView.promoter_uid == promoter_uid,
-        ReelView.created_at >= start_date
-    ).scalar() or 0
-    
-    total_clicks = db.query(func.count(AffiliateClick.id)).filter(
-        AffiliateClick.promoter_uid == promoter_uid,
-        AffiliateClick.created_at >= start_date
-    ).scalar() or 0
+        await db.commit()
+        await db.refresh(wallet)
     
-    total_conversions = db.query(func.count(AffiliateClick.id)).filter(
-        AffiliateClick.promoter_uid == promoter_uid,
-        AffiliateClick.converted == True,
-        AffiliateClick.created_at >= start_date
-    ).scalar() or 0
+    # Get metrics (rollups for compacted days + raw tail since the last compaction)
+    daily = await db.run_sync(analytics_rollup.promoter_daily_totals, promoter_uid, start_day)
+    total_views = sum(d["views"] for d in daily.values())
+    total_clicks = sum(d["clicks"] for d in daily.values())
+    total_conversions = sum(d["conversions"] for d in daily.values())
     
     # Get earnings
-    pending_commissions = db.query(func.sum(Commission.commission_amount)).filter(
-        Commission.user_uid == promoter_uid,
-        Commission.status == "pending"
-    ).scalar() or 0.0
-    
-    approved_commissions = db.query(func.sum(Commission.commission_amount)).filter(
-        Commission.user_uid == promoter_uid,
-        Commission.status == "approved"
-    ).scalar() or 0.0
+    commission_sums = dict((await db.execute(
+        select(Commission.status, func.sum(Commission.commission_amount)).where(
+            Commission.user_uid == promoter_uid,
+            Commission.status.in_(("pending", "approved"))
+        ).group_by(Commission.status)
+    )).all())
+    pending_commissions = commission_sums.get("pending") or 0.0
+    approved_commissions = commission_sums.get("approved") or 0.0
     
     # CTR and conversion rate
     ctr = (total_clicks / total_views * 100) if total_views > 0 else 0.0
     conversion_rate = (total_conversions / total_clicks * 100) if total_clicks > 0 else 0.0
     
-    return {
+    result = {
         "promoter_uid": promoter_uid,
         "period_days": days,
         "metrics": {
@@ -289,60 +240,35 @@ async def get_promoter_analytics(
             "avg_commission_per_sale": round(float(wallet.total_earned or 0) / int(wallet.total_sales_count or 1), 2) if wallet.total_sales_count else 0.0
         }
     }
+    
+    if series:
+        empty = {"views": 0, "clicks": 0, "conversions": 0, "commission_amount": 0.0}
+        result["daily"] = [
+            {"date": day.isoformat(), **daily.get(day, empty)}
+            for day in (start_day + timedelta(days=i) for i in range(days + 1))
+        ]
+    
+    return result
 
 
 # ============ Background Tasks ============
-def update_promoter_views(db: Session, promoter_uid: str):
-    """Update view count in promoter wallet"""
-    try:
-        wallet = db.query(PromoterWallet).filter(
-            PromoterWallet.user_id == promoter_uid
-        ).first()
-        
-        if not wallet:
-            wallet = PromoterWallet(user_id=promoter_uid)
-            db.add(wallet)
-        
-        # Count total views (stored in-memory, not on model)
-        # Views are tracked via ReelView table, not on wallet
-        wallet.updated_at = datetime.utcnow()
-        db.commit()
-    except Exception as e:
-        print(f"Error updating promoter views: {e}")
-        db.rollback()
-
-
-def update_promoter_clicks(db: Session, promoter_uid: str):
-    """Update click count in promoter wallet"""
-    try:
-        wallet = db.query(PromoterWallet).filter(
-            PromoterWallet.user_id == promoter_uid
-        ).first()
-        
-        if not wallet:
-            wallet = PromoterWallet(user_id=promoter_uid)
-            db.add(wallet)
-        
-        # Clicks and conversions are tracked via AffiliateClick table
-        # Update wallet timestamp only
-        wallet.updated_at = datetime.utcnow()
-        db.commit()
-    except Exception as e:
-        print(f"Error updating promoter clicks: {e}")
-        db.rollback()
-
-
 def calculate_and_create_commission(
-    db: Session,
-    order: Order,
+    order_id: int,
     promoter_uid: str,
-    product_id: str
+    product_id: str,
+    session_factory=SessionLocal
 ):
     """
     Calculate commission for order and create Commission record
     Commission = product_price * commission_rate (from product settings)
+
+    Runs after the response (threadpool), with its own session.
     """
+    db: Session = session_factory()
     try:
+        order = db.get(Order, order_id)
+        if order is None:
+            return
         # Find order items matching the promoted product
         for item in order.items:
             if item.product_id == product_id:
@@ -395,3 +321,5 @@ def calculate_and_create_commission(
     except Exception as e:
         print(f"Error calculating commission: {e}")
         db.rollback()
+    finally:
+        db.close()
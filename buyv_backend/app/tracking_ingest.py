@@ -0,0 +1,283 @@
+"""
+Buffered ingestion for /track/view and /track/click.
+
+The endpoints only validate the event, dedup it in memory and append it to an
+in-process buffer, then answer 202. A background flusher drains the buffer every
+TRACKING_FLUSH_INTERVAL_MS (or as soon as TRACKING_FLUSH_BATCH_SIZE events are
+waiting) and writes each batch with one multi-row INSERT per table plus one
+promoter-wallet touch, in its own session.
+
+Views are deduplicated per (reel_id, viewer_uid, session_id) for
+TRACKING_DEDUP_WINDOW_SECONDS; the uq_reel_view constraint (ON CONFLICT DO
+NOTHING) still catches repeats that arrive after the window or on another worker.
+
+When the buffer holds TRACKING_QUEUE_MAX_EVENTS events, new ones are dropped and
+counted rather than letting memory grow without bound.
+
+A batch whose write fails (e.g. a transient DB error) is put back at the front of
+the buffer and retried after an exponential backoff, up to
+TRACKING_FLUSH_MAX_RETRIES times; only then is it dropped and counted in
+failed_total. Clicks carry commission attribution, so losing them is not an option
+on the first error.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .config import (
+    TRACKING_FLUSH_INTERVAL_MS,
+    TRACKING_FLUSH_BATCH_SIZE,
+    TRACKING_QUEUE_MAX_EVENTS,
+    TRACKING_DEDUP_WINDOW_SECONDS,
+    TRACKING_FLUSH_MAX_RETRIES,
+    TRACKING_RETRY_BACKOFF_MS,
+)
+from .database import SessionLocal
+from .models import ReelView, AffiliateClick, PromoterWallet
+
+logger = logging.getLogger(__name__)
+
+VIEW = "view"
+CLICK = "click"
+
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+DROPPED = "dropped"
+
+
+def _insert_ignoring_duplicates(db: Session, model, rows: List[Dict[str, Any]]) -> None:
+    """Multi-row INSERT that skips rows violating a unique constraint."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(model).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model).on_conflict_do_nothing()
+    else:
+        stmt = insert(model).prefix_with("IGNORE")
+    db.execute(stmt, rows)
+
+
+class TrackingIngestQueue:
+    def __init__(
+        self,
+        max_events: int = TRACKING_QUEUE_MAX_EVENTS,
+        batch_size: int = TRACKING_FLUSH_BATCH_SIZE,
+        flush_interval_ms: int = TRACKING_FLUSH_INTERVAL_MS,
+        dedup_window_seconds: int = TRACKING_DEDUP_WINDOW_SECONDS,
+        max_retries: int = TRACKING_FLUSH_MAX_RETRIES,
+        retry_backoff_ms: int = TRACKING_RETRY_BACKOFF_MS,
+        session_factory=SessionLocal,
+    ):
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.dedup_window = dedup_window_seconds
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000.0
+        self.session_factory = session_factory
+
+        self._buffer: deque = deque()
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._seen_views = TTLCache(max_events)
+        # Consecutive failed writes of the batch at the head of the buffer
+        self._failures = 0
+        self._retry_at = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._metrics = {
+            "enqueued_total": 0,
+            "duplicates_total": 0,
+            "dropped_total": 0,
+            "flushed_total": 0,
+            "retries_total": 0,
+            "failed_total": 0,
+            "flushes_total": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "last_flush_at": None,
+        }
+
+    # ── Producers (request path) ───────────────────────
+
+    def enqueue_view(self, event: Dict[str, Any]) -> str:
+        if event.get("viewer_uid") and event.get("session_id"):
+            key = (event["reel_id"], event["viewer_uid"], event["session_id"])
+            if not self._seen_views.add(key, True, self.dedup_window):
+                with self._buffer_lock:
+                    self._metrics["duplicates_total"] += 1
+                return DUPLICATE
+            status = self._enqueue(VIEW, event)
+            if status == DROPPED:
+                # Not recorded: a retry of this view must not look like a duplicate
+                self._seen_views.pop(key)
+            return status
+        return self._enqueue(VIEW, event)
+
+    def enqueue_click(self, event: Dict[str, Any]) -> str:
+        return self._enqueue(CLICK, event)
+
+    def _enqueue(self, kind: str, event: Dict[str, Any]) -> str:
+        event.setdefault("created_at", datetime.utcnow())
+        with self._buffer_lock:
+            if len(self._buffer) >= self.max_events:
+                self._metrics["dropped_total"] += 1
+                return DROPPED
+            self._buffer.append((kind, event))
+            self._metrics["enqueued_total"] += 1
+            depth = len(self._buffer)
+        if depth >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return QUEUED
+
+    # ── Consumer ───────────────────────────────────────
+
+    def flush(self) -> int:
+        """Drain the buffer synchronously, one batch at a time. Returns events written.
+
+        Stops at the first failed batch, which is back at the head of the buffer
+        for the next flush once its backoff has elapsed.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._buffer_lock:
+                    if not self._buffer:
+                        break
+                    n = min(len(self._buffer), self.batch_size)
+                    batch = [self._buffer.popleft() for _ in range(n)]
+                ok = self._write_batch(batch)
+                if not ok:
+                    break
+                written += len(batch)
+        return written
+
+    def _retry_or_drop(self, batch) -> None:
+        """Requeue a failed *batch* at the head of the buffer, or drop it after max_retries."""
+        self._failures += 1
+        with self._buffer_lock:
+            if self._failures > self.max_retries:
+                self._metrics["failed_total"] += len(batch)
+                self._failures = 0
+                self._retry_at = 0.0
+                logger.error(f"Tracking flush failed {self.max_retries + 1} times, dropping {len(batch)} events")
+                return
+            self._buffer.extendleft(reversed(batch))
+            self._metrics["retries_total"] += 1
+            self._retry_at = time.monotonic() + self.retry_backoff * (2 ** (self._failures - 1))
+
+    def _write_batch(self, batch) -> bool:
+        started = time.perf_counter()
+        views = [e for kind, e in batch if kind == VIEW]
+        clicks = [e for kind, e in batch if kind == CLICK]
+        promoters = {e["promoter_uid"] for _, e in batch}
+
+        db = None
+        try:
+            db = self.session_factory()
+            if views:
+                _insert_ignoring_duplicates(db, ReelView, views)
+            if clicks:
+                db.execute(insert(AffiliateClick), clicks)
+            self._touch_wallets(db, promoters)
+            db.commit()
+            ok = True
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            logger.error(f"Tracking flush of {len(batch)} events failed (attempt {self._failures + 1}): {e}")
+            ok = False
+        finally:
+            if db is not None:
+                db.close()
+
+        if ok:
+            self._failures = 0
+            self._retry_at = 0.0
+        else:
+            self._retry_or_drop(batch)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._buffer_lock:
+            m = self._metrics
+            m["flushes_total"] += 1
+            if ok:
+                m["flushed_total"] += len(batch)
+            m["last_flush_ms"] = round(elapsed_ms, 2)
+            m["max_flush_ms"] = max(m["max_flush_ms"], round(elapsed_ms, 2))
+            m["last_flush_at"] = datetime.utcnow().isoformat()
+        return ok
+
+    @staticmethod
+    def _touch_wallets(db: Session, promoter_uids) -> None:
+        """Ensure each promoter has a wallet and bump its updated_at (2 statements per batch)."""
+        if not promoter_uids:
+            return
+        now = datetime.utcnow()
+        existing = {
+            uid for (uid,) in db.query(PromoterWallet.user_id)
+            .filter(PromoterWallet.user_id.in_(promoter_uids))
+        }
+        missing = [uid for uid in promoter_uids if uid not in existing]
+        if missing:
+            db.add_all([PromoterWallet(user_id=uid) for uid in missing])
+        db.execute(
+            update(PromoterWallet)
+            .where(PromoterWallet.user_id.in_(promoter_uids))
+            .values(updated_at=now)
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._buffer and time.monotonic() >= self._retry_at:
+                try:
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    logger.error(f"Tracking flusher error: {e}")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the flusher and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await run_in_threadpool(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._buffer_lock:
+            return {
+                "queue_depth": len(self._buffer),
+                "max_events": self.max_events,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                **self._metrics,
+            }
+
+
+queue = TrackingIngestQueue()
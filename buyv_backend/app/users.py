@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from pydantic import BaseModel
 from .database import get_db
-from . import models
+from . import models, search_index
 from .schemas import UserOut, UserUpdate, UserStats
 from .auth import get_current_user
 import json
@@ -52,15 +52,9 @@ def search_users(
     offset: int = Query(default=0, ge=0),
     db: Session = Depends(get_db)
 ):
-    """Search users by username or display name with pagination"""
-    search_pattern = f"%{q}%"
-    
+    """Search users by username or display name with pagination, most relevant first"""
     users = (
-        db.query(models.User)
-        .filter(
-            (models.User.username.ilike(search_pattern)) |
-            (models.User.display_name.ilike(search_pattern))
-        )
+        search_index.apply(db, db.query(models.User), "users", q)
         .offset(offset)
         .limit(limit)
         .all()
@@ -3,14 +3,14 @@ Phase 8: Withdrawal Management Endpoints
 Handles withdrawal requests from promoters and admin approvals
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select
 from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field, validator
 import json
 
-from .database import get_db
+from .database import get_async_db
 from .models import WithdrawalRequest, PromoterWallet, User
 from .auth import get_current_user_uid, require_admin_role
 
@@ -69,9 +69,15 @@ class WithdrawalRequestResponse(BaseModel):
     created_at: datetime
     processed_at: Optional[datetime] = None
     processed_by: Optional[str] = None
+    promoter_name: Optional[str] = None  # admin list only
     
     class Config:
         from_attributes = True
+    
+    @validator('payment_details', pre=True)
+    def parse_payment_details(cls, v):
+        # Stored as a JSON string in withdrawal_requests.payment_details
+        return json.loads(v) if isinstance(v, str) else v
 
 
 class ApproveWithdrawalRequest(BaseModel):
@@ -101,13 +107,17 @@ class WithdrawalStatsResponse(BaseModel):
     total_requests_count: int
 
 
+async def _get_wallet(db: AsyncSession, user_uid: str) -> Optional[PromoterWallet]:
+    return await db.scalar(select(PromoterWallet).where(PromoterWallet.user_id == user_uid))
+
+
 # ============ Promoter Endpoints ============
 
 @router.post("/request", response_model=WithdrawalRequestResponse)
 async def create_withdrawal_request(
     request: CreateWithdrawalRequest,
     current_user_uid: str = Depends(get_current_user_uid),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new withdrawal request
@@ -118,9 +128,7 @@ async def create_withdrawal_request(
     - No pending requests
     """
     # Get promoter wallet
-    wallet = db.query(PromoterWallet).filter(
-        PromoterWallet.user_id == current_user_uid
-    ).first()
+    wallet = await _get_wallet(db, current_user_uid)
     
     if not wallet:
         raise HTTPException(
@@ -136,10 +144,12 @@ async def create_withdrawal_request(
         )
     
     # Check for existing pending requests
-    pending_request = db.query(WithdrawalRequest).filter(
-        WithdrawalRequest.user_id == current_user_uid,
-        WithdrawalRequest.status == "pending"
-    ).first()
+    pending_request = await db.scalar(
+        select(WithdrawalRequest.id).where(
+            WithdrawalRequest.user_id == current_user_uid,
+            WithdrawalRequest.status == "pending"
+        ).limit(1)
+    )
     
     if pending_request:
         raise HTTPException(
@@ -164,12 +174,11 @@ async def create_withdrawal_request(
     wallet.pending_amount += request.amount
     wallet.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(withdrawal)
+    await db.commit()
+    await db.refresh(withdrawal)
     
     # Prepare response
     response = WithdrawalRequestResponse.from_orm(withdrawal)
-    response.payment_details = json.loads(withdrawal.payment_details)
     
     return response
 
@@ -177,21 +186,21 @@ async def create_withdrawal_request(
 @router.get("/history", response_model=WithdrawalHistoryResponse)
 async def get_withdrawal_history(
     current_user_uid: str = Depends(get_current_user_uid),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get withdrawal history for current promoter"""
     
-    requests = db.query(WithdrawalRequest).filter(
-        WithdrawalRequest.user_id == current_user_uid
-    ).order_by(desc(WithdrawalRequest.created_at)).all()
+    requests = (await db.scalars(
+        select(WithdrawalRequest)
+        .where(WithdrawalRequest.user_id == current_user_uid)
+        .order_by(desc(WithdrawalRequest.created_at))
+    )).all()
     
     total = len(requests)
     
-    # Parse payment details
     response_list = []
     for req in requests:
         res = WithdrawalRequestResponse.from_orm(req)
-        res.payment_details = json.loads(req.payment_details)
         response_list.append(res)
     
     return WithdrawalHistoryResponse(
@@ -203,14 +212,12 @@ async def get_withdrawal_history(
 @router.get("/stats", response_model=WithdrawalStatsResponse)
 async def get_withdrawal_stats(
     current_user_uid: str = Depends(get_current_user_uid),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get withdrawal statistics for current promoter"""
     
     # Get wallet
-    wallet = db.query(PromoterWallet).filter(
-        PromoterWallet.user_id == current_user_uid
-    ).first()
+    wallet = await _get_wallet(db, current_user_uid)
     
     if not wallet:
         return WithdrawalStatsResponse(
@@ -222,20 +229,15 @@ async def get_withdrawal_stats(
             total_requests_count=0
         )
     
-    # Count requests by status
-    pending_count = db.query(func.count(WithdrawalRequest.id)).filter(
-        WithdrawalRequest.user_id == current_user_uid,
-        WithdrawalRequest.status == "pending"
-    ).scalar() or 0
-    
-    approved_count = db.query(func.count(WithdrawalRequest.id)).filter(
-        WithdrawalRequest.user_id == current_user_uid,
-        WithdrawalRequest.status.in_(["approved", "completed"])
-    ).scalar() or 0
-    
-    total_count = db.query(func.count(WithdrawalRequest.id)).filter(
-        WithdrawalRequest.user_id == current_user_uid
-    ).scalar() or 0
+    # Count requests by status (one grouped query)
+    by_status = dict((await db.execute(
+        select(WithdrawalRequest.status, func.count(WithdrawalRequest.id))
+        .where(WithdrawalRequest.user_id == current_user_uid)
+        .group_by(WithdrawalRequest.status)
+    )).all())
+    pending_count = by_status.get("pending", 0)
+    approved_count = by_status.get("approved", 0) + by_status.get("completed", 0)
+    total_count = sum(by_status.values())
     
     return WithdrawalStatsResponse(
         available_balance=wallet.available_amount,
@@ -253,28 +255,32 @@ async def get_withdrawal_stats(
 async def admin_list_withdrawals(
     status_filter: Optional[str] = None,
     admin: User = Depends(require_admin_role("admin")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Admin: List all withdrawal requests with optional status filter
     Required role: super_admin or finance
     """
     
-    query = db.query(WithdrawalRequest)
+    query = select(WithdrawalRequest)
     
     if status_filter:
-        query = query.filter(WithdrawalRequest.status == status_filter)
+        query = query.where(WithdrawalRequest.status == status_filter)
+    
+    requests = (await db.scalars(query.order_by(desc(WithdrawalRequest.created_at)))).all()
     
-    requests = query.order_by(desc(WithdrawalRequest.created_at)).all()
+    # Enrich with promoter names (one query for all promoters)
+    promoter_uids = {req.user_id for req in requests}
+    promoters = {
+        u.uid: u
+        for u in (await db.scalars(select(User).where(User.uid.in_(promoter_uids)))).all()
+    } if promoter_uids else {}
     
-    # Enrich with promoter names
     response_list = []
     for req in requests:
         res = WithdrawalRequestResponse.from_orm(req)
-        res.payment_details = json.loads(req.payment_details)
         
-        # Get promoter name
-        promoter = db.query(User).filter(User.uid == req.user_id).first()
+        promoter = promoters.get(req.user_id)
         if promoter:
             res.promoter_name = promoter.display_name or promoter.username
         
@@ -291,16 +297,14 @@ async def admin_approve_withdrawal(
     withdrawal_id: int,
     request: ApproveWithdrawalRequest,
     admin: User = Depends(require_admin_role("admin")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Admin: Approve a withdrawal request
     Required role: super_admin or finance
     """
     
-    withdrawal = db.query(WithdrawalRequest).filter(
-        WithdrawalRequest.id == withdrawal_id
-    ).first()
+    withdrawal = await db.get(WithdrawalRequest, withdrawal_id)
     
     if not withdrawal:
         raise HTTPException(
@@ -319,12 +323,11 @@ async def admin_approve_withdrawal(
     withdrawal.processed_at = datetime.utcnow()
     withdrawal.processed_by = admin.uid
     
-    db.commit()
-    db.refresh(withdrawal)
+    await db.commit()
+    await db.refresh(withdrawal)
     
     # Prepare response
     response = WithdrawalRequestResponse.from_orm(withdrawal)
-    response.payment_details = json.loads(withdrawal.payment_details)
     
     return response
 
@@ -334,16 +337,14 @@ async def admin_reject_withdrawal(
     withdrawal_id: int,
     request: RejectWithdrawalRequest,
     admin: User = Depends(require_admin_role("admin")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Admin: Reject a withdrawal request and return funds to available balance
     Required role: super_admin or finance
     """
     
-    withdrawal = db.query(WithdrawalRequest).filter(
-        WithdrawalRequest.id == withdrawal_id
-    ).first()
+    withdrawal = await db.get(WithdrawalRequest, withdrawal_id)
     
     if not withdrawal:
         raise HTTPException(
@@ -364,21 +365,18 @@ async def admin_reject_withdrawal(
     withdrawal.processed_by = admin.uid
     
     # Return funds to available balance
-    wallet = db.query(PromoterWallet).filter(
-        PromoterWallet.user_id == withdrawal.user_id
-    ).first()
+    wallet = await _get_wallet(db, withdrawal.user_id)
     
     if wallet:
         wallet.available_amount += withdrawal.amount
         wallet.pending_amount -= withdrawal.amount
         wallet.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(withdrawal)
+    await db.commit()
+    await db.refresh(withdrawal)
     
     # Prepare response
     response = WithdrawalRequestResponse.from_orm(withdrawal)
-    response.payment_details = json.loads(withdrawal.payment_details)
     
     return response
 
@@ -388,16 +386,14 @@ async def admin_complete_withdrawal(
     withdrawal_id: int,
     request: CompleteWithdrawalRequest,
     admin: User = Depends(require_admin_role("admin")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Admin: Mark an approved withdrawal as completed (payment sent)
     Required role: super_admin or finance
     """
     
-    withdrawal = db.query(WithdrawalRequest).filter(
-        WithdrawalRequest.id == withdrawal_id
-    ).first()
+    withdrawal = await db.get(WithdrawalRequest, withdrawal_id)
     
     if not withdrawal:
         raise HTTPException(
@@ -420,20 +416,17 @@ async def admin_complete_withdrawal(
         withdrawal.processed_by = admin.uid
     
     # Update wallet (move from pending to withdrawn)
-    wallet = db.query(PromoterWallet).filter(
-        PromoterWallet.user_id == withdrawal.user_id
-    ).first()
+    wallet = await _get_wallet(db, withdrawal.user_id)
     
     if wallet:
         wallet.pending_amount -= withdrawal.amount
         wallet.withdrawn_amount += withdrawal.amount
         wallet.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(withdrawal)
+    await db.commit()
+    await db.refresh(withdrawal)
     
     # Prepare response
     response = WithdrawalRequestResponse.from_orm(withdrawal)
-    response.payment_details = json.loads(withdrawal.payment_details)
     
     return response
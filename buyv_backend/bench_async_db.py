@@ -0,0 +1,90 @@
+"""
+Concurrent throughput of an ``async def`` route: sync Session vs AsyncSession.
+
+Serves one query per request through two routes of a throwaway app, with
+--concurrency requests in flight (httpx over ASGI, so no network noise):
+
+    sync-session   -- async def + database.SessionLocal (how tracking/withdrawal/
+                      cleanup/OAuth routes used to run: every query blocks the loop)
+    async-session  -- async def + database.AsyncSessionLocal (get_async_db)
+
+The query is a 20 ms server-side wait: pg_sleep on Postgres; on SQLite (no
+network round trip to wait on) a registered sleep function stands in for it.
+Point DATABASE_URL at the database to measure.
+
+Usage:
+    python bench_async_db.py
+    python bench_async_db.py --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import SessionLocal, async_engine, engine, get_async_db
+
+if async_engine.url.get_backend_name() == "postgresql":
+    QUERY = text("SELECT pg_sleep(0.02)")
+else:
+    QUERY = text("SELECT bench_sleep(20)")
+
+    def _register_sleep(dbapi_conn, _record):
+        dbapi_conn.create_function("bench_sleep", 1, lambda ms: time.sleep(ms / 1000) or 1)
+
+    event.listen(engine, "connect", _register_sleep)
+    event.listen(async_engine.sync_engine, "connect", _register_sleep)
+
+app = FastAPI()
+
+
+@app.get("/sync-session")
+async def sync_session_route():
+    db = SessionLocal()
+    try:
+        db.execute(QUERY).all()
+    finally:
+        db.close()
+    return {"ok": True}
+
+
+@app.get("/async-session")
+async def async_session_route(db: AsyncSession = Depends(get_async_db)):
+    (await db.execute(QUERY)).all()
+    return {"ok": True}
+
+
+async def run(path: str, requests: int, concurrency: int) -> float:
+    """Requests per second for *path*."""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # warm up the pools
+
+        async def one():
+            async with semaphore:
+                resp = await client.get(path)
+                resp.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main(args) -> None:
+    print(f"database: {async_engine.url.get_backend_name()}, "
+          f"{args.requests} requests, concurrency {args.concurrency}")
+    for path in ("/sync-session", "/async-session"):
+        rps = await run(path, args.requests, args.concurrency)
+        print(f"  {path:<16} {rps:8.1f} req/s")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync vs async DB session throughput in async routes")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
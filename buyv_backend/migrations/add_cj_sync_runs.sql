@@ -0,0 +1,20 @@
+-- Migration: Create cj_sync_runs (bulk CJ price/stock sync checkpoints)
+-- Date: 2026-10-16
+-- Purpose: app/marketplace/cj_sync.py records each catalog sync here, including the
+--          last product id written, so an interrupted run resumes where it stopped.
+
+CREATE TABLE IF NOT EXISTS cj_sync_runs (
+    id               SERIAL PRIMARY KEY,
+    status           VARCHAR(20) NOT NULL DEFAULT 'running',
+    trigger          VARCHAR(20) NOT NULL DEFAULT 'cli',
+    last_product_id  UUID,
+    total            INTEGER     NOT NULL DEFAULT 0,
+    processed        INTEGER     NOT NULL DEFAULT 0,
+    changed          INTEGER     NOT NULL DEFAULT 0,
+    failed           INTEGER     NOT NULL DEFAULT 0,
+    errors           JSONB       DEFAULT '[]'::jsonb,
+    started_at       TIMESTAMPTZ DEFAULT NOW(),
+    updated_at       TIMESTAMPTZ DEFAULT NOW(),
+    finished_at      TIMESTAMPTZ
+);
+
@@ -0,0 +1,23 @@
+-- Migration: Create feed_inbox table (materialized "following" timelines)
+-- Date: 2026-10-16
+-- Purpose: GET /posts/feed/following reads one indexed range per user instead of
+--          joining follows x posts per request. Rows are written on post creation
+--          (fan-out-on-write) for authors below FEED_FANOUT_MAX_FOLLOWERS.
+
+CREATE TABLE IF NOT EXISTS feed_inbox (
+    id          SERIAL PRIMARY KEY,
+    user_id     INTEGER   NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    post_id     INTEGER   NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+    author_id   INTEGER   NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at  TIMESTAMP NOT NULL,
+    CONSTRAINT uq_feed_inbox_entry UNIQUE (user_id, post_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_feed_inbox_user_created_post
+    ON feed_inbox (user_id, created_at, post_id);
+
+-- Per-author timelines, used for fan-out-on-read of large accounts
+CREATE INDEX IF NOT EXISTS ix_posts_user_created_at
+    ON posts (user_id, created_at);
+
+COMMENT ON TABLE feed_inbox IS 'Per-user following timeline; created_at mirrors posts.created_at.';
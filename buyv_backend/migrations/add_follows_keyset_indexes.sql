@@ -0,0 +1,11 @@
+-- Migration: Covering indexes for cursor-paginated follower / following lists
+-- Date: 2026-10-16
+-- Purpose: GET /users/{uid}/followers and /following seek on (created_at, id) within
+--          one user's follow edges, newest first; the other side's id is included so
+--          the page is read from the index alone before joining users by primary key.
+
+CREATE INDEX IF NOT EXISTS ix_follows_followed_created
+    ON follows (followed_id, created_at, id, follower_id);
+
+CREATE INDEX IF NOT EXISTS ix_follows_follower_created
+    ON follows (follower_id, created_at, id, followed_id);
@@ -0,0 +1,24 @@
+-- Migration: Paginated notification inbox + maintained unread counter
+-- Date: 2026-10-16
+-- Purpose: GET /notifications/me pages with a (created_at, id) cursor and
+--          GET /notifications/unread-count reads users.unread_notifications_count,
+--          which app/notifications.py keeps in step with every insert / read / delete.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unread_notifications_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill the counter from existing rows
+UPDATE users u
+SET unread_notifications_count = sub.unread
+FROM (
+    SELECT user_id, COUNT(*) AS unread
+    FROM notifications
+    WHERE is_read = FALSE
+    GROUP BY user_id
+) sub
+WHERE sub.user_id = u.id;
+
+CREATE INDEX IF NOT EXISTS ix_notifications_user_read_created
+    ON notifications (user_id, is_read, created_at);
+
+CREATE INDEX IF NOT EXISTS ix_notifications_user_created_id
+    ON notifications (user_id, created_at, id);
@@ -0,0 +1,6 @@
+-- Migration: Composite index for keyset (cursor) pagination of the feed
+-- Date: 2026-10-16
+-- Purpose: GET /posts/feed?cursor=... seeks on (created_at, id) instead of OFFSET scans
+
+CREATE INDEX IF NOT EXISTS ix_posts_created_at_id
+    ON posts (created_at, id);
@@ -0,0 +1,28 @@
+-- Migration: Denormalized primary promotion on marketplace_products
+-- Date: 2026-10-16
+-- Purpose: product list/detail responses used to lazy-load product_promotions and
+--          query posts per product for promoter_user_id / post_uid / post_likes_count.
+--          These now live on the product row, kept current by promotion writes and
+--          post like/unlike (app/marketplace/service.py refresh_* helpers).
+
+ALTER TABLE marketplace_products ADD COLUMN IF NOT EXISTS promoter_user_id VARCHAR(100);
+ALTER TABLE marketplace_products ADD COLUMN IF NOT EXISTS post_uid         VARCHAR(100);
+ALTER TABLE marketplace_products ADD COLUMN IF NOT EXISTS linked_post_id   INTEGER;
+ALTER TABLE marketplace_products ADD COLUMN IF NOT EXISTS post_likes_count INTEGER DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS ix_marketplace_products_linked_post_id
+    ON marketplace_products (linked_post_id);
+
+-- Backfill from the oldest promotion of each product
+UPDATE marketplace_products mp
+SET promoter_user_id = pp.promoter_user_id,
+    post_uid         = pp.post_id,
+    linked_post_id   = p.id,
+    post_likes_count = COALESCE(p.likes_count, 0)
+FROM (
+    SELECT DISTINCT ON (product_id) product_id, post_id, promoter_user_id
+    FROM product_promotions
+    ORDER BY product_id, created_at, id
+) pp
+LEFT JOIN posts p ON p.uid = pp.post_id
+WHERE mp.id = pp.product_id;
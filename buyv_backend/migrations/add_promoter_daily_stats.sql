@@ -0,0 +1,28 @@
+-- Migration: Create promoter_daily_stats rollup table
+-- Date: 2026-10-16
+-- Purpose: GET /api/marketplace/analytics/promoter/{uid} reads per-day rollups
+--          instead of scanning reel_views / affiliate_clicks / commissions for the
+--          whole window. Closed days are compacted periodically by the API
+--          (app/analytics_rollup.py); only the current day is read from raw rows.
+
+CREATE TABLE IF NOT EXISTS promoter_daily_stats (
+    id                 SERIAL PRIMARY KEY,
+    promoter_uid       VARCHAR(36) NOT NULL,
+    day                DATE        NOT NULL,
+    views              INTEGER     DEFAULT 0,
+    clicks             INTEGER     DEFAULT 0,
+    conversions        INTEGER     DEFAULT 0,
+    commission_amount  FLOAT       DEFAULT 0.0,
+    updated_at         TIMESTAMP   DEFAULT NOW(),
+    CONSTRAINT uq_promoter_daily_stat UNIQUE (promoter_uid, day)
+);
+
+CREATE INDEX IF NOT EXISTS ix_promoter_daily_stats_day
+    ON promoter_daily_stats (day);
+
+-- Raw tail scans (rows newer than the last compacted day)
+CREATE INDEX IF NOT EXISTS ix_reel_views_promoter_created
+    ON reel_views (promoter_uid, created_at);
+
+CREATE INDEX IF NOT EXISTS ix_affiliate_clicks_promoter_created
+    ON affiliate_clicks (promoter_uid, created_at);
@@ -0,0 +1,17 @@
+-- Migration: Full-text / trigram search indexes for posts, users, sounds and products
+-- Date: 2026-10-16
+-- Purpose: Replace sequential ILIKE '%q%' scans behind /posts/search, /users/search,
+--          /api/sounds?search=, /api/v1/marketplace/products?search= and /search.
+--          Expressions must match app/search_index.py (PostgresSearchBackend.ddl()),
+--          which also creates them at startup if missing. On large tables prefer
+--          running these by hand with CREATE INDEX CONCURRENTLY.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_posts_search_tsv ON posts USING GIN (to_tsvector('simple', coalesce(CAST(caption AS TEXT), '')));
+CREATE INDEX IF NOT EXISTS ix_posts_search_trgm ON posts USING GIN ((coalesce(CAST(caption AS TEXT), '')) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_users_search_tsv ON users USING GIN (to_tsvector('simple', (coalesce(CAST(username AS TEXT), '') || ' ') || coalesce(CAST(display_name AS TEXT), '')));
+CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING GIN (((coalesce(CAST(username AS TEXT), '') || ' ') || coalesce(CAST(display_name AS TEXT), '')) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_sounds_search_tsv ON sounds USING GIN (to_tsvector('simple', (coalesce(CAST(title AS TEXT), '') || ' ') || coalesce(CAST(artist AS TEXT), '')));
+CREATE INDEX IF NOT EXISTS ix_sounds_search_trgm ON sounds USING GIN (((coalesce(CAST(title AS TEXT), '') || ' ') || coalesce(CAST(artist AS TEXT), '')) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_marketplace_products_search_tsv ON marketplace_products USING GIN (to_tsvector('simple', (((coalesce(CAST(name AS TEXT), '') || ' ') || coalesce(CAST(description AS TEXT), '')) || ' ') || coalesce(CAST(tags AS TEXT), '')));
+CREATE INDEX IF NOT EXISTS ix_marketplace_products_search_trgm ON marketplace_products USING GIN (((((coalesce(CAST(name AS TEXT), '') || ' ') || coalesce(CAST(description AS TEXT), '')) || ' ') || coalesce(CAST(tags AS TEXT), '')) gin_trgm_ops);
@@ -0,0 +1,17 @@
+-- Migration: Precomputed follow suggestions
+-- Date: 2026-10-16
+-- Purpose: GET /users/suggested reads one user's friends-of-friends candidates from
+--          user_suggestions (rebuilt periodically by app/suggestions.py) instead of
+--          loading the caller's follows and sorting every other user by popularity.
+
+CREATE TABLE IF NOT EXISTS user_suggestions (
+    user_id       INTEGER   NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    candidate_id  INTEGER   NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    mutual_count  INTEGER   DEFAULT 0,
+    score         FLOAT     DEFAULT 0.0,
+    computed_at   TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, candidate_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_user_suggestions_user_score
+    ON user_suggestions (user_id, score, candidate_id);
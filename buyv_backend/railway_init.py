@@ -73,6 +73,7 @@ integer_id_tables = [
     "post_likes",
     "comment_likes",
     "post_bookmarks",
+    "feed_inbox",
     "post_views",
     "reel_views",
     "notifications",
@@ -88,12 +89,15 @@ integer_id_tables = [
     # Marketplace / affiliate
     "affiliate_clicks",
     "promoter_wallets",
+    "promoter_daily_stats",
     "wallet_transactions",
     "wallets",
     # Media
     "sounds",
     # Banners
     "promotional_banners",
+    # CJ sync checkpoints
+    "cj_sync_runs",
 ]
 
 fixed = 0
@@ -0,0 +1,44 @@
+"""
+Synchronize prices and stock of every CJ-imported product.
+
+Usage:
+    python sync_cj_products.py                 # resume the last unfinished run, or start one
+    python sync_cj_products.py --restart       # abort any unfinished run, start from the first product
+    python sync_cj_products.py --concurrency 10 --rate 8 --batch-size 200
+
+Same engine as POST /api/v1/admin/cj/sync-all (see app/marketplace/cj_sync.py).
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.config import CJ_SYNC_CONCURRENCY, CJ_SYNC_REQUESTS_PER_SECOND, CJ_SYNC_BATCH_SIZE
+from app.marketplace.cj_service import CJDropshippingService
+from app.marketplace.cj_sync import CJSyncJob, COMPLETED
+
+
+async def main(args) -> dict:
+    cj = CJDropshippingService()
+    try:
+        job = CJSyncJob(
+            cj,
+            concurrency=args.concurrency,
+            requests_per_second=args.rate,
+            batch_size=args.batch_size,
+            trigger="cli",
+        )
+        return await job.run(resume=not args.restart)
+    finally:
+        await cj.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk CJ price/stock sync")
+    parser.add_argument("--restart", action="store_true", help="start a new run instead of resuming")
+    parser.add_argument("--concurrency", type=int, default=CJ_SYNC_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=CJ_SYNC_REQUESTS_PER_SECOND, help="max CJ calls per second")
+    parser.add_argument("--batch-size", type=int, default=CJ_SYNC_BATCH_SIZE)
+    summary = asyncio.run(main(parser.parse_args()))
+    print(json.dumps(summary, indent=2, default=str))
+    sys.exit(0 if summary["status"] == COMPLETED else 1)
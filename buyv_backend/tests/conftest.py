@@ -6,16 +6,21 @@ Provides:
   - client: FastAPI TestClient bound to test DB
   - auth_headers: Helper to register + get Bearer token
   - admin_headers: Helper to get admin Bearer token
+  - promoted_products: five marketplace products, each promoted by its own reel
 """
 import os
 import pytest
 import uuid
+from decimal import Decimal
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, JSON
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 # Force SQLite for tests BEFORE importing app modules
 os.environ["DATABASE_URL"] = "sqlite:///./test_buyv.db"
+# Push notifications go to the in-memory FakePushTransport, never to FCM
+os.environ["PUSH_BACKEND"] = "fake"
 
 # ── JSONB → JSON mapping for SQLite ────────────────────
 # Marketplace models use PostgreSQL-specific JSONB; map it to JSON for SQLite.
@@ -26,8 +31,10 @@ from sqlalchemy.ext.compiler import compiles
 def compile_jsonb_sqlite(type_, compiler, **kw):
     return "JSON"
 
-from app.database import Base, get_db
+from app.database import Base, get_db, get_async_db
 from app.main import app
+from app.marketplace.models import MarketplaceProduct
+from app.models import Post, User
 
 # ── Disable rate limiting for tests ─────────────────────
 app.state.limiter.enabled = False
@@ -55,8 +62,22 @@ def override_get_db():
         db.close()
 
 
-# Override the dependency globally
+# Same file through aiosqlite, for the async def routes (get_async_db)
+test_async_engine = create_async_engine(
+    "sqlite+aiosqlite:///./test_buyv.db",
+    connect_args={"check_same_thread": False},
+)
+TestAsyncSessionLocal = async_sessionmaker(bind=test_async_engine, expire_on_commit=False, autoflush=False)
+
+
+async def override_get_async_db():
+    async with TestAsyncSessionLocal() as db:
+        yield db
+
+
+# Override the dependencies globally
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 # ── DB lifecycle ────────────────────────────────────────
@@ -132,3 +153,27 @@ def second_user_headers(client):
     assert resp.status_code == 200
     token = resp.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+# ── Marketplace helpers ─────────────────────────────────
+@pytest.fixture
+def promoted_products(client, registered_user, auth_headers):
+    """Five active products, each promoted by its own reel of the auth_headers user."""
+    tag = uuid.uuid4().hex[:8]
+    db = TestSessionLocal()
+    user_id = db.query(User.id).filter(User.uid == registered_user[1]["user"]["id"]).scalar()
+    products = [MarketplaceProduct(name=f"Product {tag} {i}", original_price=Decimal("20"),
+                                   selling_price=Decimal("15"), status="active")
+                for i in range(5)]
+    posts = [Post(user_id=user_id, type="reel", media_url=f"https://cdn.test/{tag}-{i}.mp4")
+             for i in range(5)]
+    db.add_all(products + posts)
+    db.commit()
+    pairs = [(str(p.id), post.uid) for p, post in zip(products, posts)]
+    db.close()
+
+    for product_id, post_uid in pairs:
+        resp = client.post("/api/v1/promotions", json={"post_id": post_uid, "product_id": product_id},
+                           headers=auth_headers)
+        assert resp.status_code == 200, resp.text
+    return tag, pairs
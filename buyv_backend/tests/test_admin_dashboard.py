@@ -0,0 +1,124 @@
+"""
+BuyV Backend — Admin Dashboard Tests
+
+Covers:
+  - compute_dashboard_stats (single-query aggregate) matches per-table counts
+  - GET /api/admin/dashboard/stats snapshot caching and ?fresh=true bypass (finance roles only)
+  - GET /api/orders/admin/all batched buyer lookup
+"""
+import pytest
+import uuid
+
+from fastapi import BackgroundTasks
+
+from app import dashboard_stats
+from app.admin_dashboard import get_dashboard_stats
+from app.models import User, Post, Commission
+from tests.conftest import TestSessionLocal
+
+
+# ── Fixtures ─────────────────────────────────────────────
+@pytest.fixture
+def admin_headers(client):
+    """Register a user and promote them to admin directly in the test DB."""
+    payload = {
+        "email": f"admin_{uuid.uuid4().hex[:8]}@buyv.io",
+        "password": "AdminPass123!",
+        "username": f"admin_{uuid.uuid4().hex[:8]}",
+        "displayName": "Dashboard Admin",
+    }
+    resp = client.post("/auth/register", json=payload)
+    assert resp.status_code == 200
+    db = TestSessionLocal()
+    db.query(User).filter(User.email == payload["email"]).update({"role": "admin"})
+    db.commit()
+    db.close()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def _register(client):
+    resp = client.post("/auth/register", json={
+        "email": f"dash_{uuid.uuid4().hex[:8]}@test.com",
+        "password": "DashPass123!",
+        "username": f"dash_{uuid.uuid4().hex[:8]}",
+        "displayName": "Dash User",
+    })
+    assert resp.status_code == 200
+
+
+# ════════════════════════════════════════════════
+# STATS ENGINE
+# ════════════════════════════════════════════════
+
+class TestComputeDashboardStats:
+    def test_matches_individual_counts(self, client, auth_headers):
+        db = TestSessionLocal()
+        try:
+            stats = dashboard_stats.compute_dashboard_stats(db)
+            assert stats["total_users"] == db.query(User).count()
+            assert stats["total_posts"] == db.query(Post).count()
+            assert stats["total_reels"] == db.query(Post).filter(Post.type == "reel").count()
+            paid = db.query(Commission).filter(Commission.status == "paid").all()
+            assert stats["total_revenue"] == pytest.approx(sum(c.commission_amount or 0 for c in paid))
+        finally:
+            db.close()
+
+
+# ════════════════════════════════════════════════
+# SNAPSHOT ENDPOINT
+# ════════════════════════════════════════════════
+
+class TestDashboardStatsEndpoint:
+    def test_snapshot_served_until_fresh_requested(self, client, admin_headers):
+        dashboard_stats.snapshot.invalidate()
+        first = client.get("/api/admin/dashboard/stats", headers=admin_headers)
+        assert first.status_code == 200
+
+        _register(client)
+        cached = client.get("/api/admin/dashboard/stats", headers=admin_headers)
+        assert cached.json()["total_users"] == first.json()["total_users"]
+        assert cached.json()["generated_at"] == first.json()["generated_at"]
+
+        # super_admin / finance may force a recompute
+        db = TestSessionLocal()
+        try:
+            fresh = get_dashboard_stats(BackgroundTasks(), fresh=True, admin=User(role="finance"), db=db)
+            assert fresh.total_users == db.query(User).count()
+        finally:
+            db.close()
+
+    def test_moderator_fresh_gets_snapshot(self, client, admin_headers):
+        # role "admin" is the moderator tier: no financial data, no forced recompute
+        dashboard_stats.snapshot.invalidate()
+        first = client.get("/api/admin/dashboard/stats", headers=admin_headers)
+        _register(client)
+        resp = client.get("/api/admin/dashboard/stats?fresh=true", headers=admin_headers)
+        assert resp.status_code == 200
+        assert resp.json()["generated_at"] == first.json()["generated_at"]
+        assert resp.json()["total_users"] == first.json()["total_users"]
+
+    def test_regular_user_rejected(self, client, auth_headers):
+        resp = client.get("/api/admin/dashboard/stats", headers=auth_headers)
+        assert resp.status_code in (401, 403)
+
+
+# ════════════════════════════════════════════════
+# ADMIN ORDER LIST
+# ════════════════════════════════════════════════
+
+class TestAdminOrders:
+    def test_orders_carry_buyer_details(self, client, admin_headers, auth_headers, registered_user):
+        user_data, _ = registered_user
+        resp = client.post("/orders", headers=auth_headers, json={
+            "items": [{
+                "productId": "p-1", "productName": "Mug",
+                "productImage": "https://example.com/mug.jpg", "price": 9.5, "quantity": 2,
+            }],
+            "subtotal": 19.0, "shipping": 0, "tax": 0, "total": 19.0,
+            "paymentMethod": "card",
+        })
+        assert resp.status_code == 200, resp.text
+
+        orders = client.get("/api/orders/admin/all", headers=admin_headers).json()
+        mine = [o for o in orders if o["user_email"] == user_data["email"]]
+        assert mine and mine[0]["items"][0]["total"] == 19.0
@@ -0,0 +1,287 @@
+"""
+BuyV Backend — Audio Extraction Job Tests
+
+Covers (fake video host via httpx.MockTransport, fake ffmpeg/ffprobe scripts):
+  - the video is streamed to disk and the audio stored as a file with a URL
+  - oversized downloads, ffmpeg failures and ffmpeg timeouts fail the job
+  - cancelling a job kills its ffmpeg process
+  - repeat extractions reuse the stored artifact (URL + ETag, content hash), LRU eviction
+  - POST /api/sounds/extract returns a job id; poll, SSE, file download, cancel
+"""
+import asyncio
+import os
+import stat
+import sys
+import time
+
+import httpx
+import pytest
+
+from app import audio_extract
+from app.audio_extract import AudioExtractor, CANCELLED, COMPLETED, FAILED
+from app.models import Sound
+from app.sound_store import LOCAL, SoundArtifactStore
+from tests.conftest import TestSessionLocal
+
+VIDEO = b"\x00video-bytes" * 1000
+
+FAKE_FFMPEG = """#!{python}
+import shutil, sys, time
+mode = {mode!r}
+if mode == "fail":
+    sys.exit(1)
+if mode == "hang":
+    time.sleep(30)
+args = sys.argv[1:]
+shutil.copyfile(args[args.index("-i") + 1], args[-1])
+"""
+
+FAKE_FFPROBE = """#!{python}
+print('{{"format": {{"duration": "12.5"}}}}')
+"""
+
+
+def _script(path, body):
+    path.write_text(body)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def _video_host(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/missing.mp4":
+        return httpx.Response(404)
+    if request.url.path == "/etag.mp4":
+        return httpx.Response(200, content=VIDEO, headers={"ETag": '"v1"'})
+    return httpx.Response(200, content=VIDEO)
+
+
+@pytest.fixture
+def make_extractor(tmp_path):
+    def make(mode="ok", **kwargs):
+        kwargs.setdefault("session_factory", TestSessionLocal)
+        return AudioExtractor(
+            ffmpeg_bin=_script(tmp_path / f"ffmpeg_{mode}", FAKE_FFMPEG.format(python=sys.executable, mode=mode)),
+            ffprobe_bin=_script(tmp_path / "ffprobe", FAKE_FFPROBE.format(python=sys.executable)),
+            storage_dir=str(tmp_path / "media"),
+            transport=httpx.MockTransport(_video_host),
+            chunk_bytes=1024,
+            **kwargs,
+        )
+    return make
+
+
+def _wait(job, timeout=10.0):
+    async def go():
+        deadline = time.monotonic() + timeout
+        while not job.done and time.monotonic() < deadline:
+            await job.wait_for_change(job.version, 0.1)
+    return go()
+
+
+class TestAudioExtractor:
+
+    def test_extracts_to_stored_file(self, make_extractor):
+        extractor = make_extractor()
+
+        async def go():
+            job = extractor.submit(1, "https://videos.test/clip.mp4", "My sound")
+            await _wait(job)
+            return job
+
+        job = asyncio.run(go())
+        assert job.status == COMPLETED, job.error
+        assert job.result["duration"] == 12.5
+        assert job.result["title"] == "My sound"
+        name = job.result["audio_url"].rsplit("/", 1)[-1]
+        assert job.result["audio_url"] == f"/api/sounds/extract/files/{name}"
+        with open(extractor.file_path(name), "rb") as f:
+            assert f.read() == VIDEO
+        assert extractor.stats()["bytes_downloaded"] == len(VIDEO)
+
+    def test_file_url_prefers_configured_base(self, make_extractor):
+        assert make_extractor().file_url("a.aac", "https://api.test/") == \
+            "https://api.test/api/sounds/extract/files/a.aac"
+        assert make_extractor(public_base_url="https://cdn.test/").file_url("a.aac", "https://api.test/") == \
+            "https://cdn.test/api/sounds/extract/files/a.aac"
+
+    def test_download_and_ffmpeg_failures(self, make_extractor):
+        async def run(extractor, url):
+            job = extractor.submit(1, url)
+            await _wait(job)
+            return job
+
+        not_found = asyncio.run(run(make_extractor(), "https://videos.test/missing.mp4"))
+        assert not_found.status == FAILED
+        assert "HTTP 404" in not_found.error
+
+        too_big = asyncio.run(run(make_extractor(max_download_bytes=4096), "https://videos.test/clip.mp4"))
+        assert too_big.status == FAILED
+        assert too_big.error == "Video is too large"
+
+        broken = asyncio.run(run(make_extractor("fail"), "https://videos.test/clip.mp4"))
+        assert broken.status == FAILED
+        assert broken.error == "FFmpeg failed to extract audio"
+
+        slow = asyncio.run(run(make_extractor("hang", ffmpeg_timeout=0.5), "https://videos.test/clip.mp4"))
+        assert slow.status == FAILED
+        assert slow.error == "Audio extraction timed out"
+
+    def test_cancel_kills_ffmpeg(self, make_extractor):
+        extractor = make_extractor("hang")
+
+        async def go():
+            job = extractor.submit(1, "https://videos.test/clip.mp4")
+            while job.status != audio_extract.EXTRACTING:
+                await job.wait_for_change(job.version, 1)
+            await asyncio.sleep(0.2)
+            started = time.monotonic()
+            assert extractor.cancel(job.id)
+            await _wait(job)
+            return job, time.monotonic() - started
+
+        job, elapsed = asyncio.run(go())
+        assert job.status == CANCELLED
+        assert elapsed < 5
+        assert not extractor.cancel(job.id)
+
+    def test_pending_limit_per_user(self, make_extractor):
+        extractor = make_extractor("hang", max_pending_per_user=1)
+
+        async def go():
+            extractor.submit(1, "https://videos.test/a.mp4")
+            with pytest.raises(audio_extract.ExtractorBusy):
+                extractor.submit(1, "https://videos.test/b.mp4")
+            extractor.submit(2, "https://videos.test/c.mp4")
+            await extractor.shutdown()
+
+        asyncio.run(go())
+        assert extractor.stats()["rejected"] == 1
+
+
+def _extract_all(extractor, urls):
+    async def go():
+        jobs = []
+        for url in urls:
+            job = extractor.submit(1, url)
+            await _wait(job)
+            jobs.append(job)
+        return jobs
+    return asyncio.run(go())
+
+
+class TestSoundDedup:
+
+    def test_same_url_and_etag_skips_download(self, make_extractor):
+        extractor = make_extractor(max_pending_per_user=5)
+        first, second = _extract_all(extractor, ["https://videos.test/etag.mp4"] * 2)
+        assert first.result["deduplicated"] is False
+        assert second.result["deduplicated"] is True
+        assert second.result["audio_url"] == first.result["audio_url"]
+        stats = extractor.stats()
+        assert stats["dedup_source_hits"] == 1
+        assert stats["bytes_downloaded"] == len(VIDEO)  # body read once
+
+    def test_same_bytes_from_another_url_skips_ffmpeg(self, make_extractor):
+        extractor = make_extractor()
+        first, second = _extract_all(extractor, ["https://videos.test/a.mp4", "https://mirror.test/b.mp4"])
+        assert second.status == COMPLETED
+        assert second.result["deduplicated"] is True
+        assert second.result["content_hash"] == first.result["content_hash"]
+        assert extractor.stats()["dedup_content_hits"] == 1
+
+    def test_concurrent_duplicates_extract_once(self, make_extractor):
+        extractor = make_extractor(max_pending_per_user=5)
+
+        async def go():
+            jobs = [extractor.submit(1, "https://videos.test/etag.mp4") for _ in range(3)]
+            for job in jobs:
+                await _wait(job)
+            return jobs
+
+        jobs = asyncio.run(go())
+        assert [j.result["deduplicated"] for j in jobs].count(False) == 1
+
+    def test_returns_existing_sound(self, make_extractor):
+        extractor = make_extractor()
+        (job,) = _extract_all(extractor, ["https://videos.test/clip.mp4"])
+        db = TestSessionLocal()
+        sound = Sound(title="S", artist="A", audio_url=job.result["audio_url"], duration=12.5)
+        db.add(sound)
+        db.commit()
+        uid = sound.uid
+        try:
+            (again,) = _extract_all(extractor, ["https://videos.test/clip.mp4"])
+            assert again.result["sound_uid"] == uid
+        finally:
+            db.delete(sound)
+            db.commit()
+            db.close()
+
+    def test_lru_eviction_skips_pinned(self, tmp_path):
+        now = [1000.0]
+        store = SoundArtifactStore(storage_dir=str(tmp_path), disk_budget_bytes=250, clock=lambda: now[0])
+        for name in ("a", "b", "c"):
+            with open(store.local_path(name), "wb") as f:
+                f.write(b"x" * 100)
+            store.put(name, LOCAL, f"/files/{name}.aac", 1.0, 100)
+            now[0] += 1
+        store.get_by_content("a")  # a is now the most recently used
+
+        assert store.evict(pinned=lambda urls: {"/files/b.aac"}) == 1
+        assert store.get_by_content("c") is None
+        assert store.get_by_content("a") is not None
+        assert store.get_by_content("b") is not None
+        assert not os.path.exists(store.local_path("c"))
+
+
+class TestExtractEndpoints:
+
+    @pytest.fixture
+    def extractor(self, make_extractor, monkeypatch):
+        extractor = make_extractor()
+        monkeypatch.setattr(audio_extract, "extractor", extractor)
+        return extractor
+
+    def test_submit_poll_and_download(self, client, auth_headers, second_user_headers, extractor):
+        resp = client.post(
+            "/api/sounds/extract",
+            params={"video_url": "https://videos.test/clip.mp4", "title": "Clip"},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 202, resp.text
+        job_id = resp.json()["job_id"]
+
+        deadline = time.monotonic() + 10
+        while True:
+            job = client.get(f"/api/sounds/extract/{job_id}", headers=auth_headers).json()
+            if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        assert job["status"] == "completed", job
+        assert "base64" not in job["result"]["audio_url"]
+        # No AUDIO_PUBLIC_BASE_URL: the URL is made absolute from the request host
+        assert job["result"]["audio_url"].startswith("http://testserver/api/sounds/extract/files/")
+
+        audio = client.get(job["result"]["audio_url"])
+        assert audio.status_code == 200
+        assert audio.content == VIDEO
+
+        # Jobs are private to their owner
+        assert client.get(f"/api/sounds/extract/{job_id}", headers=second_user_headers).status_code == 404
+
+    def test_sse_stream_ends_with_final_status(self, client, auth_headers, extractor):
+        job_id = client.post(
+            "/api/sounds/extract", params={"video_url": "https://videos.test/clip.mp4"}, headers=auth_headers,
+        ).json()["job_id"]
+
+        with client.stream("GET", f"/api/sounds/extract/{job_id}/events", headers=auth_headers) as resp:
+            assert resp.headers["content-type"].startswith("text/event-stream")
+            body = "".join(resp.iter_text())
+        assert body.count("event: status") >= 1
+        assert '"status": "completed"' in body.rsplit("event: status", 1)[-1]
+
+    def test_rejects_non_http_url_and_unknown_files(self, client, auth_headers, extractor):
+        resp = client.post("/api/sounds/extract", params={"video_url": "file:///etc/passwd"}, headers=auth_headers)
+        assert resp.status_code == 400
+        assert client.get("/api/sounds/extract/files/..%2Fsecret.aac").status_code == 404
+        assert client.delete("/api/sounds/extract/nope", headers=auth_headers).status_code == 404
@@ -7,6 +7,7 @@ Covers:
   - GET  /auth/me (authenticated, unauthenticated)
   - POST /auth/refresh (valid, invalid, expired)
   - POST /auth/logout + token blacklisting (H-3)
+  - Auth hot-path caches (profile edits, account deletion, cross-worker revocation)
   - POST /auth/change-password
   - POST /auth/admin/login
 """
@@ -257,3 +258,46 @@ class TestAdminLogin:
         })
         # Should fail — user is not admin
         assert resp.status_code in (401, 403)
+
+
+# ════════════════════════════════════════════════
+# AUTH CACHE INVALIDATION
+# ════════════════════════════════════════════════
+
+class TestAuthCache:
+    def test_profile_update_visible_on_next_request(self, client, auth_headers):
+        uid = client.get("/auth/me", headers=auth_headers).json()["id"]
+        resp = client.put(f"/users/{uid}", headers=auth_headers, json={"displayName": "Renamed"})
+        assert resp.status_code == 200
+        assert client.get("/auth/me", headers=auth_headers).json()["displayName"] == "Renamed"
+
+    def test_deleted_account_token_stops_resolving(self, client, auth_headers):
+        assert client.get("/auth/me", headers=auth_headers).status_code == 200
+        assert client.delete("/users/me", headers=auth_headers).status_code == 200
+        assert client.get("/auth/me", headers=auth_headers).status_code == 404
+
+    def test_revocation_from_another_worker_picked_up_on_sync(self, client, registered_user):
+        """A jti revoked directly in the DB (e.g. by another worker) is honoured after sync."""
+        from datetime import datetime, timedelta
+        from jose import jwt
+        from app import auth_cache, models
+        from app.config import SECRET_KEY, ALGORITHM
+        from tests.conftest import TestSessionLocal
+
+        _, data = registered_user
+        token = data["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/auth/me", headers=headers).status_code == 200
+
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        db = TestSessionLocal()
+        db.add(models.RevokedToken(
+            jti=claims["jti"],
+            user_uid=claims["sub"],
+            expires_at=datetime.utcnow() + timedelta(hours=1),
+        ))
+        db.commit()
+        db.close()
+
+        auth_cache.revocations.reset()  # force the next request to sync
+        assert client.get("/auth/me", headers=headers).status_code == 401
@@ -0,0 +1,254 @@
+"""
+BuyV Backend — CJ Dropshipping Client Tests
+
+Covers (against an in-process fake CJ API via httpx.MockTransport):
+  - one pooled AsyncClient reused across calls
+  - single-flight token refresh for concurrent 401s
+  - MarketplaceService only builds the CJ client when a CJ call is made
+  - catalog cache: TTL hits, stale-while-revalidate, error payloads, SQLite tier,
+    admin stats / purge endpoints
+"""
+import asyncio
+import json
+
+import uuid
+
+import httpx
+import pytest
+
+from app.marketplace import cj_cache, cj_service
+from app.models import User
+from tests.conftest import TestSessionLocal
+from app.marketplace.cj_service import CJDropshippingService, CJAuthError
+
+
+class FakeCJ:
+    """Minimal CJ API: accepts one access token and hands out a new one on refresh."""
+
+    def __init__(self, valid_token="fresh", refresh_ok=True, list_code=200):
+        self.valid_token = valid_token
+        self.refresh_ok = refresh_ok
+        self.list_code = list_code
+        self.refresh_calls = 0
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path.endswith("/authentication/refreshAccessToken"):
+            self.refresh_calls += 1
+            await asyncio.sleep(0.01)  # let concurrent 401s pile up on the lock
+            if not self.refresh_ok:
+                return httpx.Response(200, json={"code": 1600001, "message": "bad refresh token"})
+            return httpx.Response(200, json={"code": 200, "data": {"accessToken": self.valid_token}})
+        if request.headers.get("CJ-Access-Token") != self.valid_token:
+            return httpx.Response(401, json={"code": 1600001})
+        if request.url.path.endswith("/product/list"):
+            return httpx.Response(200, json={"code": self.list_code, "data": {"list": []}})
+        if request.url.path.endswith("/product/query"):
+            pid = request.url.params["pid"]
+            return httpx.Response(200, json={"code": 200, "data": {"pid": pid}})
+        return httpx.Response(200, json={"code": 200, "data": json.loads(request.content or b"{}")})
+
+
+@pytest.fixture
+def cj_env(monkeypatch):
+    monkeypatch.setenv("CJ_ACCOUNT_ID", "acct-1")
+    monkeypatch.setenv("CJ_API_KEY", "expired")
+    monkeypatch.setenv("CJ_REFRESH_TOKEN", "refresh-1")
+    monkeypatch.setattr(CJDropshippingService, "_update_env_tokens", lambda self, a, r: None)
+
+
+def _service(fake, cache=None):
+    return CJDropshippingService(transport=httpx.MockTransport(fake), cache=cache)
+
+
+class TestCJClient:
+    def test_client_is_reused(self, cj_env):
+        fake = FakeCJ(valid_token="expired")
+
+        async def run():
+            svc = _service(fake)
+            first = svc.client
+            await svc.get_product_details("p1")
+            await svc._post("/order/createOrder", {"a": 1})
+            assert svc.client is first
+            await svc.aclose()
+
+        asyncio.run(run())
+        assert len(fake.requests) == 2
+
+    def test_concurrent_401s_share_one_refresh(self, cj_env):
+        fake = FakeCJ()
+
+        async def run():
+            svc = _service(fake)
+            results = await asyncio.gather(*(svc.get_product_details(f"p{i}") for i in range(10)))
+            await svc.aclose()
+            return svc, results
+
+        svc, results = asyncio.run(run())
+        assert fake.refresh_calls == 1
+        assert svc.api_key == "fresh"
+        assert [r["pid"] for r in results] == [f"p{i}" for i in range(10)]
+
+    def test_failed_refresh_is_not_repeated(self, cj_env):
+        fake = FakeCJ(refresh_ok=False)
+
+        async def run():
+            svc = _service(fake)
+            results = await asyncio.gather(
+                *(svc.get_product_details(f"p{i}") for i in range(5)), return_exceptions=True
+            )
+            await svc.aclose()
+            return results
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, CJAuthError) for r in results)
+        assert fake.refresh_calls == 1
+
+
+class TestSharedService:
+    def test_marketplace_service_does_not_build_cj_client(self, monkeypatch):
+        from app.marketplace.service import MarketplaceService
+
+        monkeypatch.delenv("CJ_ACCOUNT_ID", raising=False)
+        monkeypatch.setattr(cj_service, "_service", None)
+        MarketplaceService(db=None)  # no CJ config needed for non-CJ endpoints
+        with pytest.raises(ValueError):
+            MarketplaceService(db=None).cj_service
+
+    def test_get_cj_service_is_singleton(self, cj_env, monkeypatch):
+        monkeypatch.setattr(cj_service, "_service", None)
+        assert cj_service.get_cj_service() is cj_service.get_cj_service()
+        asyncio.run(cj_service.close_cj_service())
+        assert cj_service._service is None
+
+
+# ════════════════════════════════════════════════
+# CATALOG CACHE
+# ════════════════════════════════════════════════
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(clock, backend=None):
+    return cj_cache.CJResponseCache(
+        cj_cache.MemoryCacheBackend() if backend is None else backend,
+        ttls={cj_cache.PRODUCT: 60, cj_cache.SEARCH: 60},
+        stale_seconds=600,
+        clock=clock,
+    )
+
+
+def _product_calls(fake):
+    return sum(1 for r in fake.requests if r.url.path.endswith("/product/query"))
+
+
+class TestCatalogCache:
+    def test_fresh_entry_is_served_from_cache(self, cj_env):
+        fake = FakeCJ(valid_token="expired")
+        cache = _cache(Clock())
+
+        async def run():
+            svc = _service(fake, cache)
+            await svc.get_product_details("p1")
+            await svc.get_product_details("p1")
+            await svc.get_product_details("p1", fresh=True)
+            await svc.aclose()
+
+        asyncio.run(run())
+        assert _product_calls(fake) == 2
+        assert cache.stats()["endpoints"]["product"]["hits"] == 1
+
+    def test_stale_entry_served_while_revalidating(self, cj_env):
+        fake = FakeCJ(valid_token="expired")
+        clock = Clock()
+        cache = _cache(clock)
+
+        async def run():
+            svc = _service(fake, cache)
+            await svc.get_product_details("p1")
+            clock.now += 120  # past the TTL, inside the stale window
+            stale = await svc.get_product_details("p1")
+            await asyncio.sleep(0.05)  # let the background refresh land
+            fresh = await svc.get_product_details("p1")
+            await svc.aclose()
+            return stale, fresh
+
+        stale, fresh = asyncio.run(run())
+        assert stale == fresh == {"pid": "p1"}
+        assert _product_calls(fake) == 2
+        counters = cache.stats()["endpoints"]["product"]
+        assert counters["stale_hits"] == 1 and counters["refreshes"] == 1 and counters["hits"] == 1
+
+    def test_error_payloads_are_not_cached(self, cj_env):
+        fake = FakeCJ(valid_token="expired", list_code=500)
+        cache = _cache(Clock())
+
+        async def run():
+            svc = _service(fake, cache)
+            result = await svc.search_products("mug")
+            await svc.aclose()
+            return result
+
+        assert asyncio.run(run()) == {"list": [], "total": 0}
+        assert len(cache.backend) == 0
+
+    def test_sqlite_tier_survives_new_memory_tier(self, tmp_path):
+        path = str(tmp_path / "cj_cache.db")
+        clock = Clock()
+        first = _cache(clock, cj_cache.TieredCacheBackend(
+            cj_cache.MemoryCacheBackend(), cj_cache.SQLiteCacheBackend(path)))
+        second = _cache(clock, cj_cache.TieredCacheBackend(
+            cj_cache.MemoryCacheBackend(), cj_cache.SQLiteCacheBackend(path)))
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return {"code": 200, "data": {"pid": "p1"}}
+
+        asyncio.run(first.get_or_fetch(cj_cache.PRODUCT, {"pid": "p1"}, fetch))
+        value = asyncio.run(second.get_or_fetch(cj_cache.PRODUCT, {"pid": "p1"}, fetch))
+        assert value["data"]["pid"] == "p1"
+        assert len(calls) == 1
+        assert second.purge(cj_cache.PRODUCT) == 1
+
+
+@pytest.fixture
+def admin_headers(client):
+    payload = {
+        "email": f"admin_{uuid.uuid4().hex[:8]}@buyv.io",
+        "password": "AdminPass123!",
+        "username": f"admin_{uuid.uuid4().hex[:8]}",
+        "displayName": "CJ Admin",
+    }
+    resp = client.post("/auth/register", json=payload)
+    assert resp.status_code == 200
+    db = TestSessionLocal()
+    db.query(User).filter(User.email == payload["email"]).update({"role": "admin"})
+    db.commit()
+    db.close()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+class TestCacheAdminEndpoints:
+    def test_stats_and_purge(self, client, admin_headers, monkeypatch):
+        cache = _cache(Clock())
+        cache.backend.set(cache.make_key(cj_cache.SEARCH, {"q": "x"}), (0.0, {}))
+        monkeypatch.setattr(cj_cache, "cache", cache)
+
+        stats = client.get("/api/v1/admin/cj/cache/stats", headers=admin_headers)
+        assert stats.status_code == 200
+        assert stats.json()["entries"] == 1
+
+        purged = client.delete("/api/v1/admin/cj/cache?endpoint=search", headers=admin_headers)
+        assert purged.json() == {"purged": 1}
+
+    def test_regular_user_rejected(self, client, auth_headers):
+        resp = client.delete("/api/v1/admin/cj/cache", headers=auth_headers)
+        assert resp.status_code in (401, 403)
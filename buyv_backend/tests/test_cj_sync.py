@@ -0,0 +1,164 @@
+"""
+BuyV Backend — Bulk CJ Sync Tests
+
+Covers (fake CJ API via httpx.MockTransport, test SQLite DB):
+  - only rows whose price/stock changed are written; inactive products keep their status
+  - 429 responses are retried, unreadable products are counted as failed
+  - checkpoint resume after an interrupted run; a fresh run aborts it instead
+  - POST /api/v1/admin/cj/sync-all requires admin
+"""
+import asyncio
+import uuid
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from app.marketplace.cj_service import CJDropshippingService
+from app.marketplace.cj_sync import CJSyncJob, ABORTED, COMPLETED, FAILED, RUNNING
+from app.marketplace.models import CJSyncRun, MarketplaceProduct
+from tests.conftest import TestSessionLocal
+
+
+class FakeCJ:
+    """Serves /product/query and /product/inventory from a pid -> (price, in_stock) map."""
+
+    def __init__(self, catalog, throttle_once=()):
+        self.catalog = catalog
+        self.throttle = set(throttle_once)
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        pid = request.url.params.get("pid")
+        self.calls.append((request.url.path, pid))
+        if pid in self.throttle:
+            self.throttle.discard(pid)
+            return httpx.Response(429, json={"code": 429})
+        if pid not in self.catalog:
+            return httpx.Response(200, json={"code": 1600100, "message": "not found"})
+        price, in_stock = self.catalog[pid]
+        if request.url.path.endswith("/product/inventory"):
+            return httpx.Response(200, json={"code": 200, "data": {"in_stock": in_stock}})
+        return httpx.Response(200, json={"code": 200, "data": {
+            "pid": pid, "productNameEn": "P", "sellPrice": price, "suggestSellPrice": "50.00",
+        }})
+
+
+@pytest.fixture
+def products(monkeypatch):
+    """Five CJ products (pids sorted like their ids) priced 10.00 / 50.00, active."""
+    monkeypatch.setenv("CJ_ACCOUNT_ID", "acct-1")
+    monkeypatch.setenv("CJ_API_KEY", "token")
+    ids = sorted(uuid.uuid4() for _ in range(5))
+    rows = [
+        MarketplaceProduct(
+            id=pid, name=f"P{i}", cj_product_id=f"cj-{i}",
+            original_price=Decimal("50.00"), selling_price=Decimal("10.00"), status="active",
+        )
+        for i, pid in enumerate(ids)
+    ]
+    db = TestSessionLocal()
+    db.add_all(rows)
+    db.commit()
+    db.close()
+    yield ids
+    db = TestSessionLocal()
+    db.query(MarketplaceProduct).filter(MarketplaceProduct.id.in_(ids)).delete(synchronize_session=False)
+    db.query(CJSyncRun).delete()
+    db.commit()
+    db.close()
+
+
+def _run(fake, resume=True, **kwargs):
+    async def go():
+        cj = CJDropshippingService(transport=httpx.MockTransport(fake), cache=None)
+        try:
+            job = CJSyncJob(cj, session_factory=TestSessionLocal, requests_per_second=1000,
+                            retry_backoff_seconds=0, **kwargs)
+            return await job.run(resume=resume)
+        finally:
+            await cj.aclose()
+    return asyncio.run(go())
+
+
+def _product(pid):
+    db = TestSessionLocal()
+    try:
+        return db.get(MarketplaceProduct, pid)
+    finally:
+        db.close()
+
+
+class TestBulkSync:
+    def test_only_changed_rows_are_written(self, products):
+        db = TestSessionLocal()
+        db.query(MarketplaceProduct).filter(MarketplaceProduct.id == products[4]).update({"status": "inactive"})
+        db.commit()
+        db.close()
+        fake = FakeCJ({
+            "cj-0": ("10.00", True),   # unchanged
+            "cj-1": ("12.50", True),   # price change
+            "cj-2": ("10.00", False),  # goes out of stock
+            "cj-3": ("10.00", True),
+            "cj-4": ("10.00", False),  # inactive: status left alone
+        })
+        summary = _run(fake, batch_size=2)
+
+        assert summary["status"] == COMPLETED
+        assert (summary["processed"], summary["changed"], summary["failed"]) == (5, 2, 0)
+        assert _product(products[1]).selling_price == Decimal("12.50")
+        assert _product(products[2]).status == "out_of_stock"
+        assert _product(products[4]).status == "inactive"
+
+    def test_throttled_calls_retried_and_missing_products_counted(self, products):
+        catalog = {f"cj-{i}": ("10.00", True) for i in range(4)}  # cj-4 unknown to CJ
+        summary = _run(FakeCJ(catalog, throttle_once={"cj-1"}))
+        assert summary["failed"] == 1
+        assert summary["errors"][0]["cj_product_id"] == "cj-4"
+        assert summary["unchanged"] == 4
+
+    def test_resume_from_checkpoint(self, products):
+        db = TestSessionLocal()
+        db.add(CJSyncRun(status=RUNNING, total=5, processed=3, last_product_id=products[2], errors=[]))
+        db.commit()
+        db.close()
+        fake = FakeCJ({f"cj-{i}": ("11.00", True) for i in range(5)})
+
+        summary = _run(fake)
+        assert summary["resumed"] is True
+        assert summary["processed"] == 5
+        assert {pid for _, pid in fake.calls} == {"cj-3", "cj-4"}
+        assert _product(products[0]).selling_price == Decimal("10.00")
+        assert _product(products[4]).selling_price == Decimal("11.00")
+
+        again = _run(FakeCJ({}), resume=True)  # completed runs are not resumed
+        assert again["resumed"] is False
+
+    def test_fresh_run_aborts_unfinished_runs(self, products):
+        db = TestSessionLocal()
+        stale = [CJSyncRun(status=RUNNING, total=5, processed=3, last_product_id=products[2], errors=[]),
+                 CJSyncRun(status=FAILED, total=5, processed=1, last_product_id=products[0], errors=[])]
+        db.add_all(stale)
+        db.commit()
+        stale_ids = [r.id for r in stale]
+        db.close()
+
+        summary = _run(FakeCJ({f"cj-{i}": ("10.00", True) for i in range(5)}), resume=False)
+        assert summary["resumed"] is False
+        assert summary["processed"] == 5
+
+        db = TestSessionLocal()
+        try:
+            runs = db.query(CJSyncRun).filter(CJSyncRun.id.in_(stale_ids)).all()
+            assert {r.status for r in runs} == {ABORTED}
+            assert all(r.finished_at is not None for r in runs)
+        finally:
+            db.close()
+        # Nothing left to resume
+        assert _run(FakeCJ({}), resume=True)["resumed"] is False
+
+
+class TestSyncEndpoint:
+    def test_regular_user_rejected(self, client, auth_headers):
+        resp = client.post("/api/v1/admin/cj/sync-all", headers=auth_headers)
+        assert resp.status_code in (401, 403)
@@ -0,0 +1,123 @@
+"""
+BuyV Backend — Write-behind Counter Tests
+
+Covers:
+  - increments are summed in memory and written as one UPDATE per column
+  - pending() keeps unflushed increments visible to readers
+  - a failed flush keeps the deltas for the next attempt
+  - reaching max_keys from a threadpool thread wakes the flusher early
+  - POST /api/sounds/{uid}/use goes through the buffer; GET /health/counters
+"""
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from app import counters
+from app.counters import CounterBuffer
+from app.models import Sound
+from tests.conftest import TestSessionLocal, test_engine
+
+
+@pytest.fixture
+def sounds():
+    db = TestSessionLocal()
+    rows = [Sound(title=f"S{i}", artist="A", audio_url=f"https://cdn.test/{uuid.uuid4().hex}.aac",
+                  duration=10.0, usage_count=5) for i in range(3)]
+    db.add_all(rows)
+    db.commit()
+    ids = [s.id for s in rows]
+    db.close()
+    yield ids
+    db = TestSessionLocal()
+    db.query(Sound).filter(Sound.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def _usage(sound_id):
+    db = TestSessionLocal()
+    try:
+        return db.get(Sound, sound_id).usage_count
+    finally:
+        db.close()
+
+
+class TestCounterBuffer:
+
+    def test_increments_flush_as_one_update(self, sounds):
+        buf = CounterBuffer(session_factory=TestSessionLocal)
+        for _ in range(10):
+            for sid in sounds:
+                buf.incr(Sound.usage_count, sid)
+        assert buf.pending(Sound.usage_count, sounds[0]) == 10
+        assert _usage(sounds[0]) == 5
+
+        statements = []
+        listener = lambda conn, cursor, stmt, params, ctx, many: statements.append(stmt)
+        event.listen(test_engine, "before_cursor_execute", listener)
+        try:
+            assert buf.flush() == 3
+        finally:
+            event.remove(test_engine, "before_cursor_execute", listener)
+
+        assert [s for s in statements if s.lstrip().upper().startswith("UPDATE")] == [statements[0]]
+        assert [_usage(sid) for sid in sounds] == [15, 15, 15]
+        assert buf.pending(Sound.usage_count, sounds[0]) == 0
+        assert buf.flush() == 0
+
+    def test_failed_flush_keeps_deltas(self, sounds):
+        def database_down():
+            raise RuntimeError("database is down")
+
+        buf = CounterBuffer(session_factory=database_down)
+        buf.incr(Sound.usage_count, sounds[0], 3)
+        assert buf.flush() == 0
+        assert buf.stats()["failed_flushes_total"] == 1
+        assert buf.pending(Sound.usage_count, sounds[0]) == 3
+
+        buf.incr(Sound.usage_count, sounds[0])
+        buf.session_factory = TestSessionLocal
+        assert buf.flush() == 1
+        assert _usage(sounds[0]) == 9
+
+    def test_max_keys_from_worker_thread_wakes_flusher(self, sounds):
+        buf = CounterBuffer(flush_interval_ms=60_000, max_keys=len(sounds), session_factory=TestSessionLocal)
+
+        async def go():
+            await buf.start()
+            try:
+                # Sync endpoints call incr() from the threadpool, not the loop thread
+                await asyncio.to_thread(lambda: [buf.incr(Sound.usage_count, sid) for sid in sounds])
+                for _ in range(100):
+                    if buf.stats()["flushes_total"]:
+                        break
+                    await asyncio.sleep(0.02)
+                return buf.stats()["rows_flushed_total"]
+            finally:
+                await buf.stop()
+
+        # Flushed long before the 60 s interval, by the flusher rather than stop()
+        assert asyncio.run(go()) == len(sounds)
+        assert [_usage(sid) for sid in sounds] == [6, 6, 6]
+
+
+class TestSoundUsageEndpoint:
+
+    def test_use_is_buffered_then_flushed(self, client, auth_headers, sounds):
+        db = TestSessionLocal()
+        uid = db.get(Sound, sounds[1]).uid
+        db.close()
+        for _ in range(4):
+            assert client.post(f"/api/sounds/{uid}/use", headers=auth_headers).status_code == 200
+        assert client.get(f"/api/sounds/{uid}").json()["usageCount"] == 9
+
+        counters.buffer.flush()
+        assert _usage(sounds[1]) == 9
+        assert client.get(f"/api/sounds/{uid}").json()["usageCount"] == 9
+
+    def test_health_counters(self, client):
+        body = client.get("/health/counters").json()
+        for key in ("pending_rows", "rows_flushed_total", "failed_flushes_total", "last_flush_ms"):
+            assert key in body
@@ -0,0 +1,143 @@
+"""
+BuyV Backend — Follow Graph Endpoint Tests
+
+Covers:
+  - GET /users/{uid}/followers and /following: newest first, cursor paging via X-Next-Cursor
+  - GET /users/suggested: precomputed friends-of-friends, ranked by mutuals, filtered
+    by later follows / blocks, topped up with popular users
+  - POST /users/relationships: follow / block state for many targets in constant queries
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import BlockedUser, Follow, User, UserSuggestion
+from app.suggestions import build_suggestions, suggested_uids
+from tests.conftest import TestSessionLocal, test_engine
+
+
+def _make_users(db, n):
+    users = [User(email=f"f_{uuid.uuid4().hex[:8]}@test.com", username=f"f_{uuid.uuid4().hex[:8]}",
+                  display_name="Follow Test", password_hash="x") for _ in range(n)]
+    db.add_all(users)
+    db.flush()
+    return users
+
+
+@pytest.fixture
+def star():
+    """A user followed by 5 users (and following them back), follow times 1 minute apart."""
+    db = TestSessionLocal()
+    star, *fans = _make_users(db, 6)
+    start = datetime.utcnow() - timedelta(hours=1)
+    for i, fan in enumerate(fans):
+        db.add(Follow(follower_id=fan.id, followed_id=star.id, created_at=start + timedelta(minutes=i)))
+        db.add(Follow(follower_id=star.id, followed_id=fan.id, created_at=start + timedelta(minutes=i)))
+    db.commit()
+    result = star.uid, [f.uid for f in fans]
+    db.close()
+    return result
+
+
+class TestFollowLists:
+
+    @pytest.mark.parametrize("path", ["followers", "following"])
+    def test_cursor_pages_newest_first(self, client, star, path):
+        star_uid, fan_uids = star
+        first = client.get(f"/users/{star_uid}/{path}?limit=2")
+        assert first.status_code == 200
+        assert [u["id"] for u in first.json()] == fan_uids[::-1][:2]
+
+        seen = [u["id"] for u in first.json()]
+        cursor = first.headers.get("X-Next-Cursor")
+        while cursor:
+            page = client.get(f"/users/{star_uid}/{path}?limit=2&cursor={cursor}")
+            seen += [u["id"] for u in page.json()]
+            cursor = page.headers.get("X-Next-Cursor")
+        assert seen == fan_uids[::-1]
+
+    def test_projection_and_errors(self, client, star):
+        star_uid, _ = star
+        info = client.get(f"/users/{star_uid}/followers?limit=1").json()[0]
+        assert set(info) == {"id", "username", "displayName", "profileImageUrl", "isVerified"}
+        assert client.get(f"/users/nobody-{uuid.uuid4().hex}/followers").status_code == 404
+        assert client.get(f"/users/{star_uid}/following?cursor=garbage").status_code == 400
+
+
+class TestSuggestions:
+
+    def test_friends_of_friends_ranked_and_filtered(self):
+        db = TestSessionLocal()
+        me, a, b, c, d, e = _make_users(db, 6)
+        for follower, followed in [(me, a), (me, b), (me, e), (a, c), (b, c), (a, d), (a, e)]:
+            db.add(Follow(follower_id=follower.id, followed_id=followed.id))
+        db.commit()
+        build_suggestions(db)
+
+        rows = db.query(UserSuggestion).filter(UserSuggestion.user_id == me.id).all()
+        assert {(r.candidate_id, r.mutual_count) for r in rows} == {(c.id, 2), (d.id, 1)}
+        assert suggested_uids(db, me, 2) == [c.uid, d.uid]
+        assert len(suggested_uids(db, me, 5)) == 5  # topped up with popular users
+
+        # Follows and blocks made after the rebuild apply immediately
+        db.add(Follow(follower_id=me.id, followed_id=c.id))
+        db.add(BlockedUser(blocker_uid=d.uid, blocked_uid=me.uid))
+        db.commit()
+        assert not {c.uid, d.uid, me.uid} & set(suggested_uids(db, me, 20))
+        db.close()
+
+    def test_endpoint_not_shadowed_by_profile_route(self, client, auth_headers):
+        resp = client.get("/users/suggested?limit=3", headers=auth_headers)
+        assert resp.status_code == 200
+        assert len(resp.json()["suggested"]) <= 3
+
+
+class TestRelationships:
+
+    def _post(self, client, auth_headers, uids):
+        statements = []
+        listener = lambda conn, cursor, stmt, params, ctx, many: statements.append(stmt)
+        event.listen(test_engine, "before_cursor_execute", listener)
+        try:
+            resp = client.post("/users/relationships", json={"uids": uids}, headers=auth_headers)
+        finally:
+            event.remove(test_engine, "before_cursor_execute", listener)
+        assert resp.status_code == 200, resp.text
+        return resp.json()["relationships"], len(statements)
+
+    def test_batch_status_in_constant_queries(self, client, auth_headers, registered_user):
+        db = TestSessionLocal()
+        me = db.query(User).filter(User.uid == registered_user[1]["user"]["id"]).one()
+        following, follower, blocked, blocker, mutual, *others = _make_users(db, 10)
+        db.add_all([
+            Follow(follower_id=me.id, followed_id=following.id),
+            Follow(follower_id=follower.id, followed_id=me.id),
+            Follow(follower_id=me.id, followed_id=mutual.id),
+            Follow(follower_id=mutual.id, followed_id=me.id),
+            BlockedUser(blocker_uid=me.uid, blocked_uid=blocked.uid),
+            BlockedUser(blocker_uid=blocker.uid, blocked_uid=me.uid),
+        ])
+        db.commit()
+        uids = [u.uid for u in (following, follower, blocked, blocker, mutual)]
+        other_uids = [u.uid for u in others]
+        db.close()
+
+        self._post(client, auth_headers, uids[:1])  # warm up the connection pool
+        _, small_queries = self._post(client, auth_headers, uids[:1])
+        result, queries = self._post(client, auth_headers, uids + other_uids + ["nobody"])
+        assert queries == small_queries
+
+        flags = lambda uid: tuple(k for k, v in result[uid].items() if v)
+        assert flags(uids[0]) == ("isFollowing",)
+        assert flags(uids[1]) == ("isFollowedBy",)
+        assert flags(uids[2]) == ("isBlocked",)
+        assert flags(uids[3]) == ("isBlockedBy",)
+        assert flags(uids[4]) == ("isFollowing", "isFollowedBy")
+        assert all(flags(uid) == () for uid in other_uids)
+        assert "nobody" not in result
+
+    def test_rejects_oversized_batch(self, client, auth_headers):
+        resp = client.post("/users/relationships", json={"uids": ["x"] * 201}, headers=auth_headers)
+        assert resp.status_code == 422
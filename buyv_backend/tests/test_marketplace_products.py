@@ -0,0 +1,122 @@
+"""
+BuyV Backend — Marketplace Product Serialization Tests
+
+Covers:
+  - POST /api/v1/promotions fills the product's denormalized primary promotion
+  - POST/DELETE /posts/{uid}/like keep post_likes_count on the product in sync
+  - DELETE /api/v1/promotions/{id} falls back to the next promotion
+  - GET /api/v1/marketplace/products runs the same number of queries for 1 or N items
+  - list totals: count=none (has_more only), cached totals invalidated by product writes
+"""
+from sqlalchemy import event
+
+from app.marketplace import product_counts
+from app.marketplace.models import MarketplaceProduct
+from tests.conftest import TestSessionLocal, test_engine
+
+
+def _count_queries(fn):
+    statements = []
+    listener = lambda conn, cursor, stmt, params, ctx, many: statements.append(stmt)
+    event.listen(test_engine, "before_cursor_execute", listener)
+    try:
+        result = fn()
+    finally:
+        event.remove(test_engine, "before_cursor_execute", listener)
+    return result, len(statements)
+
+
+class TestPromotionSummary:
+
+    def test_promotion_and_likes_are_denormalized(self, client, auth_headers, registered_user, promoted_products):
+        _, pairs = promoted_products
+        product_id, post_uid = pairs[0]
+        assert client.post(f"/posts/{post_uid}/like", headers=auth_headers).status_code == 200
+
+        body = client.get(f"/api/v1/marketplace/products/{product_id}", headers=auth_headers).json()
+        assert body["post_uid"] == post_uid
+        assert body["promoter_user_id"] == registered_user[1]["user"]["id"]
+        assert body["post_likes_count"] == 1
+        assert body["is_liked"] is True
+
+        assert client.delete(f"/posts/{post_uid}/like", headers=auth_headers).status_code == 200
+        body = client.get(f"/api/v1/marketplace/products/{product_id}", headers=auth_headers).json()
+        assert body["post_likes_count"] == 0
+        assert body["is_liked"] is False
+
+    def test_deleting_primary_promotion_falls_back(self, client, auth_headers, promoted_products):
+        _, pairs = promoted_products
+        product_id, first_post = pairs[0]
+        second_post = pairs[1][1]
+        client.post("/api/v1/promotions", json={"post_id": second_post, "product_id": product_id},
+                    headers=auth_headers)
+
+        promotions = client.get(f"/api/v1/promotions/product/{product_id}").json()
+        primary = next(p for p in promotions if p["post_id"] == first_post)
+        assert client.delete(f"/api/v1/promotions/{primary['id']}", headers=auth_headers).status_code == 204
+
+        body = client.get(f"/api/v1/marketplace/products/{product_id}").json()
+        assert body["post_uid"] == second_post
+        assert body["total_promotions"] == 1
+
+
+class TestProductListQueries:
+
+    def test_query_count_does_not_grow_with_page_size(self, client, auth_headers, promoted_products):
+        tag, _ = promoted_products
+
+        def page(limit):
+            resp = client.get("/api/v1/marketplace/products",
+                              params={"search": tag, "limit": limit, "sort_by": "recent", "count": "none"},
+                              headers=auth_headers)
+            assert resp.status_code == 200
+            return resp.json()
+
+        one, one_queries = _count_queries(lambda: page(1))
+        five, five_queries = _count_queries(lambda: page(5))
+        assert len(one["items"]) == 1
+        assert len(five["items"]) == 5
+        assert all(item["post_uid"] for item in five["items"])
+        assert five_queries == one_queries
+
+
+class TestProductListTotals:
+
+    def _page(self, client, tag, **params):
+        resp = client.get("/api/v1/marketplace/products", params={"search": tag, "limit": 2, **params})
+        assert resp.status_code == 200, resp.text
+        return resp.json()
+
+    def test_has_more_without_count(self, client, promoted_products):
+        tag, _ = promoted_products
+        body = self._page(client, tag, count="none")
+        assert body["total"] is None and body["total_pages"] is None
+        assert body["has_more"] is True
+        assert self._page(client, tag, count="none", page=3)["has_more"] is False
+
+    def test_total_cached_until_product_write(self, client, promoted_products):
+        tag, _ = promoted_products
+        counter = product_counts.counter
+        assert self._page(client, tag)["total"] == 5
+
+        hits = counter.stats()["hits"]
+        body = self._page(client, tag, page=2)
+        assert (body["total"], body["total_pages"], body["has_more"]) == (5, 3, True)
+        assert counter.stats()["hits"] == hits + 1
+
+        # Last page: total comes from the page itself
+        assert self._page(client, tag, page=3)["total"] == 5
+
+        # Counter-only writes keep the cache
+        generation = counter.stats()["generation"]
+        db = TestSessionLocal()
+        product = db.query(MarketplaceProduct).filter(MarketplaceProduct.name.like(f"%{tag}%")).first()
+        product.total_views = 99
+        db.commit()
+        assert counter.stats()["generation"] == generation
+
+        product.status = "inactive"
+        db.commit()
+        db.close()
+        assert counter.stats()["generation"] == generation + 1
+        assert self._page(client, tag)["total"] == 4
@@ -0,0 +1,312 @@
+"""
+BuyV Backend — Notification & Push Dispatch Tests
+
+Covers:
+  - POST /notifications queues the push instead of sending inline
+  - PushDispatcher coalescing into send_multicast chunks, retries and
+    invalid-token pruning (FakePushTransport, no FCM); a full chunk wakes the flusher
+  - POST /api/admin/notifications/send bulk insert + single broadcast push
+  - GET /notifications/me cursor pagination, GET /notifications/unread-count
+    and POST /notifications/read-all (all / up to cursor)
+  - Core UPDATEs of users (badge counter, token pruning) evict the auth user cache
+"""
+import asyncio
+import pytest
+import uuid
+
+from app import auth_cache, push_dispatcher
+from app.notifications import adjust_unread_count
+from app.models import User, Notification
+from tests.conftest import TestSessionLocal
+
+
+@pytest.fixture
+def fake_push(monkeypatch):
+    """Route the app-wide dispatcher to a fresh in-memory transport."""
+    transport = push_dispatcher.FakePushTransport()
+    push_dispatcher.dispatcher.flush()
+    monkeypatch.setattr(push_dispatcher.dispatcher, "transport", transport)
+    return transport
+
+
+def _set_token(email, token):
+    db = TestSessionLocal()
+    db.query(User).filter(User.email == email).update({"fcm_token": token})
+    db.commit()
+    db.close()
+
+
+def _token_of(email):
+    db = TestSessionLocal()
+    try:
+        return db.query(User.fcm_token).filter(User.email == email).scalar()
+    finally:
+        db.close()
+
+
+def _dispatcher(transport, **kwargs):
+    kwargs.setdefault("retry_backoff_ms", 0)
+    return push_dispatcher.PushDispatcher(transport=transport, session_factory=TestSessionLocal, **kwargs)
+
+
+# ════════════════════════════════════════════════
+# CREATE NOTIFICATION
+# ════════════════════════════════════════════════
+
+class TestCreateNotification:
+    def test_push_is_queued_then_sent(self, client, auth_headers, registered_user, fake_push):
+        user_data, _ = registered_user
+        token = f"tok-{uuid.uuid4().hex[:8]}"
+        _set_token(user_data["email"], token)
+
+        resp = client.post("/notifications/", headers=auth_headers, json={
+            "userId": "", "title": "Hi", "body": "There", "type": "general",
+        })
+        assert resp.status_code == 200, resp.text
+
+        push_dispatcher.dispatcher.flush()
+        sent = [s for s in fake_push.sent if token in s["tokens"]]
+        assert len(sent) == 1
+        assert sent[0]["data"]["notification_id"] == str(resp.json()["id"])
+
+
+# ════════════════════════════════════════════════
+# DISPATCHER
+# ════════════════════════════════════════════════
+
+class TestPushDispatcher:
+    def test_same_payload_coalesced_into_chunks(self):
+        transport = push_dispatcher.FakePushTransport()
+        d = _dispatcher(transport, batch_size=2)
+        for t in ("a", "b", "c", "a"):
+            d.enqueue([t], "Sale", "50% off", notification_type="promotion")
+        d.enqueue(["z"], "Other", "body")
+
+        assert d.flush() == 4
+        sale = sorted(len(s["tokens"]) for s in transport.sent if s["title"] == "Sale")
+        assert sale == [1, 2]
+        assert len(transport.sent) == 3
+
+    def test_transient_failure_is_retried(self):
+        transport = push_dispatcher.FakePushTransport(fail_next=2)
+        d = _dispatcher(transport, max_retries=3)
+        d.enqueue(["a"], "t", "b")
+        assert d.flush() == 1
+        assert d.stats()["retries_total"] == 2
+
+    def test_gives_up_after_max_retries(self):
+        transport = push_dispatcher.FakePushTransport(fail_next=5)
+        d = _dispatcher(transport, max_retries=1)
+        d.enqueue(["a"], "t", "b")
+        assert d.flush() == 0
+        assert d.stats()["failed_total"] == 1
+
+    def test_invalid_tokens_are_cleared(self, registered_user):
+        user_data, _ = registered_user
+        token = f"dead-{uuid.uuid4().hex[:8]}"
+        _set_token(user_data["email"], token)
+
+        d = _dispatcher(push_dispatcher.FakePushTransport(invalid_tokens=[token]))
+        d.enqueue([token, "live"], "t", "b")
+        assert d.flush() == 1
+        assert _token_of(user_data["email"]) is None
+        assert d.stats()["invalid_tokens_pruned_total"] == 1
+
+    def test_full_queue_drops(self):
+        d = _dispatcher(push_dispatcher.FakePushTransport(), max_jobs=1)
+        assert d.enqueue(["a"], "t", "b") == push_dispatcher.QUEUED
+        assert d.enqueue(["b"], "t", "b") == push_dispatcher.DROPPED
+        assert d.enqueue([None], "t", "b") == push_dispatcher.SKIPPED
+        assert d.stats()["dropped_total"] == 1
+
+    def test_full_chunk_wakes_flusher(self):
+        transport = push_dispatcher.FakePushTransport()
+        d = _dispatcher(transport, batch_size=2, flush_interval_ms=60_000)
+
+        async def go():
+            await d.start()
+            try:
+                # Handlers enqueue from the threadpool, not the loop thread
+                await asyncio.to_thread(d.enqueue, ["a"], "t", "b")
+                await asyncio.sleep(0.1)
+                assert transport.sent == []
+                await asyncio.to_thread(d.enqueue, ["b"], "t", "b")
+                for _ in range(100):
+                    if transport.sent:
+                        break
+                    await asyncio.sleep(0.02)
+                return len(transport.sent)
+            finally:
+                await d.stop()
+
+        # Sent long before the 60 s interval, by the flusher rather than stop()
+        assert asyncio.run(go()) == 1
+
+
+# ════════════════════════════════════════════════
+# ADMIN BROADCAST
+# ════════════════════════════════════════════════
+
+@pytest.fixture
+def admin_headers(client):
+    payload = {
+        "email": f"admin_{uuid.uuid4().hex[:8]}@buyv.io",
+        "password": "AdminPass123!",
+        "username": f"admin_{uuid.uuid4().hex[:8]}",
+        "displayName": "Push Admin",
+    }
+    resp = client.post("/auth/register", json=payload)
+    assert resp.status_code == 200
+    db = TestSessionLocal()
+    db.query(User).filter(User.email == payload["email"]).update({"role": "admin"})
+    db.commit()
+    db.close()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+class TestAdminBroadcast:
+    def test_targeted_send_inserts_rows_and_pushes_once(self, client, admin_headers, registered_user, fake_push):
+        user_data, reg = registered_user
+        uid = client.get("/auth/me", headers={"Authorization": f"Bearer {reg['access_token']}"}).json()["id"]
+        token = f"tok-{uuid.uuid4().hex[:8]}"
+        _set_token(user_data["email"], token)
+        title = f"News {uuid.uuid4().hex[:6]}"
+
+        resp = client.post("/api/admin/notifications/send", headers=admin_headers, json={
+            "title": title, "body": "Hello", "target_user_uids": [uid],
+        })
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["count"] == 1
+
+        db = TestSessionLocal()
+        try:
+            assert db.query(Notification).filter(Notification.title == title).count() == 1
+        finally:
+            db.close()
+
+        push_dispatcher.dispatcher.flush()
+        assert [s["tokens"] for s in fake_push.sent if s["title"] == title] == [[token]]
+
+
+# ════════════════════════════════════════════════
+# INBOX
+# ════════════════════════════════════════════════
+
+def _notify(client, headers, n):
+    ids = []
+    for i in range(n):
+        resp = client.post("/notifications/", headers=headers, json={
+            "userId": "", "title": f"N{i}", "body": "b", "type": "general",
+        })
+        assert resp.status_code == 200, resp.text
+        ids.append(resp.json()["id"])
+    return ids
+
+
+def _unread(client, headers):
+    resp = client.get("/notifications/unread-count", headers=headers)
+    assert resp.status_code == 200
+    return resp.json()["unread_count"]
+
+
+class TestInbox:
+    def test_cursor_pages_cover_inbox_once(self, client, auth_headers):
+        ids = _notify(client, auth_headers, 5)
+
+        first = client.get("/notifications/me?limit=2", headers=auth_headers)
+        cursor = first.headers["X-Next-Cursor"]
+        second = client.get(f"/notifications/me?limit=2&cursor={cursor}", headers=auth_headers)
+        third = client.get(
+            f"/notifications/me?limit=2&cursor={second.headers['X-Next-Cursor']}", headers=auth_headers
+        )
+        seen = [n["id"] for page in (first, second, third) for n in page.json()]
+        assert seen == list(reversed(ids))
+        assert "X-Next-Cursor" not in third.headers
+
+    def test_unread_count_follows_reads_and_deletes(self, client, auth_headers):
+        ids = _notify(client, auth_headers, 3)
+        assert _unread(client, auth_headers) == 3
+
+        client.post(f"/notifications/{ids[0]}/read", headers=auth_headers)
+        client.post(f"/notifications/{ids[0]}/read", headers=auth_headers)
+        assert _unread(client, auth_headers) == 2
+
+        client.delete(f"/notifications/{ids[1]}", headers=auth_headers)
+        assert _unread(client, auth_headers) == 1
+
+        client.delete("/notifications/", headers=auth_headers)
+        assert _unread(client, auth_headers) == 0
+
+    def test_mark_all_read(self, client, auth_headers):
+        _notify(client, auth_headers, 3)
+        resp = client.post("/notifications/read-all", headers=auth_headers)
+        assert resp.json()["updated"] == 3
+        assert _unread(client, auth_headers) == 0
+        unread = client.get("/notifications/me?unread_only=true", headers=auth_headers).json()
+        assert unread == []
+
+    def test_mark_read_up_to_cursor(self, client, auth_headers):
+        ids = _notify(client, auth_headers, 4)
+        page = client.get("/notifications/me?limit=2", headers=auth_headers)
+        resp = client.post(
+            f"/notifications/read-all?cursor={page.headers['X-Next-Cursor']}", headers=auth_headers
+        )
+        assert resp.json()["updated"] == 2
+        assert _unread(client, auth_headers) == 2
+        unread = client.get("/notifications/me?unread_only=true", headers=auth_headers).json()
+        assert sorted(n["id"] for n in unread) == ids[:2]
+
+
+# ════════════════════════════════════════════════
+# AUTH USER CACHE
+# ════════════════════════════════════════════════
+
+def _cached_user(uid):
+    db = TestSessionLocal()
+    try:
+        auth_cache.get_user(db, uid)
+    finally:
+        db.close()
+    return auth_cache._users.get(uid)
+
+
+class TestAuthCacheEviction:
+    def test_unread_counter_update_evicts_on_commit(self, registered_user):
+        uid = registered_user[1]["user"]["id"]
+        assert _cached_user(uid) is not None
+
+        db = TestSessionLocal()
+        user_id = db.query(User.id).filter(User.uid == uid).scalar()
+        adjust_unread_count(db, [user_id], 1)
+        db.rollback()
+        assert auth_cache._users.get(uid) is not None
+
+        adjust_unread_count(db, [user_id], 1)
+        assert auth_cache._users.get(uid) is not None  # not before the commit
+        db.commit()
+        db.close()
+        assert auth_cache._users.get(uid) is None
+
+    def test_orm_user_edit_evicts_on_commit_not_flush(self, registered_user):
+        uid = registered_user[1]["user"]["id"]
+        assert _cached_user(uid) is not None
+
+        db = TestSessionLocal()
+        user = db.query(User).filter(User.uid == uid).one()
+        user.following_count = (user.following_count or 0) + 1
+        db.flush()
+        assert auth_cache._users.get(uid) is not None  # not before the commit
+        db.commit()
+        db.close()
+        assert auth_cache._users.get(uid) is None
+
+    def test_pruned_token_evicts_cached_user(self, registered_user):
+        user_data, tokens = registered_user
+        token = f"dead-{uuid.uuid4().hex[:8]}"
+        _set_token(user_data["email"], token)
+        assert _cached_user(tokens["user"]["id"])["fcm_token"] == token
+
+        d = _dispatcher(push_dispatcher.FakePushTransport(invalid_tokens=[token]))
+        d.enqueue([token], "t", "b")
+        d.flush()
+        assert auth_cache._users.get(tokens["user"]["id"]) is None
@@ -3,7 +3,7 @@ BuyV Backend — Orders Endpoint Tests
 
 Covers:
   - POST /orders (create order)
-  - GET  /orders/me (list my orders)
+  - GET  /orders/me (list my orders, constant query count)
   - GET  /orders/{id} (get order detail)
   - POST /orders/{id}/cancel
   - PATCH /orders/{id}/status (admin-only — H-4)
@@ -92,6 +92,36 @@ class TestListOrders:
         resp = client.get("/orders/me")
         assert resp.status_code == 401
 
+    def test_list_orders_query_count_independent_of_page_size(self, client, auth_headers, monkeypatch):
+        """Items are selectin-loaded: listing 5 orders costs the same as listing 1."""
+        from sqlalchemy import event
+        import app.auth_cache
+        from tests.conftest import test_engine
+
+        monkeypatch.setattr(app.auth_cache, "AUTH_REVOCATION_SYNC_SECONDS", 3600)
+        statements = []
+
+        def _count(*args, **kwargs):
+            statements.append(1)
+
+        def _list_and_count():
+            statements.clear()
+            event.listen(test_engine, "before_cursor_execute", _count)
+            try:
+                assert client.get("/orders/me", headers=auth_headers).status_code == 200
+            finally:
+                event.remove(test_engine, "before_cursor_execute", _count)
+            return len(statements)
+
+        client.post("/orders", json=_create_order_payload(), headers=auth_headers)
+        _list_and_count()  # warm the auth caches
+        one = _list_and_count()
+        for _ in range(4):
+            client.post("/orders", json=_create_order_payload(), headers=auth_headers)
+        _list_and_count()
+        five = _list_and_count()
+        assert five == one
+
 
 # ════════════════════════════════════════════════
 # GET ORDER DETAIL
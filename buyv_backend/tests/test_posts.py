@@ -0,0 +1,201 @@
+"""
+BuyV Backend — Posts Endpoint Tests
+
+Covers:
+  - GET /posts/feed offset paging (legacy clients)
+  - GET /posts/feed cursor paging via X-Next-Cursor
+  - GET /posts/feed/following (fan-out-on-write + fan-out-on-read)
+  - POST /posts/state and GET /posts/{uid}: batched like / bookmark state
+  - like / bookmark / comment-like writes: idempotent, counters moved in SQL
+"""
+import pytest
+import uuid
+
+
+# ── Helper ──────────────────────────────────────────────
+def _create_post(client, headers, caption=None):
+    resp = client.post("/posts/", headers=headers, json={
+        "type": "reel",
+        "mediaUrl": f"https://cdn.buyv.io/reels/{uuid.uuid4().hex}.mp4",
+        "caption": caption or f"reel {uuid.uuid4().hex[:6]}",
+    })
+    assert resp.status_code == 200, f"Create post failed: {resp.text}"
+    return resp.json()
+
+
+def _uid(client, headers):
+    return client.get("/auth/me", headers=headers).json()["id"]
+
+
+def _follow(client, headers, follower_uid, followed_uid):
+    resp = client.post(f"/users/{follower_uid}/follow/{followed_uid}", headers=headers)
+    assert resp.status_code == 200, resp.text
+
+
+# ════════════════════════════════════════════════
+# FEED PAGINATION
+# ════════════════════════════════════════════════
+
+class TestFeedPagination:
+    def test_offset_paging_still_works(self, client, auth_headers):
+        for _ in range(3):
+            _create_post(client, auth_headers)
+        resp = client.get("/posts/feed?limit=2&offset=1")
+        assert resp.status_code == 200
+        assert len(resp.json()) == 2
+
+    def test_cursor_paging_walks_feed_without_duplicates(self, client, auth_headers):
+        for _ in range(5):
+            _create_post(client, auth_headers)
+
+        first = client.get("/posts/feed?limit=2")
+        assert first.status_code == 200
+        cursor = first.headers.get("X-Next-Cursor")
+        assert cursor, "Full page should carry a next cursor"
+
+        seen = [p["id"] for p in first.json()]
+        # A reel posted mid-scroll must not shift the next page
+        _create_post(client, auth_headers)
+
+        second = client.get(f"/posts/feed?limit=2&cursor={cursor}")
+        assert second.status_code == 200
+        second_ids = [p["id"] for p in second.json()]
+        assert len(second_ids) == 2
+        assert not set(second_ids) & set(seen)
+
+    def test_cursor_pages_are_newest_first(self, client, auth_headers):
+        for _ in range(3):
+            _create_post(client, auth_headers)
+        first = client.get("/posts/feed?limit=1")
+        second = client.get(f"/posts/feed?limit=1&cursor={first.headers['X-Next-Cursor']}")
+        assert first.json()[0]["createdAt"] >= second.json()[0]["createdAt"]
+
+    def test_invalid_cursor_rejected(self, client):
+        resp = client.get("/posts/feed?cursor=not-a-cursor")
+        assert resp.status_code == 400
+
+
+# ════════════════════════════════════════════════
+# FOLLOWING FEED
+# ════════════════════════════════════════════════
+
+class TestFollowingFeed:
+    def test_requires_auth(self, client):
+        assert client.get("/posts/feed/following").status_code == 401
+
+    def test_new_post_reaches_follower_inbox(self, client, auth_headers, second_user_headers):
+        me, author = _uid(client, auth_headers), _uid(client, second_user_headers)
+        _follow(client, auth_headers, me, author)
+        post = _create_post(client, second_user_headers)
+
+        resp = client.get("/posts/feed/following", headers=auth_headers)
+        assert resp.status_code == 200
+        assert [p["id"] for p in resp.json()] == [post["id"]]
+
+    def test_follow_backfills_and_unfollow_removes(self, client, auth_headers, second_user_headers):
+        me, author = _uid(client, auth_headers), _uid(client, second_user_headers)
+        older = _create_post(client, second_user_headers)
+        _follow(client, auth_headers, me, author)
+        assert older["id"] in [p["id"] for p in client.get("/posts/feed/following", headers=auth_headers).json()]
+
+        client.delete(f"/users/{me}/unfollow/{author}", headers=auth_headers)
+        assert client.get("/posts/feed/following", headers=auth_headers).json() == []
+
+    def test_large_accounts_are_merged_at_read_time(self, client, auth_headers, second_user_headers, monkeypatch):
+        import app.feed
+        monkeypatch.setattr(app.feed, "FEED_FANOUT_MAX_FOLLOWERS", 0)
+        me, author = _uid(client, auth_headers), _uid(client, second_user_headers)
+        _follow(client, auth_headers, me, author)
+        posts = [_create_post(client, second_user_headers) for _ in range(3)]
+
+        first = client.get("/posts/feed/following?limit=2", headers=auth_headers)
+        second = client.get(
+            f"/posts/feed/following?limit=2&cursor={first.headers['X-Next-Cursor']}",
+            headers=auth_headers,
+        )
+        ids = [p["id"] for p in first.json() + second.json()]
+        assert ids == [p["id"] for p in reversed(posts)]
+
+
+# ════════════════════════════════════════════════
+# INTERACTION STATE
+# ════════════════════════════════════════════════
+
+class TestInteractionState:
+    def test_batch_state_for_posts_and_products(self, client, auth_headers, promoted_products):
+        _, pairs = promoted_products
+        (product_id, product_post), (_, liked_post), (_, saved_post) = pairs[:3]
+        client.post(f"/posts/{product_post}/like", headers=auth_headers)
+        client.post(f"/posts/{liked_post}/like", headers=auth_headers)
+        client.post(f"/posts/{saved_post}/bookmark", headers=auth_headers)
+
+        resp = client.post("/posts/state", headers=auth_headers, json={
+            "postUids": [liked_post, saved_post, "missing"],
+            "productIds": [product_id, str(uuid.uuid4())],
+        })
+        assert resp.status_code == 200, resp.text
+        body = resp.json()
+        assert set(body["posts"]) == {liked_post, saved_post}
+        assert body["posts"][liked_post] == {"isLiked": True, "isBookmarked": False, "likesCount": 1, "commentsCount": 0}
+        assert body["posts"][saved_post]["isBookmarked"] is True
+        assert body["products"] == {product_id: {
+            "postUid": product_post, "isLiked": True, "isBookmarked": False, "postLikesCount": 1,
+        }}
+
+    def test_get_post_includes_bookmark_state(self, client, auth_headers):
+        post = _create_post(client, auth_headers)
+        client.post(f"/posts/{post['id']}/bookmark", headers=auth_headers)
+        body = client.get(f"/posts/{post['id']}", headers=auth_headers).json()
+        assert (body["isLiked"], body["isBookmarked"]) == (False, True)
+
+    def test_requires_auth_and_bounded(self, client, auth_headers):
+        assert client.post("/posts/state", json={"postUids": []}).status_code in (401, 403)
+        resp = client.post("/posts/state", headers=auth_headers, json={"postUids": ["x"] * 101})
+        assert resp.status_code == 422
+
+
+# ════════════════════════════════════════════════
+# LIKE / BOOKMARK WRITES
+# ════════════════════════════════════════════════
+
+class TestInteractionWrites:
+    def _state(self, client, headers, post_uid):
+        return client.post("/posts/state", headers=headers, json={"postUids": [post_uid]}).json()["posts"][post_uid]
+
+    def test_like_and_unlike_are_idempotent(self, client, auth_headers, second_user_headers):
+        post = _create_post(client, auth_headers)
+        url = f"/posts/{post['id']}/like"
+        assert client.post(url, headers=auth_headers).json() == {"status": "liked"}
+        assert client.post(url, headers=auth_headers).json() == {"status": "already_liked"}
+        assert client.post(url, headers=second_user_headers).json() == {"status": "liked"}
+        assert self._state(client, auth_headers, post["id"])["likesCount"] == 2
+
+        assert client.delete(url, headers=auth_headers).json() == {"status": "unliked"}
+        assert client.delete(url, headers=auth_headers).json() == {"status": "not_liked"}
+        state = self._state(client, auth_headers, post["id"])
+        assert (state["isLiked"], state["likesCount"]) == (False, 1)
+
+    def test_bookmark_is_idempotent(self, client, auth_headers):
+        post = _create_post(client, auth_headers)
+        url = f"/posts/{post['id']}/bookmark"
+        assert client.post(url, headers=auth_headers).json() == {"status": "bookmarked"}
+        assert client.post(url, headers=auth_headers).json() == {"status": "already_bookmarked"}
+        assert client.delete(url, headers=auth_headers).json() == {"status": "unbookmarked"}
+        assert client.delete(url, headers=auth_headers).json() == {"status": "not_bookmarked"}
+
+    @pytest.mark.parametrize("method", ["post", "delete"])
+    @pytest.mark.parametrize("action", ["like", "bookmark"])
+    def test_missing_post_is_404(self, client, auth_headers, method, action):
+        resp = getattr(client, method)(f"/posts/missing-{uuid.uuid4().hex}/{action}", headers=auth_headers)
+        assert resp.status_code == 404
+
+    def test_comment_like_toggle(self, client, auth_headers, second_user_headers):
+        post = _create_post(client, auth_headers)
+        comment = client.post(f"/comments/{post['id']}", headers=auth_headers, json={"content": "nice"}).json()
+        url = f"/comments/{post['id']}/{comment['id']}/like"
+
+        assert client.post(url, headers=auth_headers).json() == {"is_liked": True, "likes_count": 1}
+        assert client.post(url, headers=second_user_headers).json() == {"is_liked": True, "likes_count": 2}
+        assert client.post(url, headers=auth_headers).json() == {"is_liked": False, "likes_count": 1}
+        assert client.post(f"/comments/{post['id']}/999999999/like", headers=auth_headers).status_code == 404
+        assert client.post(f"/comments/missing/{comment['id']}/like", headers=auth_headers).status_code == 404
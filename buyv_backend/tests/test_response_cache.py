@@ -0,0 +1,113 @@
+"""
+BuyV Backend — Public Catalog Response Cache Tests
+
+Covers:
+  - cached bodies are served as stored bytes with an ETag; If-None-Match -> 304
+  - invalidate() drops entries, including one built before the invalidation
+  - GET /api/sounds/genres and /api/v1/marketplace/categories are cached and
+    invalidated by sound / category writes
+  - GET /api/v1/marketplace/products/featured keeps is_liked per user
+"""
+import uuid
+from typing import List
+
+from fastapi import Request
+
+from app import response_cache
+from app.marketplace.models import MarketplaceProduct, ProductCategory
+from app.models import Sound
+from app.response_cache import ResponseCache
+from tests.conftest import TestSessionLocal
+
+
+def _request(headers=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw, "query_string": b""})
+
+
+class TestResponseCache:
+
+    def test_hit_skips_build_and_supports_etag(self):
+        cache = ResponseCache(ttl_seconds=60, max_entries=10)
+        calls = []
+
+        def build():
+            calls.append(1)
+            return ["pop", "rock"]
+
+        first = cache.get_or_build(_request(), "genres", {}, List[str], build)
+        second = cache.get_or_build(_request(), "genres", {}, List[str], build)
+        assert first.body == second.body == b'["pop","rock"]'
+        assert len(calls) == 1
+
+        etag = second.headers["etag"]
+        assert cache.get_or_build(_request({"If-None-Match": etag}), "genres", {}, List[str], build).status_code == 304
+
+    def test_invalidate_discards_entries_built_before_it(self):
+        cache = ResponseCache(ttl_seconds=60, max_entries=10)
+        key, entry = cache.lookup("genres", {})
+        assert entry is None
+        cache.invalidate("genres")  # admin write lands while the old body is built
+        cache.store(key, List[str], ["stale"])
+        assert cache.lookup("genres", {})[1] is None
+
+    def test_params_are_part_of_the_key(self):
+        cache = ResponseCache(ttl_seconds=60, max_entries=10)
+        cache.get_or_build(_request(), "trending", {"limit": 5}, List[int], lambda: [1])
+        assert cache.lookup("trending", {"limit": 10})[1] is None
+        assert cache.lookup("trending", {"limit": 5})[1] is not None
+
+
+class TestCachedCatalogEndpoints:
+
+    def test_sound_genres_cached_until_sound_write(self, client):
+        genre = f"genre-{uuid.uuid4().hex[:6]}"
+        before = client.get("/api/sounds/genres").json()
+        assert genre not in before
+
+        db = TestSessionLocal()
+        sound = Sound(title="T", artist="A", audio_url="https://cdn.test/g.aac", duration=3.0, genre=genre)
+        db.add(sound)
+        db.commit()
+        assert genre not in client.get("/api/sounds/genres").json()  # still cached
+
+        response_cache.cache.invalidate(response_cache.SOUND_GENRES)  # what the admin endpoints call
+        assert genre in client.get("/api/sounds/genres").json()
+        db.delete(sound)
+        db.commit()
+        db.close()
+
+    def test_categories_cached_with_etag(self, client):
+        resp = client.get("/api/v1/marketplace/categories")
+        assert resp.status_code == 200
+        assert client.get("/api/v1/marketplace/categories",
+                          headers={"If-None-Match": resp.headers["etag"]}).status_code == 304
+
+        db = TestSessionLocal()
+        slug = f"cat-{uuid.uuid4().hex[:6]}"
+        db.add(ProductCategory(name="Cached", slug=slug))
+        db.commit()
+        db.close()
+        response_cache.cache.invalidate(response_cache.CATEGORIES)
+        body = client.get("/api/v1/marketplace/categories").json()
+        assert slug in [c["slug"] for c in body]
+
+    def test_featured_is_liked_per_user(self, client, auth_headers, second_user_headers, promoted_products):
+        _, pairs = promoted_products
+        product_id, post_uid = pairs[0]
+        db = TestSessionLocal()
+        product = db.get(MarketplaceProduct, uuid.UUID(product_id))
+        product.is_featured, product.total_sales = True, 10**6
+        db.commit()
+        db.close()
+        response_cache.cache.invalidate(response_cache.FEATURED_PRODUCTS)
+        assert client.post(f"/posts/{post_uid}/like", headers=auth_headers).status_code == 200
+
+        def liked(headers):
+            items = client.get("/api/v1/marketplace/products/featured", params={"limit": 1},
+                               headers=headers).json()
+            return {item["post_uid"]: item["is_liked"] for item in items}
+
+        assert liked({}) == {post_uid: False}
+        assert liked(auth_headers) == {post_uid: True}
+        assert liked(second_user_headers) == {post_uid: False}
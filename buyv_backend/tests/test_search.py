@@ -0,0 +1,117 @@
+"""
+BuyV Backend — Search Tests
+
+Covers:
+  - Search backend selection (FTS5 on the SQLite test DB)
+  - GET /posts/search substring match, relevance, index kept in sync on delete / caption edit
+  - GET /users/search short-query fallback
+  - GET /search unified results + type filter validation
+"""
+import pytest
+import uuid
+
+from sqlalchemy import text
+
+from app import search_index
+from tests.conftest import TestSessionLocal
+
+
+def _create_post(client, headers, caption):
+    resp = client.post("/posts/", headers=headers, json={
+        "type": "reel",
+        "mediaUrl": f"https://cdn.buyv.io/reels/{uuid.uuid4().hex}.mp4",
+        "caption": caption,
+    })
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+# ════════════════════════════════════════════════
+# BACKEND
+# ════════════════════════════════════════════════
+
+class TestSearchBackend:
+    def test_sqlite_uses_fts5(self, client):
+        db = TestSessionLocal()
+        try:
+            assert search_index.get_backend(db).name == "sqlite_fts5"
+        finally:
+            db.close()
+
+
+# ════════════════════════════════════════════════
+# ENTITY SEARCH
+# ════════════════════════════════════════════════
+
+class TestPostSearch:
+    def test_substring_match(self, client, auth_headers):
+        token = uuid.uuid4().hex[:10]
+        post = _create_post(client, auth_headers, f"summer haul #{token}sale")
+        resp = client.get(f"/posts/search?q={token[2:8]}")
+        assert resp.status_code == 200
+        assert post["id"] in [p["id"] for p in resp.json()]
+
+    def test_all_terms_required_and_ranked(self, client, auth_headers):
+        token = uuid.uuid4().hex[:8]
+        both = _create_post(client, auth_headers, f"{token} red sneakers")
+        _create_post(client, auth_headers, f"{token} blue jacket")
+        resp = client.get(f"/posts/search?q={token} sneakers")
+        assert [p["id"] for p in resp.json()] == [both["id"]]
+
+    def test_deleted_post_leaves_index(self, client, auth_headers):
+        token = uuid.uuid4().hex[:10]
+        post = _create_post(client, auth_headers, f"gone {token}")
+        assert client.delete(f"/posts/{post['id']}", headers=auth_headers).status_code == 200
+        assert client.get(f"/posts/search?q={token}").json() == []
+
+    def test_only_text_updates_reindex(self, client, auth_headers):
+        db = TestSessionLocal()
+        try:
+            trigger = db.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'posts_fts_au'"
+            )).scalar()
+            assert "AFTER UPDATE OF caption ON posts" in trigger
+
+            old, new = uuid.uuid4().hex[:10], uuid.uuid4().hex[:10]
+            post = _create_post(client, auth_headers, f"edit {old}")
+            db.execute(text("UPDATE posts SET likes_count = 5 WHERE uid = :uid"), {"uid": post["id"]})
+            db.execute(text("UPDATE posts SET caption = :c WHERE uid = :uid"), {"c": f"edit {new}", "uid": post["id"]})
+            db.commit()
+        finally:
+            db.close()
+        assert client.get(f"/posts/search?q={old}").json() == []
+        assert [p["id"] for p in client.get(f"/posts/search?q={new}").json()] == [post["id"]]
+
+
+class TestUserSearch:
+    def test_short_query_falls_back_to_like(self, client, registered_user):
+        user_data, _ = registered_user
+        resp = client.get(f"/users/search?q={user_data['username'][:2]}")
+        assert resp.status_code == 200
+        assert len(resp.json()) >= 1
+
+
+# ════════════════════════════════════════════════
+# UNIFIED SEARCH
+# ════════════════════════════════════════════════
+
+class TestUnifiedSearch:
+    def test_mixed_results(self, client, auth_headers, registered_user):
+        user_data, _ = registered_user
+        token = user_data["username"]
+        _create_post(client, auth_headers, f"outfit by {token}")
+
+        resp = client.get(f"/search?q={token}")
+        assert resp.status_code == 200
+        body = resp.json()
+        assert set(body) == {"posts", "users", "products", "sounds"}
+        assert body["posts"] and body["users"]
+        assert body["users"][0]["username"] == token
+
+    def test_types_filter(self, client):
+        resp = client.get("/search?q=anything&types=users")
+        assert resp.status_code == 200
+        assert resp.json()["posts"] == []
+
+    def test_unknown_type_rejected(self, client):
+        assert client.get("/search?q=x&types=videos").status_code == 400
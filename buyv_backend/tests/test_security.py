@@ -78,7 +78,7 @@ class TestTrackingSecurity:
             "product_id": "test-product",
         })
         # Should succeed — auth is optional for view/click
-        assert resp.status_code in (200, 201, 422, 500)
+        assert resp.status_code in (200, 201, 202, 422, 500)
 
     def test_tracking_conversion_without_auth(self, client):
         """Conversion tracking should REQUIRE auth after C-6 fix."""
@@ -0,0 +1,184 @@
+"""
+BuyV Backend — Tracking Ingest Tests
+
+Covers:
+  - POST /api/marketplace/track/view (202, buffered, in-memory dedup)
+  - POST /api/marketplace/track/click (202, buffered)
+  - POST /api/marketplace/track/conversion sees clicks still in the buffer
+  - Queue back-pressure (drop + counter) and GET /health/tracking
+  - Failed batch writes are requeued and retried before being dropped
+  - GET /api/marketplace/analytics/promoter/{uid} from daily rollups + raw tail
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+
+from app import tracking_ingest, analytics_rollup
+from app.models import ReelView, AffiliateClick
+from tests.conftest import TestSessionLocal
+
+
+def _count(model, **filters):
+    db = TestSessionLocal()
+    try:
+        return db.query(model).filter_by(**filters).count()
+    finally:
+        db.close()
+
+
+# ════════════════════════════════════════════════
+# VIEWS & CLICKS
+# ════════════════════════════════════════════════
+
+class TestTrackIngest:
+    def test_view_accepted_then_flushed(self, client):
+        reel = f"reel-{uuid.uuid4().hex[:8]}"
+        resp = client.post("/api/marketplace/track/view", json={
+            "reel_id": reel, "promoter_uid": "promoter-1",
+        })
+        assert resp.status_code == 202
+        assert resp.json()["success"] is True
+
+        tracking_ingest.queue.flush()
+        assert _count(ReelView, reel_id=reel) == 1
+
+    def test_duplicate_view_in_window_is_collapsed(self, client):
+        reel = f"reel-{uuid.uuid4().hex[:8]}"
+        body = {"reel_id": reel, "promoter_uid": "promoter-1", "viewer_uid": "viewer-1", "session_id": "s-1"}
+        client.post("/api/marketplace/track/view", json=body)
+        second = client.post("/api/marketplace/track/view", json=body)
+        assert second.json()["message"] == "View already tracked"
+
+        tracking_ingest.queue.flush()
+        assert _count(ReelView, reel_id=reel) == 1
+
+    def test_click_accepted_then_flushed(self, client):
+        reel = f"reel-{uuid.uuid4().hex[:8]}"
+        resp = client.post("/api/marketplace/track/click", json={
+            "reel_id": reel, "product_id": "p-1", "promoter_uid": "promoter-1",
+        })
+        assert resp.status_code == 202
+        tracking_ingest.queue.flush()
+        assert _count(AffiliateClick, reel_id=reel) == 1
+
+    def test_conversion_sees_buffered_click(self, client, auth_headers):
+        session_id = f"sess-{uuid.uuid4().hex[:8]}"
+        client.post("/api/marketplace/track/click", json={
+            "reel_id": "reel-conv", "product_id": "p-1",
+            "promoter_uid": "promoter-1", "session_id": session_id,
+        })
+        resp = client.post("/api/marketplace/track/conversion", headers=auth_headers, json={
+            "order_id": 999999, "click_session_id": session_id,
+        })
+        assert resp.status_code == 200
+        assert resp.json()["success"] is True
+
+
+# ════════════════════════════════════════════════
+# BACK-PRESSURE & METRICS
+# ════════════════════════════════════════════════
+
+class TestTrackIngestMetrics:
+    def test_full_queue_drops_and_counts(self):
+        q = tracking_ingest.TrackingIngestQueue(max_events=1)
+        event = {"reel_id": "r", "promoter_uid": "p"}
+        assert q.enqueue_click(dict(event)) == tracking_ingest.QUEUED
+        assert q.enqueue_click(dict(event)) == tracking_ingest.DROPPED
+        stats = q.stats()
+        assert stats["queue_depth"] == 1
+        assert stats["dropped_total"] == 1
+
+    def test_view_dropped_on_full_queue_is_not_a_duplicate(self):
+        q = tracking_ingest.TrackingIngestQueue(max_events=1)
+        q.enqueue_click({"reel_id": "r", "promoter_uid": "p"})
+        view = {"reel_id": "r", "promoter_uid": "p", "viewer_uid": "v", "session_id": "s"}
+        assert q.enqueue_view(dict(view)) == tracking_ingest.DROPPED
+        q._buffer.clear()
+        assert q.enqueue_view(dict(view)) == tracking_ingest.QUEUED
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        def broken_session():
+            raise RuntimeError("database unavailable")
+
+        q = tracking_ingest.TrackingIngestQueue(max_retries=2, retry_backoff_ms=0, session_factory=broken_session)
+        for i in range(3):
+            q.enqueue_click({"reel_id": f"r{i}", "promoter_uid": "p"})
+
+        for attempt in range(2):
+            assert q.flush() == 0
+            assert [e["reel_id"] for _, e in q._buffer] == ["r0", "r1", "r2"]
+        assert q.stats()["retries_total"] == 2
+
+        assert q.flush() == 0
+        stats = q.stats()
+        assert (stats["queue_depth"], stats["failed_total"]) == (0, 3)
+
+    def test_health_endpoint_exposes_queue_stats(self, client):
+        resp = client.get("/health/tracking")
+        assert resp.status_code == 200
+        for key in ("queue_depth", "dropped_total", "last_flush_ms", "flushed_total"):
+            assert key in resp.json()
+
+
+# ════════════════════════════════════════════════
+# PROMOTER ANALYTICS ROLLUPS
+# ════════════════════════════════════════════════
+
+def _seed(rows):
+    db = TestSessionLocal()
+    db.add_all(rows)
+    db.commit()
+    db.close()
+
+
+def _compact():
+    db = TestSessionLocal()
+    try:
+        analytics_rollup.compact_promoter_rollups(db)
+    finally:
+        db.close()
+
+
+class TestPromoterAnalytics:
+    def test_rollups_plus_tail(self, client, auth_headers):
+        uid = client.get("/auth/me", headers=auth_headers).json()["id"]
+        now = datetime.utcnow()
+        _seed([
+            ReelView(reel_id="r-old", promoter_uid=uid, created_at=now - timedelta(days=3)),
+            ReelView(reel_id="r-old-2", promoter_uid=uid, created_at=now - timedelta(days=3)),
+            AffiliateClick(reel_id="r-old", product_id="p", promoter_uid=uid,
+                           created_at=now - timedelta(days=3), converted=True),
+        ])
+        _compact()
+        _seed([ReelView(reel_id="r-today", promoter_uid=uid, created_at=now)])
+
+        resp = client.get(f"/api/marketplace/analytics/promoter/{uid}?days=7&series=true", headers=auth_headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["metrics"]["views"] == 3
+        assert body["metrics"]["clicks"] == 1
+        assert body["metrics"]["conversions"] == 1
+
+        daily = {d["date"]: d for d in body["daily"]}
+        assert len(daily) == 8
+        assert daily[(now - timedelta(days=3)).date().isoformat()]["views"] == 2
+        assert daily[now.date().isoformat()]["views"] == 1
+
+    def test_window_excludes_older_days(self, client, auth_headers):
+        uid = client.get("/auth/me", headers=auth_headers).json()["id"]
+        _seed([ReelView(reel_id="r-ancient", promoter_uid=uid, created_at=datetime.utcnow() - timedelta(days=40))])
+        _compact()
+        resp = client.get(f"/api/marketplace/analytics/promoter/{uid}?days=30", headers=auth_headers)
+        assert resp.json()["metrics"]["views"] == 0
+
+    def test_conversion_of_compacted_click_updates_rollup(self, client, auth_headers):
+        uid = client.get("/auth/me", headers=auth_headers).json()["id"]
+        session_id = f"sess-{uuid.uuid4().hex[:8]}"
+        _seed([AffiliateClick(reel_id="r", product_id="p", promoter_uid=uid, session_id=session_id,
+                              created_at=datetime.utcnow() - timedelta(days=2), converted=False)])
+        _compact()
+        client.post("/api/marketplace/track/conversion", headers=auth_headers, json={
+            "order_id": 999999, "click_session_id": session_id,
+        })
+        resp = client.get(f"/api/marketplace/analytics/promoter/{uid}", headers=auth_headers)
+        assert resp.json()["metrics"]["conversions"] == 1
@@ -0,0 +1,82 @@
+"""
+BuyV Backend — Withdrawal API Tests (async DB session)
+
+Covers:
+  - POST /api/marketplace/withdrawal/request moves funds from available to pending
+  - a second request is refused while one is pending; balance is checked
+  - GET  /api/marketplace/withdrawal/history and /stats
+  - GET  /cleanup/check-invalid-posts requires admin
+"""
+import pytest
+
+from app.models import PromoterWallet
+from tests.conftest import TestSessionLocal
+
+PAYPAL = {"amount": 60, "payment_method": "paypal", "payment_details": {"email": "me@paypal.test"}}
+
+
+@pytest.fixture
+def funded_promoter(registered_user, auth_headers):
+    """The auth_headers user with a wallet holding 100.00 available."""
+    uid = registered_user[1]["user"]["id"]
+    db = TestSessionLocal()
+    db.add(PromoterWallet(user_id=uid, available_amount=100.0, pending_amount=0.0,
+                          total_earned=100.0, withdrawn_amount=0.0))
+    db.commit()
+    db.close()
+    return uid
+
+
+def _wallet(uid):
+    db = TestSessionLocal()
+    try:
+        return db.query(PromoterWallet).filter(PromoterWallet.user_id == uid).first()
+    finally:
+        db.close()
+
+
+class TestWithdrawalRequests:
+
+    def test_request_moves_funds_to_pending(self, client, auth_headers, funded_promoter):
+        resp = client.post("/api/marketplace/withdrawal/request", json=PAYPAL, headers=auth_headers)
+        assert resp.status_code == 200, resp.text
+        body = resp.json()
+        assert body["status"] == "pending"
+        assert body["payment_details"] == PAYPAL["payment_details"]
+
+        wallet = _wallet(funded_promoter)
+        assert wallet.available_amount == 40.0
+        assert wallet.pending_amount == 60.0
+
+    def test_second_pending_request_and_overdraft_rejected(self, client, auth_headers, funded_promoter):
+        too_much = {**PAYPAL, "amount": 150}
+        assert client.post("/api/marketplace/withdrawal/request", json=too_much, headers=auth_headers).status_code == 400
+
+        first = {**PAYPAL, "amount": 50}
+        assert client.post("/api/marketplace/withdrawal/request", json=first, headers=auth_headers).status_code == 200
+        again = client.post("/api/marketplace/withdrawal/request", json={**PAYPAL, "amount": 50}, headers=auth_headers)
+        assert again.status_code == 400
+        assert "pending" in again.json()["detail"]
+
+    def test_history_and_stats(self, client, auth_headers, funded_promoter):
+        client.post("/api/marketplace/withdrawal/request", json=PAYPAL, headers=auth_headers)
+
+        history = client.get("/api/marketplace/withdrawal/history", headers=auth_headers).json()
+        assert history["total"] == 1
+        assert history["requests"][0]["amount"] == 60.0
+
+        stats = client.get("/api/marketplace/withdrawal/stats", headers=auth_headers).json()
+        assert stats["available_balance"] == 40.0
+        assert stats["pending_requests_count"] == 1
+        assert stats["approved_requests_count"] == 0
+        assert stats["total_requests_count"] == 1
+
+    def test_stats_without_wallet(self, client, auth_headers):
+        stats = client.get("/api/marketplace/withdrawal/stats", headers=auth_headers).json()
+        assert stats["total_requests_count"] == 0
+
+
+class TestCleanup:
+
+    def test_check_invalid_posts_requires_admin(self, client, auth_headers):
+        assert client.get("/cleanup/check-invalid-posts", headers=auth_headers).status_code in (401, 403)